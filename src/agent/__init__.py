@@ -1,3 +1,4 @@
+from .compression import PromptCompressor
 from .roles import (
     ConsistencyReviewerRole,
     GenericRole,
@@ -16,4 +17,5 @@ __all__ = [
     "StoryboardRole",
     "ConsistencyReviewerRole",
     "RoleFactory",
+    "PromptCompressor",
 ]
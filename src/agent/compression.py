@@ -0,0 +1,135 @@
+"""
+提示词上下文压缩
+
+检索到的记忆文本会原样拼进每一次动作选择/Think/Refine/Act提示词，记忆越多
+提示词越长。PromptCompressor对这段上下文做压缩后再拼入提示词：安装llmlingua时
+使用LLMLingua按目标比例删减低信息量token，否则退回无依赖的去重压缩（折叠空白、
+去掉正文重复的记忆块）。同一次任务内检索结果稳定，压缩结果按文本哈希缓存。
+"""
+
+import hashlib
+import logging
+import re
+from collections import OrderedDict
+from typing import List, Optional
+
+try:
+    from llmlingua import PromptCompressor as _LLMLinguaCompressor
+except ImportError:  # pragma: no cover - optional dependency
+    _LLMLinguaCompressor = None
+
+logger = logging.getLogger(__name__)
+
+# Refine命令关键字与换行必须保留，否则编辑命令的示例与索引会被破坏
+DEFAULT_FORCE_TOKENS = ["\n", "DELETE", "ADD", "MERGE", "RELABEL"]
+
+
+class PromptCompressor:
+    """检索上下文压缩器"""
+
+    def __init__(
+        self,
+        rate: float = 0.3,
+        model_name: Optional[str] = None,
+        force_tokens: Optional[List[str]] = None,
+        min_length: int = 400,
+        cache_size: int = 128,
+        use_llmlingua: bool = True,
+    ):
+        """
+        初始化压缩器
+
+        Args:
+            rate: LLMLingua目标保留比例
+            model_name: LLMLingua使用的模型名称，为None时使用其默认模型
+            force_tokens: 压缩时必须保留的token
+            min_length: 短于该字符数的文本不压缩
+            cache_size: 压缩结果缓存条数
+            use_llmlingua: 已安装llmlingua时是否使用
+        """
+        if not 0.0 < rate <= 1.0:
+            raise ValueError(f"rate必须在(0, 1]之间，实际值: {rate}")
+        self.rate = rate
+        self.force_tokens = list(force_tokens or DEFAULT_FORCE_TOKENS)
+        self.min_length = min_length
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, str]" = OrderedDict()
+        self._stats = {"calls": 0, "cache_hits": 0, "chars_in": 0, "chars_out": 0}
+
+        self._llmlingua = None
+        if use_llmlingua and _LLMLinguaCompressor is not None:
+            kwargs = {"model_name": model_name} if model_name else {}
+            self._llmlingua = _LLMLinguaCompressor(**kwargs)
+
+    @property
+    def backend(self) -> str:
+        """当前使用的压缩后端"""
+        return "llmlingua" if self._llmlingua is not None else "dedupe"
+
+    def compress(self, text: str) -> str:
+        """
+        压缩上下文文本
+
+        Args:
+            text: 检索记忆等上下文文本
+
+        Returns:
+            压缩后的文本；短文本原样返回
+        """
+        if not text or len(text) < self.min_length:
+            return text
+
+        self._stats["calls"] += 1
+        key = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            self._stats["cache_hits"] += 1
+            return cached
+
+        try:
+            if self._llmlingua is not None:
+                result = self._llmlingua.compress_prompt(
+                    text, rate=self.rate, force_tokens=self.force_tokens
+                )["compressed_prompt"]
+            else:
+                result = self._dedupe(text)
+        except Exception as e:
+            logger.warning(f"上下文压缩失败，使用原文: {e}")
+            result = text
+
+        self._stats["chars_in"] += len(text)
+        self._stats["chars_out"] += len(result)
+        self._cache[key] = result
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return result
+
+    def __call__(self, text: str) -> str:
+        return self.compress(text)
+
+    def get_stats(self) -> dict:
+        """获取压缩统计信息"""
+        stats = dict(self._stats)
+        stats["backend"] = self.backend
+        stats["ratio"] = (
+            stats["chars_out"] / stats["chars_in"] if stats["chars_in"] else 1.0
+        )
+        return stats
+
+    @staticmethod
+    def _dedupe(text: str) -> str:
+        """无依赖压缩：折叠空白与空行，去掉正文重复的记忆块（保留首次出现）"""
+        seen = set()
+        blocks = []
+        for block in re.split(r"\n\s*\n", text):
+            lines = [" ".join(line.split()) for line in block.splitlines() if line.strip()]
+            if not lines:
+                continue
+            # 首行是"[记忆 i]"一类的标题，按其余正文判断是否重复
+            body = "\n".join(lines[1:])
+            if body and body in seen:
+                continue
+            seen.add(body)
+            blocks.append("\n".join(lines))
+        return "\n\n".join(blocks)
@@ -4,11 +4,17 @@
 实现Think/Refine/Act的标准提示词模板，支持模板参数化填充和版本管理。
 """
 
-from typing import Dict, Any, Optional
+from types import MappingProxyType
+from typing import Dict, Any, Mapping, Optional
+import keyword
 import logging
+import re
+import string
 
 logger = logging.getLogger(__name__)
 
+_VAR_RE = re.compile(r'{(\w+)}')
+
 
 class PromptTemplate:
     """提示词模板基类"""
@@ -23,6 +29,67 @@ class PromptTemplate:
         """
         self.template = template
         self.version = version
+        self._segments, self._fields = self._compile(template)
+        self._field_set = frozenset(self._fields) if self._fields is not None else frozenset()
+        self._render = self._build_renderer(self._segments, self._fields)
+        if self._fields is not None:
+            self._variables = tuple(sorted(self._field_set))
+        else:
+            self._variables = tuple(sorted(set(_VAR_RE.findall(template))))
+
+    @staticmethod
+    def _compile(template: str):
+        """
+        预编译模板为字面量片段与变量名序列
+
+        仅处理形如 {name} 的简单变量；出现格式说明、转换符、属性/下标访问
+        或位置参数时返回 (None, None)，由 format 回退到 str.format。
+
+        Returns:
+            (片段列表, 变量名列表)，片段数量恒为变量数量 + 1
+        """
+        segments = [""]
+        fields = []
+        try:
+            parsed = list(string.Formatter().parse(template))
+        except ValueError:
+            # 模板语法错误时保留原行为，在 format 时由 str.format 抛出
+            return None, None
+
+        for literal, field_name, format_spec, conversion in parsed:
+            segments[-1] += literal
+            if field_name is None:
+                continue
+            if format_spec or conversion or not field_name.isidentifier():
+                return None, None
+            fields.append(field_name)
+            segments.append("")
+        return segments, fields
+
+    @staticmethod
+    def _build_renderer(segments, fields):
+        """
+        为预编译模板生成专用渲染函数
+
+        生成形如 def _render(task_input, traces, **_): return "".join((s0, str(task_input), s1, ...))
+        的函数，变量直接按参数名绑定，省去逐个字典查找与片段循环。
+        变量名为关键字或双下划线开头时返回None，由format走通用路径。
+        """
+        if fields is None:
+            return None
+        names = list(dict.fromkeys(fields))
+        if any(keyword.iskeyword(name) or name.startswith("__") for name in names):
+            return None
+
+        parts = [repr(segments[0])]
+        for i, name in enumerate(fields):
+            parts.append(f"str({name})")
+            parts.append(repr(segments[i + 1]))
+        params = ", ".join(names + ["**__extra"])
+        source = f"def _render({params}):\n    return ''.join(({', '.join(parts)},))\n"
+        namespace: Dict[str, Any] = {}
+        exec(compile(source, "<PromptTemplate>", "exec"), {"str": str}, namespace)
+        return namespace["_render"]
 
     def format(self, **kwargs) -> str:
         """
@@ -34,6 +101,32 @@ class PromptTemplate:
         Returns:
             格式化后的提示词
         """
+        if self._fields is None:
+            return self._format_fallback(**kwargs)
+
+        if self._render is not None:
+            try:
+                return self._render(**kwargs)
+            except TypeError:
+                # 缺少变量时由下方通用路径给出与str.format一致的KeyError
+                pass
+
+        missing = self._field_set - kwargs.keys()
+        if missing:
+            error = KeyError(next(name for name in self._fields if name in missing))
+            logger.error(f"模板变量缺失: {error}")
+            raise error
+
+        segments = self._segments
+        parts = [segments[0]]
+        append = parts.append
+        for i, name in enumerate(self._fields):
+            append(str(kwargs[name]))
+            append(segments[i + 1])
+        return "".join(parts)
+
+    def _format_fallback(self, **kwargs) -> str:
+        """无法预编译的模板走标准 str.format"""
         try:
             return self.template.format(**kwargs)
         except KeyError as e:
@@ -52,24 +145,12 @@ class PromptTemplate:
         }
 
     def _extract_variables(self) -> list:
-        """提取模板中的变量名"""
-        import re
-        variables = re.findall(r'{(\w+)}', self.template)
-        return list(set(variables))  # 去重
+        """提取模板中的变量名（构造时已缓存）"""
+        return list(self._variables)
 
 
-class PromptSystem:
-    """提示词系统管理器"""
-
-    def __init__(self):
-        """初始化提示词系统"""
-        self.templates: Dict[str, PromptTemplate] = {}
-        self._init_default_templates()
-
-    def _init_default_templates(self) -> None:
-        """初始化默认模板"""
-        # Think模板
-        think_template = """Think: 请进行内部推理。
+# Think模板
+_THINK_TEMPLATE = """Think: 请进行内部推理。
 
 任务: {task_input}
 
@@ -80,10 +161,9 @@ class PromptSystem:
 {traces}
 
 请以 "Think:" 开头输出推理过程。推理应分析当前任务与相关经验的关系，考虑可能的解决方案，并评估不同方案的优缺点。"""
-        self.register_template("think", think_template, "1.0.0")
 
-        # Refine模板
-        refine_template = """Refine: 允许以下操作修改记忆库：
+# Refine模板
+_REFINE_TEMPLATE = """Refine: 允许以下操作修改记忆库：
 1. DELETE <索引> - 删除指定索引的记忆
 2. ADD {{文本}} - 添加新记忆
 3. MERGE <索引1>&<索引2> - 合并两个记忆
@@ -101,10 +181,9 @@ class PromptSystem:
 示例: DELETE 1,3; ADD{{新经验}}; MERGE 0&2; RELABEL 4 new-tag
 
 请确保命令格式正确。"""
-        self.register_template("refine", refine_template, "1.0.0")
 
-        # Act模板
-        act_template = """Act: 请给出最终答案或动作。
+# Act模板
+_ACT_TEMPLATE = """Act: 请给出最终答案或动作。
 
 任务: {task_input}
 
@@ -115,10 +194,9 @@ class PromptSystem:
 {traces}
 
 请以 "Act:" 开头输出最终答案或动作。答案应基于相关经验和推理过程，直接解决任务需求。"""
-        self.register_template("act", act_template, "1.0.0")
 
-        # 动作选择模板
-        action_selection_template = """请选择下一步动作：Think / Refine / Act
+# 动作选择模板
+_ACTION_SELECTION_TEMPLATE = """请选择下一步动作：Think / Refine / Act
 
 任务: {task_input}
 
@@ -134,10 +212,9 @@ class PromptSystem:
 - 如果已经可以给出最终答案或执行动作，选择 Act
 
 只需输出动作名称。"""
-        self.register_template("action_selection", action_selection_template, "1.0.0")
 
-        # 检索模板
-        retrieval_template = """你是一个专业的记忆检索器。给定用户任务：
+# 检索模板
+_RETRIEVAL_TEMPLATE = """你是一个专业的记忆检索器。给定用户任务：
 {query}
 
 以下是全部记忆条目，请按相关性从高到低排序，输出最相关的前 {k} 个索引：
@@ -146,7 +223,27 @@ class PromptSystem:
 
 请仅输出索引列表，例如：1,5,2
 确保索引在有效范围内。"""
-        self.register_template("retrieval", retrieval_template, "1.0.0")
+
+# 默认模板在导入时编译一次，各PromptSystem实例共享（PromptTemplate构造后不再修改）
+_DEFAULT_TEMPLATES: Mapping[str, PromptTemplate] = MappingProxyType({
+    "think": PromptTemplate(_THINK_TEMPLATE, "1.0.0"),
+    "refine": PromptTemplate(_REFINE_TEMPLATE, "1.0.0"),
+    "act": PromptTemplate(_ACT_TEMPLATE, "1.0.0"),
+    "action_selection": PromptTemplate(_ACTION_SELECTION_TEMPLATE, "1.0.0"),
+    "retrieval": PromptTemplate(_RETRIEVAL_TEMPLATE, "1.0.0"),
+})
+
+
+class PromptSystem:
+    """提示词系统管理器"""
+
+    def __init__(self):
+        """初始化提示词系统"""
+        self.templates: Dict[str, PromptTemplate] = dict(_DEFAULT_TEMPLATES)
+
+    def _init_default_templates(self) -> None:
+        """初始化默认模板"""
+        self.templates.update(_DEFAULT_TEMPLATES)
 
     def register_template(self, name: str, template: str, version: str = "1.0.0") -> None:
         """
@@ -218,7 +315,6 @@ class PromptSystem:
         old_template = self.templates[name]
         if version is None:
             # 自动递增版本号
-            import re
             match = re.match(r'(\d+)\.(\d+)\.(\d+)', old_template.version)
             if match:
                 major, minor, patch = map(int, match.groups())
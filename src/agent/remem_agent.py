@@ -4,11 +4,14 @@ ReMem Agent主循环
 实现完整的Think/Refine/Act状态机，支持最大迭代次数限制和强制终止机制。
 """
 
-from typing import Dict, Any, List, Optional, Union, Tuple
+from typing import Callable, Dict, Any, Generator, List, Optional, Union, Tuple
+import asyncio
 import logging
 import re
+import threading
 import uuid
 import json
+from contextlib import contextmanager
 from datetime import datetime
 
 try:
@@ -16,13 +19,15 @@ try:
     from ..memory.bank import MemoryBank
     from ..memory.entry import MemoryEntry
     from ..memory.retrieval_result import RetrievalResult
-    from ..memory.editor import RefineEditor
-    from ..memory.persistence import MemoryPersistence
+    from ..memory.editor import _COMMAND_RE, RefineEditor
+    from ..memory.persistence import open_persistence
     from ..memory.schema import MemoryOperation, MemoryRecord, TaskContext
+    from ..memory.semantic_cache import SemanticCache
     from ..memory.stores import (
         InMemoryTraceStore,
         JsonMemoryStore,
         MemoryStore,
+        _adjust_index_after_deletes,
     )
     from .roles import GenericRole, MemoryRole
 except ImportError:
@@ -30,14 +35,179 @@ except ImportError:
     from memory.bank import MemoryBank
     from memory.entry import MemoryEntry
     from memory.retrieval_result import RetrievalResult
-    from memory.editor import RefineEditor
-    from memory.persistence import MemoryPersistence
+    from memory.editor import _COMMAND_RE, RefineEditor
+    from memory.persistence import open_persistence
     from memory.schema import MemoryOperation, MemoryRecord, TaskContext
-    from memory.stores import InMemoryTraceStore, JsonMemoryStore, MemoryStore
+    from memory.semantic_cache import SemanticCache
+    from memory.stores import (
+        InMemoryTraceStore,
+        JsonMemoryStore,
+        MemoryStore,
+        _adjust_index_after_deletes,
+    )
     from agent.roles import GenericRole, MemoryRole
 
 logger = logging.getLogger(__name__)
 
+# Think/Act提示词中与任务无关的固定说明。放在提示词开头、任务与检索内容之前，
+# 使不同任务、不同迭代的请求共享尽可能长的相同前缀，便于服务端前缀缓存
+# （如DeepSeek上下文硬盘缓存、vLLM prefix caching）命中。
+_THINK_INSTRUCTIONS = """
+请以 "Think:" 开头输出推理过程。
+推理应该：
+1. 分析任务需求
+2. 结合相关经验
+3. 考虑历史推理
+4. 提出下一步思路
+
+请确保推理内容具体、有逻辑。
+"""
+
+_ACT_INSTRUCTIONS = """
+请以 "Act:" 开头输出最终答案或动作。
+你的回答应该：
+
+1. **直接回应任务需求** - 明确解决任务中提出的问题
+2. **基于相关经验** - 参考下面的相关经验（如果存在）
+3. **考虑推理轨迹** - 结合下面的思考过程
+4. **清晰具体** - 提供明确的答案或可执行的动作
+5. **完整自包含** - 答案应该是完整的，不需要额外解释
+
+如果是复杂任务，可以分步骤回答。
+如果是决策任务，请给出明确的决定和理由。
+如果是创作任务，请提供具体的内容。
+
+示例格式：
+Act: [你的答案或动作]
+"""
+
+# 旧版Refine提示词中的固定操作说明，只在模块加载时构建一次
+_REFINE_EDIT_GUIDE = """
+可用的编辑操作:
+1. DELETE <index1>,<index2>,... - 删除指定索引的记忆
+2. ADD{<new_experience>} - 添加新记忆（用花括号包裹内容）
+3. MERGE <index1>&<index2> - 合并两个记忆
+4. RELABEL <index> <new_tag> - 重新标记记忆
+
+编辑原则:
+- 删除冗余或无关的记忆
+- 添加重要的新经验
+- 合并相似或重复的记忆
+- 重新标记不准确的标签
+
+请输出Refine命令，例如：
+DELETE 1,3; ADD{用户喜欢简洁的界面设计}; MERGE 0&2; RELABEL 4 ui-preference
+
+请确保命令格式正确，索引在有效范围内。
+"""
+
+
+class _StreamedPrompt(str):
+    """Think/Act步骤产出的提示词；流式驱动时其响应逐块转发给调用方，kind为动作名"""
+
+    def __new__(cls, text: str, kind: str) -> "_StreamedPrompt":
+        prompt = super().__new__(cls, text)
+        prompt.kind = kind
+        return prompt
+
+
+class _StoreCall:
+    """
+    步骤生成器中对memory_store的调用
+
+    检索可能同步调用LLM，写入与保存涉及文件I/O；同步驱动直接执行，异步驱动放到
+    工作线程中执行，不阻塞事件循环。write为False的调用（检索）只读记忆，可并发执行。
+    """
+
+    __slots__ = ("fn", "write")
+
+    def __init__(self, fn: Callable[[], Any], write: bool = True):
+        self.fn = fn
+        self.write = write
+
+
+class _StoreLock:
+    """记忆存储的读写锁：检索可并发，写入独占"""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writing = False
+
+    @contextmanager
+    def read(self):
+        with self._cond:
+            while self._writing:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        with self._cond:
+            while self._writing or self._readers:
+                self._cond.wait()
+            self._writing = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writing = False
+                self._cond.notify_all()
+
+
+class _SpeculativePrefetch:
+    """
+    异步路径的推测预取
+
+    在等待动作选择结果的同时提前发出Think/Act请求；主循环随后yield的提示词
+    与预取提示词完全相同时直接复用在途请求，其余预取请求取消。预取只对
+    紧随其后的两个提示词（动作选择及其分支）有效。
+    """
+
+    def __init__(self, call: Callable[[str], Any]):
+        self._call = call
+        self._tasks: Dict[str, "asyncio.Task"] = {}
+        self._window = 0
+        self.hits = 0
+
+    def start(self, prompts: List[str]) -> None:
+        """为本轮迭代发出预取请求"""
+        self.cancel()
+        for prompt in prompts:
+            if prompt not in self._tasks:
+                task = asyncio.ensure_future(self._call(prompt))
+                # 被丢弃的请求若已失败，取走异常避免未检索警告
+                task.add_done_callback(lambda t: t.cancelled() or t.exception())
+                self._tasks[prompt] = task
+        self._window = 2 if self._tasks else 0
+
+    def take(self, prompt: str) -> Optional["asyncio.Task"]:
+        """取出与提示词匹配的预取请求；未命中且窗口耗尽时取消全部预取"""
+        task = self._tasks.pop(prompt, None)
+        if task is not None:
+            self.hits += 1
+            self.cancel()
+            return task
+        if self._window:
+            self._window -= 1
+            if not self._window:
+                self.cancel()
+        return None
+
+    def cancel(self) -> None:
+        """取消所有未被使用的预取请求"""
+        for task in self._tasks.values():
+            task.cancel()
+        self._tasks.clear()
+        self._window = 0
+
 
 class ReMemAgent:
     """ReMem Agent主类"""
@@ -52,6 +222,10 @@ class ReMemAgent:
         max_iterations: int = 8,
         retrieval_k: int = 5,
         include_explanations: bool = True,
+        semantic_cache: Optional[SemanticCache] = None,
+        cache_kind: Optional[str] = None,
+        speculative_prefetch: bool = False,
+        prompt_compressor: Optional[Callable[[str], str]] = None,
     ):
         """
         初始化ReMem Agent
@@ -61,17 +235,29 @@ class ReMemAgent:
             memory_bank: 记忆库实例，如为None则创建新实例
             memory_store: 可注入记忆存储后端；未传入时使用JSON MemoryBank
             trace_store: 可注入轨迹存储后端；未传入时使用内存轨迹
-            persist_path: 持久化存储路径
+            persist_path: 持久化存储路径；以 .mem 结尾时使用二进制列式目录格式
             max_iterations: 最大迭代次数
             retrieval_k: 检索返回的最相关记忆数量
             include_explanations: 是否包含相关性解释
+            semantic_cache: 可选任务级语义缓存；命中时直接复用相近任务的结果
+            cache_kind: 未传入semantic_cache时，按此索引类型（flat/lsh/hnsw）创建缓存
+            speculative_prefetch: 异步运行时是否在动作选择期间推测预取Think/Act，
+                以额外的LLM调用换取更短的单轮延迟
+            prompt_compressor: 可选的上下文压缩函数（如PromptCompressor），
+                检索记忆文本拼入提示词前先经其压缩
         """
         self.llm = llm
-        self.persistence = MemoryPersistence(persist_path)
+        self.persistence = open_persistence(persist_path)
         self.max_iterations = max_iterations
         self.retrieval_k = retrieval_k
         self.include_explanations = include_explanations
+        self.speculative_prefetch = speculative_prefetch
+        self.prompt_compressor = prompt_compressor
         self.edit_traces: List[Dict[str, Any]] = []  # 编辑轨迹记录
+        self._memory_list_cache: Tuple[Optional[tuple], str] = (None, "")  # ((记忆库, 版本), 文本)
+        if semantic_cache is None and cache_kind is not None:
+            semantic_cache = SemanticCache(index_kind=cache_kind)
+        self.semantic_cache = semantic_cache
 
         if memory_store is None:
             self.M = memory_bank if memory_bank is not None else MemoryBank()
@@ -93,6 +279,8 @@ class ReMemAgent:
             if hasattr(self.memory_store, "set_llm"):
                 self.memory_store.set_llm(self.llm)
         self.trace_store = trace_store or InMemoryTraceStore()
+        # 并发任务的检索可在工作线程中并行，写入与检索、写入与写入不会交错
+        self._store_lock = _StoreLock()
 
         logger.info(
             f"ReMem Agent已初始化 - 最大迭代次数: {max_iterations}, "
@@ -117,6 +305,304 @@ class ReMemAgent:
         Returns:
             包含执行结果的字典
         """
+        cached = self._lookup_semantic_cache(task_input, role, context)
+        if cached is not None:
+            return cached
+        response = self._drive(self._run_task_steps(task_input, role, context))
+        self._store_semantic_cache(task_input, role, context, response)
+        return response
+
+    def run_task_iter(
+        self,
+        task_input: str,
+        role: Optional[MemoryRole] = None,
+        context: Optional[Union[TaskContext, Dict[str, Any]]] = None,
+    ) -> Generator[str, None, Dict[str, Any]]:
+        """
+        以生成器形式运行单步任务，逐条产出执行轨迹
+
+        每条Think结果、Refine命令在产生时立即yield，调用方可边执行边展示，
+        也可中途停止迭代提前结束。生成器的返回值（StopIteration.value）
+        即run_task的结果字典。
+
+        Args:
+            task_input: 任务输入 x_t
+            role: 注入角色；未传入时使用GenericRole
+            context: 任务上下文；业务元数据放在metadata中
+
+        Yields:
+            执行轨迹文本
+        """
+        cached = self._lookup_semantic_cache(task_input, role, context)
+        if cached is not None:
+            yield from cached.get("traces", [])
+            return cached
+
+        pending: List[str] = []
+        steps = self._run_task_steps(task_input, role, context, on_trace=pending.append)
+        try:
+            prompt = next(steps)
+            while True:
+                # 轨迹在下一次LLM调用前交给调用方
+                yield from pending
+                pending.clear()
+                try:
+                    response = self._call_step(prompt)
+                except Exception as exc:
+                    prompt = steps.throw(exc)
+                else:
+                    prompt = steps.send(response)
+        except StopIteration as stop:
+            response = stop.value
+        yield from pending
+
+        self._store_semantic_cache(task_input, role, context, response)
+        return response
+
+    def run_task_stream(
+        self,
+        task_input: str,
+        role: Optional[MemoryRole] = None,
+        context: Optional[Union[TaskContext, Dict[str, Any]]] = None,
+    ) -> Generator[Tuple[str, str], None, Dict[str, Any]]:
+        """
+        以流式方式运行单步任务
+
+        在run_task_iter的基础上，Think与Act的LLM响应通过llm.stream_call逐块转发，
+        调用方在首个token到达时即可开始展示，感知延迟约为首token延迟。
+        生成器的返回值（StopIteration.value）即run_task的结果字典。
+
+        Args:
+            task_input: 任务输入 x_t
+            role: 注入角色；未传入时使用GenericRole
+            context: 任务上下文；业务元数据放在metadata中
+
+        Yields:
+            (类型, 文本)：类型为"trace"时文本为一条执行轨迹，
+            为"think"/"act"时文本为对应响应的一个文本块
+        """
+        cached = self._lookup_semantic_cache(task_input, role, context)
+        if cached is not None:
+            for trace in cached.get("traces", []):
+                yield "trace", trace
+            return cached
+
+        stream_call = getattr(self.llm, "stream_call", None)
+        pending: List[str] = []
+        steps = self._run_task_steps(task_input, role, context, on_trace=pending.append)
+        try:
+            prompt = next(steps)
+            while True:
+                for trace in pending:
+                    yield "trace", trace
+                pending.clear()
+                try:
+                    if isinstance(prompt, _StreamedPrompt) and stream_call is not None:
+                        parts = []
+                        for chunk in stream_call(prompt):
+                            parts.append(chunk)
+                            yield prompt.kind, chunk
+                        response = "".join(parts)
+                    else:
+                        response = self._call_step(prompt)
+                except Exception as exc:
+                    prompt = steps.throw(exc)
+                else:
+                    prompt = steps.send(response)
+        except StopIteration as stop:
+            response = stop.value
+        for trace in pending:
+            yield "trace", trace
+
+        self._store_semantic_cache(task_input, role, context, response)
+        return response
+
+    async def run_task_async(
+        self,
+        task_input: str,
+        role: Optional[MemoryRole] = None,
+        context: Optional[Union[TaskContext, Dict[str, Any]]] = None,
+    ) -> Dict[str, Any]:
+        """
+        异步运行单步任务
+
+        与run_task流程一致，LLM调用通过llm.acall等待，不阻塞事件循环。
+
+        Args:
+            task_input: 任务输入 x_t
+            role: 注入角色；未传入时使用GenericRole
+            context: 任务上下文；业务元数据放在metadata中
+
+        Returns:
+            包含执行结果的字典
+        """
+        cached = self._lookup_semantic_cache(task_input, role, context)
+        if cached is not None:
+            return cached
+        if self.speculative_prefetch:
+            prefetch = _SpeculativePrefetch(self._acall_llm)
+            steps = self._run_task_steps(
+                task_input, role, context, prefetch=prefetch.start
+            )
+            response = await self._adrive(steps, prefetch=prefetch)
+        else:
+            response = await self._adrive(self._run_task_steps(task_input, role, context))
+        self._store_semantic_cache(task_input, role, context, response)
+        return response
+
+    async def run_tasks_async(
+        self,
+        tasks: List[str],
+        role: Optional[MemoryRole] = None,
+        max_concurrency: int = 4,
+    ) -> List[Dict[str, Any]]:
+        """
+        并发运行一批相互独立的任务
+
+        各任务的LLM往返通过asyncio.gather重叠执行；记忆检索与写入在工作线程中
+        逐个执行（检索中的LLM调用不阻塞事件循环）；信号量限制同时在途的任务数，
+        避免触发服务端限流。
+
+        Args:
+            tasks: 任务输入列表
+            role: 注入角色；未传入时使用GenericRole
+            max_concurrency: 最大并发任务数
+
+        Returns:
+            与tasks顺序一致的执行结果列表
+        """
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+        async def run_one(task_input: str) -> Dict[str, Any]:
+            async with semaphore:
+                return await self.run_task_async(task_input, role=role)
+
+        return list(await asyncio.gather(*(run_one(task) for task in tasks)))
+
+    def _lookup_semantic_cache(
+        self,
+        task_input: str,
+        role: Optional[MemoryRole],
+        context: Optional[Union[TaskContext, Dict[str, Any]]],
+    ) -> Optional[Dict[str, Any]]:
+        """
+        查询任务级语义缓存
+
+        仅对未携带上下文的任务生效：带上下文的任务（如作品ID、目标层）结果依赖
+        业务元数据，不能按任务文本复用。
+        """
+        if self.semantic_cache is None or context is not None:
+            return None
+        cached = self.semantic_cache.get(task_input, namespace=(role or GenericRole()).role_id)
+        if cached is None:
+            return None
+        logger.info(f"语义缓存命中，跳过LLM调用: {task_input[:100]}...")
+        response = dict(cached)
+        response["cache_hit"] = True
+        return response
+
+    def _store_semantic_cache(
+        self,
+        task_input: str,
+        role: Optional[MemoryRole],
+        context: Optional[Union[TaskContext, Dict[str, Any]]],
+        response: Dict[str, Any],
+    ) -> None:
+        """缓存已完成任务的结果；强制终止的结果不缓存"""
+        if self.semantic_cache is None or context is not None:
+            return
+        if response.get("status") != "completed":
+            return
+        self.semantic_cache.put(
+            task_input, response, namespace=(role or GenericRole()).role_id
+        )
+
+    def _drive(self, steps: Generator[str, str, Any]) -> Any:
+        """
+        同步驱动步骤生成器
+
+        生成器每yield一个提示词，就调用一次LLM并把响应send回去；yield存储调用时
+        执行该调用。异常通过throw交回生成器，由原处的异常处理逻辑兜底。
+        """
+        try:
+            prompt = next(steps)
+            while True:
+                try:
+                    response = self._call_step(prompt)
+                except Exception as exc:
+                    prompt = steps.throw(exc)
+                else:
+                    prompt = steps.send(response)
+        except StopIteration as stop:
+            return stop.value
+
+    async def _adrive(
+        self,
+        steps: Generator[str, str, Any],
+        prefetch: Optional[_SpeculativePrefetch] = None,
+    ) -> Any:
+        """
+        异步驱动步骤生成器，语义与_drive一致
+
+        存储调用在工作线程中执行；prefetch命中时复用预取请求。
+        """
+        try:
+            prompt = next(steps)
+            while True:
+                task = None
+                if prefetch is not None and not isinstance(prompt, _StoreCall):
+                    task = prefetch.take(prompt)
+                try:
+                    if isinstance(prompt, _StoreCall):
+                        response = await asyncio.to_thread(self._run_store_call, prompt)
+                    elif task is not None:
+                        logger.debug("推测预取命中，复用在途LLM请求")
+                        response = await task
+                    else:
+                        response = await self._acall_llm(prompt)
+                except Exception as exc:
+                    prompt = steps.throw(exc)
+                else:
+                    prompt = steps.send(response)
+        except StopIteration as stop:
+            return stop.value
+        finally:
+            if prefetch is not None:
+                prefetch.cancel()
+
+    def _call_step(self, prompt: Union[str, _StoreCall]) -> Any:
+        """同步执行步骤生成器yield的一步：存储调用或LLM调用"""
+        if isinstance(prompt, _StoreCall):
+            return self._run_store_call(prompt)
+        return self.llm(prompt)
+
+    def _run_store_call(self, call: _StoreCall) -> Any:
+        """按读/写持有存储锁执行一次存储调用"""
+        with self._store_lock.write() if call.write else self._store_lock.read():
+            return call.fn()
+
+    async def _acall_llm(self, prompt: str) -> str:
+        """异步调用LLM；不提供acall的实现退回线程池执行"""
+        acall = getattr(self.llm, "acall", None)
+        if acall is not None:
+            return await acall(prompt)
+        return await asyncio.to_thread(self.llm, prompt)
+
+    def _run_task_steps(
+        self,
+        task_input: str,
+        role: Optional[MemoryRole],
+        context: Optional[Union[TaskContext, Dict[str, Any]]],
+        on_trace: Optional[Callable[[str], None]] = None,
+        prefetch: Optional[Callable[[List[str]], None]] = None,
+    ) -> Generator[str, str, Dict[str, Any]]:
+        """
+        任务主循环；需要LLM时yield提示词，由_drive/_adrive完成调用；记忆存储的
+        检索、写入与保存以_StoreCall形式yield，由驱动执行
+
+        on_trace在每条轨迹产生时回调，供run_task_iter流式产出；prefetch在动作
+        选择前收到本轮Think/Act的提示词，供异步路径推测预取。
+        """
         role = role or GenericRole()
         task_context = TaskContext.from_value(context)
         if not task_context.role_id or task_context.role_id == "generic":
@@ -132,6 +618,21 @@ class ReMemAgent:
         conflicts: List[Dict[str, Any]] = []
         retrieved_memories: List[MemoryRecord] = []
         retrieved_text = ""
+        formatted_memories: List[MemoryRecord] = []  # retrieved_text对应的检索记录
+
+        def add_trace(trace: str) -> None:
+            traces.append(trace)
+            if on_trace is not None:
+                on_trace(trace)
+
+        def store_task_result(result: str, feedback: str):
+            """写入任务结果并保存，返回(追加的记录, 本次写入的应用结果)"""
+            record = self.memory_store.append_task_result(
+                task_input, result, feedback, task_context, role
+            )
+            apply_result = getattr(self.memory_store, "last_apply_result", {}) or {}
+            self.memory_store.save()
+            return record, apply_result
 
         logger.info(f"开始处理任务: {task_input[:100]}...")
         self.trace_store.record_task_started(task_id, task_input, task_context, role)
@@ -139,43 +640,63 @@ class ReMemAgent:
         for iteration in range(self.max_iterations):
             logger.debug(f"第 {iteration + 1}/{self.max_iterations} 次迭代")
 
-            retrieved_memories = self.memory_store.retrieve(
-                task_input,
-                context=task_context,
-                role=role,
-                k=self.retrieval_k,
+            # 记忆库未变化时由存储层的检索缓存直接返回上一轮结果
+            retrieved_memories = yield _StoreCall(
+                lambda: self.memory_store.retrieve(
+                    task_input,
+                    context=task_context,
+                    role=role,
+                    k=self.retrieval_k,
+                ),
+                write=False,
             )
             self.trace_store.record_retrieval(task_id, retrieved_memories)
 
-            retrieved_text = self._format_retrieved_memories(retrieved_memories)
+            # 记忆库未变化时存储层返回同一批记录对象，沿用上一轮格式化（及压缩）的文本
+            if len(retrieved_memories) != len(formatted_memories) or any(
+                a is not b for a, b in zip(retrieved_memories, formatted_memories)
+            ):
+                retrieved_text = self._format_retrieved_memories(retrieved_memories)
+                if self.prompt_compressor is not None:
+                    retrieved_text = self.prompt_compressor(retrieved_text)
+                formatted_memories = list(retrieved_memories)
+
+            if prefetch is not None:
+                prefetch(
+                    self._branch_prompts(
+                        task_input, retrieved_text, traces, role, task_context
+                    )
+                )
 
             # 让LLM选择动作
-            action = self._select_action(
+            action = yield from self._select_action_steps(
                 task_input, retrieved_text, traces, role=role, context=task_context
             )
             action_lower = action.strip().lower()
 
             if action_lower == "think":
-                result = self._think(
+                result = yield from self._think_steps(
                     task_input, retrieved_text, traces, role=role, context=task_context
                 )
-                traces.append(result)
+                add_trace(result)
                 think_traces.append(result)
                 self.trace_store.record_think(task_id, result)
                 logger.debug(f"Think: {result[:100]}...")
 
             elif action_lower == "refine":
-                operations, raw_cmd = self._refine_operations(
+                operations, raw_cmd = yield from self._refine_operations_steps(
                     task_input,
                     retrieved_text,
                     traces,
                     role=role,
                     context=task_context,
                 )
-                traces.append(raw_cmd)
+                add_trace(raw_cmd)
                 refine_operations.extend([operation.to_dict() for operation in operations])
-                apply_result = self.memory_store.apply_operations(
-                    operations, task_context, role
+                apply_result = yield _StoreCall(
+                    lambda: self.memory_store.apply_operations(
+                        operations, task_context, role
+                    )
                 )
                 applied_operations.extend(apply_result.get("applied_operations", []))
                 conflicts.extend(apply_result.get("conflicts", []))
@@ -186,29 +707,20 @@ class ReMemAgent:
                 logger.debug(f"Refine: {raw_cmd}")
 
             elif action_lower == "act":
-                result = self._act(
+                result = yield from self._act_steps(
                     task_input, retrieved_text, traces, role=role, context=task_context
                 )
                 feedback = self._get_feedback(result)  # 模拟反馈，实际应从环境获取
 
-                appended_record = self.memory_store.append_task_result(
-                    task_input,
-                    result,
-                    feedback,
-                    task_context,
-                    role,
+                appended_record, append_apply_result = yield _StoreCall(
+                    lambda: store_task_result(result, feedback)
                 )
-                append_apply_result = getattr(
-                    self.memory_store, "last_apply_result", {}
-                ) or {}
                 applied_operations.extend(
                     append_apply_result.get("applied_operations", [])
                 )
                 conflicts.extend(append_apply_result.get("conflicts", []))
                 logger.debug(f"Act: {result[:100]}...")
 
-                self.memory_store.save()
-
                 response = {
                     "action": result,
                     "action_output": result,
@@ -236,28 +748,19 @@ class ReMemAgent:
 
             else:
                 logger.warning(f"未知动作: {action}，强制转为Act")
-                traces.append(f"invalid action: {action}")
+                add_trace(f"invalid action: {action}")
 
                 # 强制执行Act
-                result = self._act(
+                result = yield from self._act_steps(
                     task_input, retrieved_text, traces, role=role, context=task_context
                 )
-                feedback = "forced"
-                appended_record = self.memory_store.append_task_result(
-                    task_input,
-                    result,
-                    feedback,
-                    task_context,
-                    role,
+                appended_record, append_apply_result = yield _StoreCall(
+                    lambda: store_task_result(result, "forced")
                 )
-                append_apply_result = getattr(
-                    self.memory_store, "last_apply_result", {}
-                ) or {}
                 applied_operations.extend(
                     append_apply_result.get("applied_operations", [])
                 )
                 conflicts.extend(append_apply_result.get("conflicts", []))
-                self.memory_store.save()
 
                 response = {
                     "action": result,
@@ -286,21 +789,14 @@ class ReMemAgent:
 
         # 超过最大迭代次数仍未Act，强制终止
         logger.warning(f"达到最大迭代次数 {self.max_iterations}，强制终止")
-        result = self._act(
+        result = yield from self._act_steps(
             task_input, retrieved_text, traces, role=role, context=task_context
         )
-        feedback = "max_iterations_exceeded"
-        appended_record = self.memory_store.append_task_result(
-            task_input,
-            result,
-            feedback,
-            task_context,
-            role,
+        appended_record, append_apply_result = yield _StoreCall(
+            lambda: store_task_result(result, "max_iterations_exceeded")
         )
-        append_apply_result = getattr(self.memory_store, "last_apply_result", {}) or {}
         applied_operations.extend(append_apply_result.get("applied_operations", []))
         conflicts.extend(append_apply_result.get("conflicts", []))
-        self.memory_store.save()
 
         response = {
             "action": result,
@@ -327,6 +823,26 @@ class ReMemAgent:
         )
         return response
 
+    def _branch_prompts(
+        self,
+        task_input: str,
+        retrieved_text: str,
+        traces: List[str],
+        role: MemoryRole,
+        context: TaskContext,
+    ) -> List[str]:
+        """构建本轮Think/Act分支将要发出的提示词（与实际执行时逐字一致）"""
+        prompts = []
+        for step_factory in (self._think_steps, self._act_steps):
+            steps = step_factory(task_input, retrieved_text, traces, role=role, context=context)
+            try:
+                prompts.append(next(steps))
+            except StopIteration:
+                pass
+            finally:
+                steps.close()
+        return prompts
+
     def _format_retrieved_memories(
         self, retrieved_memories: List[Union[MemoryEntry, RetrievalResult, MemoryRecord]]
     ) -> str:
@@ -408,6 +924,21 @@ class ReMemAgent:
         context: Optional[TaskContext] = None,
     ) -> str:
         """选择下一步动作（Think/Refine/Act）"""
+        return self._drive(
+            self._select_action_steps(
+                task_input, retrieved_text, traces, role=role, context=context
+            )
+        )
+
+    def _select_action_steps(
+        self,
+        task_input: str,
+        retrieved_text: str,
+        traces: List[str],
+        role: Optional[MemoryRole] = None,
+        context: Optional[TaskContext] = None,
+    ) -> Generator[str, str, str]:
+        """选择下一步动作（Think/Refine/Act）的步骤生成器：yield提示词，接收LLM响应"""
         role_text = ""
         if role is not None and context is not None:
             role_text = f"""
@@ -431,7 +962,7 @@ class ReMemAgent:
 只需输出动作名称。
 """
         try:
-            action = self.llm(prompt).strip().lower()
+            action = (yield prompt).strip().lower()
             # 验证动作有效性
             valid_actions = {"think", "refine", "act"}
             if action not in valid_actions:
@@ -451,6 +982,21 @@ class ReMemAgent:
         context: Optional[TaskContext] = None,
     ) -> str:
         """执行Think动作（内部推理）"""
+        return self._drive(
+            self._think_steps(
+                task_input, retrieved_text, traces, role=role, context=context
+            )
+        )
+
+    def _think_steps(
+        self,
+        task_input: str,
+        retrieved_text: str,
+        traces: List[str],
+        role: Optional[MemoryRole] = None,
+        context: Optional[TaskContext] = None,
+    ) -> Generator[str, str, str]:
+        """执行Think动作（内部推理）的步骤生成器：yield提示词，接收LLM响应"""
         # 验证输入参数
         if not task_input or not isinstance(task_input, str):
             logger.error("Think: 无效的任务输入")
@@ -467,33 +1013,24 @@ class ReMemAgent:
         # 构建提示词
         prompt = f"""
 Think: 请进行内部推理。
-
-任务: {task_input}
-
+{_THINK_INSTRUCTIONS}
 角色提示:
 {role_prompt or "通用记忆演化角色"}
 
 角色关注点:
 {role_instructions or "分析任务需求、相关记忆和下一步策略。"}
 
+任务: {task_input}
+
 相关经验:
 {retrieved_text if retrieved_text else "无相关经验"}
 
 历史推理:
 {chr(10).join(traces[-3:]) if traces else "无历史推理"}
-
-请以 "Think:" 开头输出推理过程。
-推理应该：
-1. 分析任务需求
-2. 结合相关经验
-3. 考虑历史推理
-4. 提出下一步思路
-
-请确保推理内容具体、有逻辑。
 """
         try:
             # 调用LLM
-            result = self.llm(prompt).strip()
+            result = (yield _StreamedPrompt(prompt, "think")).strip()
 
             # 验证输出格式
             if not result:
@@ -538,15 +1075,13 @@ Think: 请进行内部推理。
             return {"delete": [], "add": [], "merge": [], "relabel": []}, "Refine: 记忆库为空"
 
         # 获取当前记忆列表
-        memory_list = "\n".join([
-            f"{i}. {e.to_text()}" for i, e in enumerate(self.M.entries)
-        ])
+        memory_list = self._numbered_memory_list()
 
         # 构建详细的提示词
         prompt = f"""
 Refine: 请对记忆库进行编辑操作。
 
-当前记忆库 ({len(self.M.entries)} 条记忆):
+当前记忆库 ({len(self.M)} 条记忆):
 {memory_list}
 
 当前任务:
@@ -554,24 +1089,7 @@ Refine: 请对记忆库进行编辑操作。
 
 历史推理轨迹:
 {chr(10).join(traces[-3:]) if traces else "无历史推理"}
-
-可用的编辑操作:
-1. DELETE <index1>,<index2>,... - 删除指定索引的记忆
-2. ADD{{<new_experience>}} - 添加新记忆（用花括号包裹内容）
-3. MERGE <index1>&<index2> - 合并两个记忆
-4. RELABEL <index> <new_tag> - 重新标记记忆
-
-编辑原则:
-- 删除冗余或无关的记忆
-- 添加重要的新经验
-- 合并相似或重复的记忆
-- 重新标记不准确的标签
-
-请输出Refine命令，例如：
-DELETE 1,3; ADD{{用户喜欢简洁的界面设计}}; MERGE 0&2; RELABEL 4 ui-preference
-
-请确保命令格式正确，索引在有效范围内。
-"""
+{_REFINE_EDIT_GUIDE}"""
         try:
             # 调用LLM获取编辑命令
             cmd = self.llm(prompt).strip()
@@ -605,6 +1123,21 @@ DELETE 1,3; ADD{{用户喜欢简洁的界面设计}}; MERGE 0&2; RELABEL 4 ui-pr
             logger.error(f"Refine失败: {e}")
             return {"delete": [], "add": [], "merge": [], "relabel": []}, f"Refine异常: {str(e)}"
 
+    def _numbered_memory_list(self) -> str:
+        """
+        返回带行号的完整记忆列表文本
+
+        按记忆库版本号缓存：记忆库未修改时（如连续Refine失败、多次任务之间）
+        直接复用，不再为每条记忆重新拼接。
+        """
+        key = (id(self.M), self.M.version)
+        if self._memory_list_cache[0] != key:
+            self._memory_list_cache = (
+                key,
+                "\n".join([f"{i}. {text}" for i, text in enumerate(self.M.texts())]),
+            )
+        return self._memory_list_cache[1]
+
     def _refine_operations(
         self,
         task_input: str,
@@ -614,6 +1147,21 @@ DELETE 1,3; ADD{{用户喜欢简洁的界面设计}}; MERGE 0&2; RELABEL 4 ui-pr
         context: TaskContext,
     ) -> Tuple[List[MemoryOperation], str]:
         """执行领域无关Refine动作，输出MemoryOperation列表。"""
+        return self._drive(
+            self._refine_operations_steps(
+                task_input, retrieved_text, traces, role=role, context=context
+            )
+        )
+
+    def _refine_operations_steps(
+        self,
+        task_input: str,
+        retrieved_text: str,
+        traces: List[str],
+        role: MemoryRole,
+        context: TaskContext,
+    ) -> Generator[str, str, Tuple[List[MemoryOperation], str]]:
+        """执行Refine动作的步骤生成器：yield提示词，接收LLM响应"""
         prompt = f"""
 Refine: 请根据当前任务、检索记忆和角色约束，生成记忆演化操作。
 
@@ -654,7 +1202,7 @@ Refine: 请根据当前任务、检索记忆和角色约束，生成记忆演化
 {{"memory_operations": [{{"operation_type": "no_op", "target": "", "content": "", "metadata": {{}}}}]}}
 """
         try:
-            raw_output = self.llm(prompt).strip()
+            raw_output = (yield prompt).strip()
         except Exception as exc:
             logger.error(f"Refine操作生成失败: {exc}")
             raw_output = ""
@@ -892,18 +1440,8 @@ Refine: 请根据当前任务、检索记忆和角色约束，生成记忆演化
         if not operations:
             return False
 
-        # 检查每个操作的基本格式
-        for op in operations:
-            if not op:
-                return False
-            # 检查是否是已知的操作类型
-            if not (op.upper().startswith('DELETE ') or
-                    op.upper().startswith('ADD{') or
-                    op.upper().startswith('MERGE ') or
-                    op.upper().startswith('RELABEL ')):
-                return False
-
-        return True
+        # 检查每个操作是否是已知的操作类型（与RefineEditor分派命令段使用同一正则）
+        return all(_COMMAND_RE.match(op) for op in operations)
 
     def _validate_refine_delta(self, delta: Dict[str, Any]) -> bool:
         """验证Refine解析结果"""
@@ -928,28 +1466,24 @@ Refine: 请根据当前任务、检索记忆和角色约束，生成记忆演化
 
     def _validate_indices(self, delta: Dict[str, Any]) -> bool:
         """验证索引是否在有效范围内"""
-        max_index = len(self.M.entries) - 1
-
-        # 验证删除索引
-        for idx in delta["delete"]:
-            if not isinstance(idx, int) or idx < 0 or idx > max_index:
-                return False
-
-        # 验证合并索引
-        for idx1, idx2 in delta["merge"]:
-            if not (isinstance(idx1, int) and isinstance(idx2, int)):
-                return False
-            if idx1 < 0 or idx1 > max_index or idx2 < 0 or idx2 > max_index:
-                return False
-            if idx1 == idx2:
-                return False  # 不能合并同一个索引
-
-        # 验证重标记索引
-        for idx, _ in delta["relabel"]:
-            if not isinstance(idx, int) or idx < 0 or idx > max_index:
-                return False
+        max_index = len(self.M) - 1
+        merge_pairs = delta["merge"]
+
+        # 三类索引展平后一次性做类型与上下界检查（min/max在C层完成，不逐个比较）
+        indices = list(delta["delete"])
+        for idx1, idx2 in merge_pairs:
+            indices.append(idx1)
+            indices.append(idx2)
+        indices.extend(idx for idx, _ in delta["relabel"])
+        if not indices:
+            return True
+        if not all(isinstance(idx, int) for idx in indices):
+            return False
+        if min(indices) < 0 or max(indices) > max_index:
+            return False
 
-        return True
+        # 不能合并同一个索引
+        return all(idx1 != idx2 for idx1, idx2 in merge_pairs)
 
     def _act(
         self,
@@ -960,6 +1494,21 @@ Refine: 请根据当前任务、检索记忆和角色约束，生成记忆演化
         context: Optional[TaskContext] = None,
     ) -> str:
         """执行Act动作（对外输出）"""
+        return self._drive(
+            self._act_steps(
+                task_input, retrieved_text, traces, role=role, context=context
+            )
+        )
+
+    def _act_steps(
+        self,
+        task_input: str,
+        retrieved_text: str,
+        traces: List[str],
+        role: Optional[MemoryRole] = None,
+        context: Optional[TaskContext] = None,
+    ) -> Generator[str, str, str]:
+        """执行Act动作（对外输出）的步骤生成器：yield提示词，接收LLM响应"""
         # 验证输入参数
         if not task_input or not isinstance(task_input, str):
             logger.error("Act: 无效的任务输入")
@@ -976,41 +1525,25 @@ Refine: 请根据当前任务、检索记忆和角色约束，生成记忆演化
         # 构建详细的提示词
         prompt = f"""
 Act: 请给出最终答案或动作。
-
-当前任务:
-{task_input}
-
+{_ACT_INSTRUCTIONS}
 角色提示:
 {role_prompt or "通用记忆演化角色"}
 
 角色输出要求:
 {role_instructions or "直接回应任务，并结合相关记忆。"}
 
+当前任务:
+{task_input}
+
 相关经验（来自记忆库）:
 {retrieved_text if retrieved_text else "无相关经验"}
 
 推理轨迹（历史思考过程）:
 {chr(10).join(traces[-5:]) if traces else "无推理轨迹"}
-
-请以 "Act:" 开头输出最终答案或动作。
-你的回答应该：
-
-1. **直接回应任务需求** - 明确解决任务中提出的问题
-2. **基于相关经验** - 参考上面的相关经验（如果存在）
-3. **考虑推理轨迹** - 结合上面的思考过程
-4. **清晰具体** - 提供明确的答案或可执行的动作
-5. **完整自包含** - 答案应该是完整的，不需要额外解释
-
-如果是复杂任务，可以分步骤回答。
-如果是决策任务，请给出明确的决定和理由。
-如果是创作任务，请提供具体的内容。
-
-示例格式：
-Act: [你的答案或动作]
 """
         try:
             # 调用LLM
-            result = self.llm(prompt).strip()
+            result = (yield _StreamedPrompt(prompt, "act")).strip()
 
             # 验证输出格式
             if not result:
@@ -1077,6 +1610,12 @@ Act: [你的答案或动作]
                 "error": None
             }
 
+            # 与memory_store.apply_operations共用索引调整：已删除索引去重升序后二分查找
+            deleted_sorted = sorted(set(delta["delete"]))
+
+            def adjust(idx: int) -> Optional[int]:
+                return _adjust_index_after_deletes(idx, deleted_sorted)
+
             # 执行删除操作（从大到小排序，避免索引变化）
             if delta["delete"]:
                 delete_indices = sorted(delta["delete"], reverse=True)
@@ -1122,8 +1661,8 @@ Act: [你的答案或动作]
                 for idx1, idx2 in delta["merge"]:
                     try:
                         # 调整索引（因为之前的删除操作可能改变了索引）
-                        adjusted_idx1 = self._adjust_index(idx1, delta["delete"])
-                        adjusted_idx2 = self._adjust_index(idx2, delta["delete"])
+                        adjusted_idx1 = adjust(idx1)
+                        adjusted_idx2 = adjust(idx2)
 
                         if adjusted_idx1 is not None and adjusted_idx2 is not None:
                             self.M.merge(adjusted_idx1, adjusted_idx2)
@@ -1148,8 +1687,8 @@ Act: [你的答案或动作]
                 for idx, tag in delta["relabel"]:
                     try:
                         # 调整索引
-                        adjusted_idx = self._adjust_index(idx, delta["delete"])
-                        if adjusted_idx is None and idx in delta["delete"] and self.M.entries:
+                        adjusted_idx = adjust(idx)
+                        if adjusted_idx is None and self.M.entries:
                             adjusted_idx = min(idx, len(self.M.entries) - 1)
                         if adjusted_idx is not None:
                             self.M.relabel(adjusted_idx, tag)
@@ -1199,25 +1738,6 @@ Act: [你的答案或动作]
             }
             self.edit_traces.append(trace_record)
 
-    def _adjust_index(self, idx: int, deleted_indices: List[int]) -> Optional[int]:
-        """
-        调整索引，考虑删除操作的影响
-
-        Args:
-            idx: 原始索引
-            deleted_indices: 已删除的索引列表（已排序，从大到小）
-
-        Returns:
-            调整后的索引，如果索引已被删除则返回None
-        """
-        # 检查索引是否已被删除
-        if idx in deleted_indices:
-            return None
-
-        # 计算有多少个更小的索引被删除
-        adjustment = sum(1 for di in deleted_indices if di < idx)
-        return idx - adjustment
-
     def _add_new_memory(self, task_input: str, action_result: str, feedback: str) -> None:
         """添加新记忆条目"""
         # 提取实际动作内容（去掉"Act:"前缀）
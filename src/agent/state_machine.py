@@ -4,20 +4,36 @@
 实现ReMem的Think/Refine/Act状态机，符合MDP形式的状态机定义。
 """
 
-from enum import Enum
-from typing import Dict, Any, Optional, List, Tuple
+import math
+from collections import defaultdict, deque
+from enum import IntEnum
+from typing import Deque, Dict, Any, Optional, List, Sequence, Tuple, Union
 import logging
 import random
+import sys
 import time
 
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
 logger = logging.getLogger(__name__)
 
 
-class Action(Enum):
-    """ReMem动作枚举"""
-    THINK = "think"
-    REFINE = "refine"
-    ACT = "act"
+class Action(IntEnum):
+    """ReMem动作枚举（整数取值，比较为整数比较，批量状态机可直接存入int8数组）"""
+    THINK = 0
+    REFINE = 1
+    ACT = 2
+
+
+# 动作元组在模块加载时计算一次，热路径中不再重复构建列表
+_ALL_ACTIONS: Tuple[Action, ...] = (Action.THINK, Action.REFINE, Action.ACT)
+# 动作名称（按取值索引），用于history记录、MDP键与日志；名称驻留
+_ACTION_NAMES: Tuple[str, ...] = tuple(sys.intern(n) for n in ("think", "refine", "act"))
+_ACTION_BY_NAME: Dict[str, Action] = {name: Action(i) for i, name in enumerate(_ACTION_NAMES)}
+_INITIALIZE = sys.intern("initialize")
 
 
 class State:
@@ -41,36 +57,89 @@ class State:
         """
         self.task_input = task_input
         self.memory_bank = memory_bank
-        self.traces = traces.copy()  # 复制列表以避免修改原列表
+        # 写时复制：先共享传入的列表，首次append_trace时才复制，避免修改原列表
+        self._traces = traces
+        self._traces_owned = False
         self.iteration = iteration
         self.created_at = time.time()
 
-    def to_dict(self) -> Dict[str, Any]:
-        """转换为字典表示"""
+    @property
+    def traces(self) -> List[str]:
+        """历史推理轨迹（列表仍与他人共享时先复制一份，调用方可直接修改）"""
+        if not self._traces_owned:
+            self._traces = list(self._traces)
+            self._traces_owned = True
+        return self._traces
+
+    @traces.setter
+    def traces(self, traces: List[str]) -> None:
+        self._traces = traces
+        self._traces_owned = False
+
+    def append_trace(self, trace: str) -> None:
+        """追加一条轨迹；列表仍与他人共享时先复制一份"""
+        if not self._traces_owned:
+            self._traces = list(self._traces)
+            self._traces_owned = True
+        self._traces.append(trace)
+
+    def advance(self) -> None:
+        """原地推进一次迭代（状态转移时复用同一对象，不再重新分配）"""
+        self.iteration += 1
+
+    def snapshot(self) -> "State":
+        """返回当前状态的独立副本，供需要保留某一步状态的外部调用方使用"""
+        state = State(self.task_input, self.memory_bank, self._traces, self.iteration)
+        # 副本与本状态共享轨迹列表，双方下一次追加时各自复制
+        self._traces_owned = False
+        state.created_at = self.created_at
+        return state
+
+    def to_dict(self, memory_size: Optional[int] = None) -> Dict[str, Any]:
+        """
+        转换为字典表示
+
+        Args:
+            memory_size: 调用方已知的记忆条数，为None时按len(memory_bank)计算
+        """
+        traces = self._traces
         return {
             "task_input": self.task_input,
-            "memory_size": len(self.memory_bank),
-            "traces_count": len(self.traces),
-            "traces_preview": self.traces[-3:] if self.traces else [],  # 最近3条轨迹
+            "memory_size": len(self.memory_bank) if memory_size is None else memory_size,
+            "traces_count": len(traces),
+            "traces_preview": traces[-3:] if traces else [],  # 最近3条轨迹
             "iteration": self.iteration,
             "created_at": self.created_at,
         }
 
     def __repr__(self) -> str:
         """字符串表示"""
-        return f"State(iteration={self.iteration}, traces={len(self.traces)}, memory={len(self.memory_bank)})"
+        return f"State(iteration={self.iteration}, traces={len(self._traces)}, memory={len(self.memory_bank)})"
 
 
 class MDPModel:
     """MDP模型，管理状态转移概率和奖励函数"""
 
-    def __init__(self):
-        """初始化MDP模型"""
-        # 状态转移概率表：state -> action -> next_state -> probability
-        self.transition_probs: Dict[str, Dict[str, Dict[str, float]]] = {}
+    def __init__(self, exploration: float = 1.0):
+        """
+        初始化MDP模型
+
+        Args:
+            exploration: UCB动作选择的探索系数c
+        """
+        self.exploration = exploration
+        # (state, action)的已完成次数与进行中（已选择、尚未完成转移）次数。
+        # 进行中次数即virtual loss：并行rollout选择同一动作时压低其得分，使各rollout分散
+        self.real_n: Dict[Tuple[str, str], int] = defaultdict(int)
+        self.virtual_n: Dict[Tuple[str, str], int] = defaultdict(int)
+
+        # 状态转移概率表：(state, action, next_state) -> probability
+        self.transition_probs: Dict[Tuple[str, str, str], float] = {}
+        # 各(state, action)已观察到的next_state，归一化时按此遍历
+        self._next_states: Dict[Tuple[str, str], List[str]] = {}
 
-        # 奖励函数：state -> action -> reward
-        self.reward_function: Dict[str, Dict[str, float]] = {}
+        # 奖励函数：(state, action) -> reward
+        self.reward_function: Dict[Tuple[str, str], float] = {}
 
         # 默认配置
         self._initialize_defaults()
@@ -78,7 +147,7 @@ class MDPModel:
     def _initialize_defaults(self):
         """初始化默认的转移概率和奖励"""
         # 默认转移概率：倾向于Think -> Refine -> Act的序列
-        self.transition_probs = {
+        default_transitions = {
             "start": {
                 "think": {"think": 0.7, "refine": 0.2, "act": 0.1},
                 "refine": {"think": 0.3, "refine": 0.5, "act": 0.2},
@@ -87,7 +156,7 @@ class MDPModel:
         }
 
         # 默认奖励：鼓励有效的状态转移
-        self.reward_function = {
+        default_rewards = {
             "start": {
                 "think": 0.1,    # Think获得基础奖励
                 "refine": 0.2,   # Refine获得较高奖励
@@ -95,6 +164,19 @@ class MDPModel:
             }
         }
 
+        self.transition_probs = {}
+        self._next_states = {}
+        for state, actions in default_transitions.items():
+            for action, distribution in actions.items():
+                self._next_states[(state, action)] = list(distribution)
+                for next_state, prob in distribution.items():
+                    self.transition_probs[(state, action, next_state)] = prob
+        self.reward_function = {
+            (state, action): reward
+            for state, rewards in default_rewards.items()
+            for action, reward in rewards.items()
+        }
+
     def get_transition_prob(self, state: str, action: str, next_state: str) -> float:
         """
         获取状态转移概率
@@ -107,10 +189,7 @@ class MDPModel:
         Returns:
             转移概率
         """
-        try:
-            return self.transition_probs.get(state, {}).get(action, {}).get(next_state, 0.0)
-        except KeyError:
-            return 0.0
+        return self.transition_probs.get((state, action, next_state), 0.0)
 
     def get_reward(self, state: str, action: str) -> float:
         """
@@ -123,10 +202,56 @@ class MDPModel:
         Returns:
             奖励值
         """
-        try:
-            return self.reward_function.get(state, {}).get(action, 0.0)
-        except KeyError:
-            return 0.0
+        return self.reward_function.get((state, action), 0.0)
+
+    def select_action(self, state: str, actions: Sequence[str]) -> Tuple[str, float]:
+        """
+        按带virtual loss的UCB得分选择动作，并为选中的动作记一次进行中访问
+
+            score = r / (n + 1) + c * sqrt(2 * ln(N + 1) / (n + 1))
+
+        其中n为该动作的已完成与进行中次数之和，N为该状态下所有动作的n之和。
+        选中动作记下的进行中访问由调用方在该选择结束时（无论实际执行哪个动作）
+        调用release释放。
+
+        Args:
+            state: 当前状态
+            actions: 候选动作
+
+        Returns:
+            (选中的动作, 得分)
+        """
+        real_n = self.real_n
+        virtual_n = self.virtual_n
+        rewards = self.reward_function
+        counts = [real_n.get((state, a), 0) + virtual_n.get((state, a), 0) for a in actions]
+        log_parent = math.log(sum(counts) + 1)
+        c = self.exploration
+
+        best_action, best_score = actions[0], -math.inf
+        for action, n in zip(actions, counts):
+            n += 1
+            score = rewards.get((state, action), 0.0) / n + c * math.sqrt(2 * log_parent / n)
+            if score > best_score:
+                best_action, best_score = action, score
+
+        virtual_n[(state, best_action)] += 1
+        return best_action, best_score
+
+    def release(self, state: str, action: str) -> None:
+        """
+        释放select_action为(state, action)记下的一次进行中访问
+
+        Args:
+            state: select_action时的状态
+            action: select_action选中的动作
+        """
+        key = (state, action)
+        n = self.virtual_n.get(key, 0)
+        if n > 1:
+            self.virtual_n[key] = n - 1
+        elif n == 1:
+            del self.virtual_n[key]
 
     def update_from_experience(self, state: str, action: str, next_state: str, reward: float):
         """
@@ -138,45 +263,75 @@ class MDPModel:
             next_state: 下一个状态
             reward: 获得的奖励
         """
-        # 简化实现：更新转移概率
-        if state not in self.transition_probs:
-            self.transition_probs[state] = {}
-        if action not in self.transition_probs[state]:
-            self.transition_probs[state][action] = {}
-
-        # 增加该转移的概率
-        current_prob = self.transition_probs[state][action].get(next_state, 0.0)
-        self.transition_probs[state][action][next_state] = current_prob + 0.1
-
-        # 归一化
-        total = sum(self.transition_probs[state][action].values())
+        key = (state, action)
+        # 进行中访问由release按选中的动作释放，这里只记已完成访问
+        self.real_n[key] += 1
+
+        # 简化实现：增加该转移的概率
+        next_states = self._next_states.get(key)
+        if next_states is None:
+            next_states = self._next_states[key] = []
+        probs = self.transition_probs
+        transition_key = (state, action, next_state)
+        current_prob = probs.get(transition_key)
+        if current_prob is None:
+            next_states.append(next_state)
+            current_prob = 0.0
+        probs[transition_key] = current_prob + 0.1
+
+        # 归一化：一次求和，一次缩放
+        keys = [(state, action, ns) for ns in next_states]
+        total = sum(probs[k] for k in keys)
         if total > 0:
-            for ns in self.transition_probs[state][action]:
-                self.transition_probs[state][action][ns] /= total
+            scale = 1.0 / total
+            for k in keys:
+                probs[k] *= scale
 
         # 更新奖励函数
-        if state not in self.reward_function:
-            self.reward_function[state] = {}
-        self.reward_function[state][action] = reward
+        self.reward_function[key] = reward
 
 
 class StateMachine:
     """ReMem状态机"""
 
-    def __init__(self, max_iterations: int = 8, use_mdp: bool = True):
+    def __init__(
+        self,
+        max_iterations: int = 8,
+        use_mdp: bool = True,
+        history_maxlen: int = 256,
+        history_minimal: Optional[bool] = None,
+    ):
         """
         初始化状态机
 
         Args:
             max_iterations: 最大迭代次数
             use_mdp: 是否使用MDP模型
+            history_maxlen: 转移历史最多保留的条数，超出后丢弃最早的记录
+            history_minimal: 不使用MDP且无动作参数时，history只记录(动作, 迭代次数)
+                元组；为None时在未启用DEBUG日志时开启
         """
         self.max_iterations = max_iterations
         self.current_state: Optional[State] = None
-        self.history: List[Dict[str, Any]] = []
+        # 有界转移历史：长时间运行的交互会话不会无限增长，尾部访问O(1)
+        # 元素为转移记录字典，或精简模式下的(动作名称, 转移后迭代次数)元组
+        self.history: Deque[Any] = deque(maxlen=history_maxlen)
         self.use_mdp = use_mdp
+        if history_minimal is None:
+            history_minimal = not logger.isEnabledFor(logging.DEBUG)
+        self._history_minimal = history_minimal
+        # 起始时刻：start_time为单调时钟（计算耗时，不受系统时间调整影响），
+        # _start_wall为对应的墙钟时间，用于换算转移记录的时间戳
         self.start_time: Optional[float] = None
+        self._start_wall = 0.0
         self.total_transitions = 0
+        # 最近一次动作及其连续次数，用于O(1)的循环检测
+        self._last_action: Optional[Action] = None
+        self._same_action_streak = 0
+        # should_terminate最近一次返回False时的转移步数，None表示本步未检查
+        self._checked_step: Optional[int] = None
+        # get_action_with_mdp选中、尚未释放virtual loss的(状态, 动作)
+        self._pending_selection: Optional[Tuple[str, str]] = None
 
         if use_mdp:
             self.mdp_model = MDPModel()
@@ -195,10 +350,18 @@ class StateMachine:
             初始状态
         """
         self.current_state = State(task_input, memory_bank, [], iteration=0)
-        self.history = [{"action": "initialize", "state": self.current_state.to_dict()}]
-        self.start_time = time.time()
+        self.history.clear()
+        # 初始状态只记录当时的记忆条数，状态字典由get_history按需生成
+        self.history.append((_INITIALIZE, len(memory_bank)))
+        self.start_time = time.monotonic()
+        self._start_wall = time.time()
         self.total_transitions = 0
-        logger.debug(f"状态机初始化: {self.current_state}")
+        self._last_action = None
+        self._same_action_streak = 0
+        self._checked_step = None
+        self._release_selection()
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"状态机初始化: {self.current_state}")
         return self.current_state
 
     def transition(self, action: Action, **kwargs) -> State:
@@ -210,74 +373,122 @@ class StateMachine:
             **kwargs: 动作参数
 
         Returns:
-            新状态
+            转移后的当前状态（与转移前是同一对象，需要保留旧状态时先调用snapshot）
 
         Raises:
             ValueError: 如果状态机未初始化或动作无效
         """
-        if self.current_state is None:
+        state = self.current_state
+        if state is None:
             raise ValueError("状态机未初始化")
+        # 本步的选择到此结束；按选中的动作释放，实际执行的动作可能被强制改为ACT
+        self._release_selection()
+
+        # 每次转移只读一次时钟，超时检查与记录时间戳共用
+        now = time.monotonic()
 
-        # 检查是否应该终止
-        if self.should_terminate():
+        # 检查是否应该终止；本步已由调用方执行过should_terminate且未终止时只需复查超时
+        if self._checked_step == self.total_transitions:
+            terminated = self._timed_out(now)
+        else:
+            terminated = self.should_terminate(now)
+        if terminated:
             logger.warning("状态机已终止，无法进行状态转移")
             raise ValueError("状态机已终止")
 
         # 检查是否达到最大迭代次数（下一次转移会使iteration达到max_iterations）
-        if self.current_state.iteration >= self.max_iterations - 1:
+        from_iteration = state.iteration
+        if from_iteration >= self.max_iterations - 1:
             logger.warning(f"即将达到最大迭代次数 {self.max_iterations}，强制转为ACT")
             action = Action.ACT
+        elif not isinstance(action, Action):
+            # 所有动作始终有效，非Action值回退到ACT
+            logger.warning(f"无效动作: {action}，有效动作: {list(_ALL_ACTIONS)}")
+            action = Action.ACT
 
-        # 验证动作有效性
-        valid_actions = self.get_valid_actions()
-        if action not in valid_actions:
-            logger.warning(f"无效动作: {action}，有效动作: {valid_actions}")
-            # 回退到默认动作
-            if Action.ACT in valid_actions:
-                action = Action.ACT
-            else:
-                action = valid_actions[0] if valid_actions else Action.THINK
-
-        # 创建新状态（递增迭代次数）
-        new_state = State(
-            task_input=self.current_state.task_input,
-            memory_bank=self.current_state.memory_bank,
-            traces=self.current_state.traces,
-            iteration=self.current_state.iteration + 1,
-        )
-
-        # 记录转移
-        transition_record = {
-            "action": action.value,
-            "from_iteration": self.current_state.iteration,
-            "to_iteration": new_state.iteration,
-            "kwargs": kwargs,
-            "timestamp": time.time(),
-        }
+        # 原地递增迭代次数；每步信息由transition_record保存在history中
+        state.advance()
+        name = _ACTION_NAMES[action]
+        # 调试日志的f-string只在DEBUG级别启用时构建，每步只查询一次级别
+        debug = logger.isEnabledFor(logging.DEBUG)
+
+        # 记录转移；不使用MDP且无参数时只追加精简元组，由get_history按需展开
+        mdp = self.mdp_model if self.use_mdp else None
+        reward = 0.0
+        if mdp is None and self._history_minimal and not kwargs:
+            self.history.append((name, state.iteration))
+        else:
+            transition_record = {
+                "action": name,
+                "from_iteration": from_iteration,
+                "to_iteration": state.iteration,
+                "kwargs": kwargs,
+                "timestamp": self._start_wall + (now - self.start_time),
+            }
 
-        # 如果使用MDP模型，计算奖励
-        if self.use_mdp and self.mdp_model:
-            state_key = f"iteration_{self.current_state.iteration}"
-            reward = self.mdp_model.get_reward(state_key, action.value)
-            transition_record["reward"] = reward
-            logger.debug(f"状态转移奖励: {reward}")
+            # 如果使用MDP模型，计算奖励
+            if mdp is not None:
+                reward = mdp.get_reward(f"iteration_{from_iteration}", name)
+                transition_record["reward"] = reward
+                if debug:
+                    logger.debug(f"状态转移奖励: {reward}")
 
-        self.history.append(transition_record)
+            self.history.append(transition_record)
         self.total_transitions += 1
-
-        # 更新当前状态
-        previous_state = self.current_state
-        self.current_state = new_state
-        logger.debug(f"状态转移: {action.value} (迭代 {new_state.iteration})")
+        if action is self._last_action:
+            self._same_action_streak += 1
+        else:
+            self._last_action = action
+            self._same_action_streak = 1
+        if debug:
+            logger.debug(f"状态转移: {name} (迭代 {state.iteration})")
 
         # 如果使用MDP模型，更新经验
-        if self.use_mdp and self.mdp_model:
-            prev_state_key = f"iteration_{previous_state.iteration}"
-            next_state_key = f"iteration_{new_state.iteration}"
-            reward = transition_record.get("reward", 0.0)
-            self.mdp_model.update_from_experience(prev_state_key, action.value, next_state_key, reward)
+        if mdp is not None:
+            prev_state_key = f"iteration_{from_iteration}"
+            next_state_key = f"iteration_{state.iteration}"
+            mdp.update_from_experience(prev_state_key, name, next_state_key, reward)
+
+        return state
+
+    def transition_fast(self, action: Action) -> bool:
+        """
+        快速状态转移：只推进迭代并更新循环检测计数
+
+        不写入history、不计算MDP奖励与经验、不记录时间戳，供只关心状态推进与
+        终止判断的调用方使用；需要完整记录时使用transition。
+
+        Args:
+            action: 要执行的动作
+
+        Returns:
+            转移后是否应该终止
+
+        Raises:
+            ValueError: 如果状态机未初始化或已终止
+        """
+        state = self.current_state
+        if state is None:
+            raise ValueError("状态机未初始化")
+        # 本步的选择到此结束；按选中的动作释放，实际执行的动作可能被强制改为ACT
+        self._release_selection()
+        if self._checked_step == self.total_transitions:
+            terminated = self._timed_out()
+        else:
+            terminated = self.should_terminate()
+        if terminated:
+            raise ValueError("状态机已终止")
 
-        return new_state
+        if state.iteration >= self.max_iterations - 1 or not isinstance(action, Action):
+            action = Action.ACT
+        state.advance()
+        self.total_transitions += 1
+        if action is self._last_action:
+            self._same_action_streak += 1
+        else:
+            self._last_action = action
+            self._same_action_streak = 1
+        return self.should_terminate()
 
     def get_valid_actions(self) -> List[Action]:
         """
@@ -290,7 +501,7 @@ class StateMachine:
             return []
 
         # 所有动作始终有效
-        return [Action.THINK, Action.REFINE, Action.ACT]
+        return list(_ALL_ACTIONS)
 
     def get_action_with_mdp(self) -> Action:
         """
@@ -301,34 +512,43 @@ class StateMachine:
         """
         if not self.use_mdp or self.mdp_model is None:
             # 回退到随机选择
-            return random.choice(list(Action))
+            return random.choice(_ALL_ACTIONS)
 
         if self.current_state is None:
-            return random.choice(list(Action))
+            return random.choice(_ALL_ACTIONS)
 
         state_key = f"iteration_{self.current_state.iteration}"
-        valid_actions = self.get_valid_actions()
 
-        # 简化实现：基于奖励选择动作
-        best_action = valid_actions[0]
-        best_reward = -float('inf')
+        # UCB选择；选中的动作在下一次转移前计入virtual loss，并行rollout不会都选同一动作。
+        # 上一次选择未经转移就重新选择时先释放，避免virtual_n累积
+        self._release_selection()
+        name, score = self.mdp_model.select_action(state_key, _ACTION_NAMES)
+        self._pending_selection = (state_key, name)
+        best_action = _ACTION_BY_NAME[name]
 
-        for action in valid_actions:
-            reward = self.mdp_model.get_reward(state_key, action.value)
-            if reward > best_reward:
-                best_reward = reward
-                best_action = action
-
-        logger.debug(f"MDP选择动作: {best_action.value}, 奖励: {best_reward}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"MDP选择动作: {name}, 得分: {score}")
         return best_action
 
-    def should_terminate(self) -> bool:
+    def _release_selection(self) -> None:
+        """释放get_action_with_mdp记下的virtual loss"""
+        pending = self._pending_selection
+        if pending is not None:
+            self._pending_selection = None
+            if self.mdp_model is not None:
+                self.mdp_model.release(*pending)
+
+    def should_terminate(self, now: Optional[float] = None) -> bool:
         """
         判断是否应该终止
 
+        Args:
+            now: 调用方已读取的time.monotonic()时刻，为None时自行读取
+
         Returns:
             是否应该终止
         """
+        self._checked_step = None
         if self.current_state is None:
             return True
 
@@ -337,53 +557,89 @@ class StateMachine:
             logger.info(f"达到最大迭代次数: {self.max_iterations}")
             return True
 
-        # 检查最近的动作是否为ACT（如果历史中存在ACT动作，则终止）
-        if self.history and len(self.history) > 1:
-            last_action = self.history[-1].get("action")
-            if last_action == Action.ACT.value:
-                logger.info("检测到ACT动作，状态机终止")
-                return True
+        # 检查最近的动作是否为ACT；按_last_action判断，transition_fast不写history时同样适用
+        # 枚举成员是单例，身份比较即可
+        if self._last_action is Action.ACT:
+            logger.info("检测到ACT动作，状态机终止")
+            return True
 
         # 检查是否超时（30秒超时）
-        if self.start_time and (time.time() - self.start_time) > 30:
-            logger.warning("状态机超时（30秒）")
+        if self._timed_out(now):
             return True
 
-        # 检查是否陷入循环（最近5次状态相同）
-        if len(self.history) >= 5:
-            recent_actions = [h.get("action") for h in self.history[-5:]]
-            if len(set(recent_actions)) == 1:  # 所有动作相同
-                logger.warning(f"检测到循环动作: {recent_actions[0]}")
-                return True
+        # 检查是否陷入循环（最近5次动作相同）
+        if self._same_action_streak >= 5:
+            logger.warning(f"检测到循环动作: {_ACTION_NAMES[self._last_action]}")
+            return True
 
+        # 记录本步已检查且未终止，随后的transition无需重复检查
+        self._checked_step = self.total_transitions
         return False
 
-    def get_progress(self) -> Dict[str, Any]:
+    def _timed_out(self, now: Optional[float] = None) -> bool:
+        """是否超时（30秒超时）"""
+        if now is None:
+            now = time.monotonic()
+        if self.start_time and (now - self.start_time) > 30:
+            logger.warning("状态机超时（30秒）")
+            return True
+        return False
+
+    def _snapshot(self) -> Dict[str, Any]:
         """
-        获取状态机进度信息
+        一次性计算当前进度信息（迭代次数、轨迹/记忆条数、耗时等）
 
-        Returns:
-            进度信息字典
+        get_progress与get_statistics都从该结果投影，避免重复计算长度与分配字典。
         """
-        if self.current_state is None:
+        state = self.current_state
+        if state is None:
             return {"initialized": False}
 
-        progress_percentage = min(100, (self.current_state.iteration / self.max_iterations) * 100)
-
+        iteration = state.iteration
         return {
             "initialized": True,
-            "current_iteration": self.current_state.iteration,
+            "current_iteration": iteration,
             "max_iterations": self.max_iterations,
-            "progress_percentage": progress_percentage,
+            "progress_percentage": min(100, (iteration / self.max_iterations) * 100),
             "total_transitions": self.total_transitions,
-            "traces_count": len(self.current_state.traces),
-            "memory_size": len(self.current_state.memory_bank),
-            "elapsed_time": time.time() - self.start_time if self.start_time else 0,
+            "traces_count": len(state._traces),
+            "memory_size": len(state.memory_bank),
+            "elapsed_time": time.monotonic() - self.start_time if self.start_time else 0,
         }
 
+    def get_progress(self) -> Dict[str, Any]:
+        """
+        获取状态机进度信息
+
+        Returns:
+            进度信息字典
+        """
+        return self._snapshot()
+
     def get_history(self) -> List[Dict[str, Any]]:
         """获取状态转移历史"""
-        return self.history.copy()
+        return self._history_to_dicts()
+
+    def _history_to_dicts(self) -> List[Dict[str, Any]]:
+        """将history中的精简元组展开为转移记录字典（无时间戳）"""
+        return [
+            record if isinstance(record, dict) else self._expand_record(record)
+            for record in self.history
+        ]
+
+    def _expand_record(self, record: Tuple[str, int]) -> Dict[str, Any]:
+        """展开精简元组：(initialize, 记忆条数) 或 (动作, 迭代次数)"""
+        if record[0] == _INITIALIZE:
+            current = self.current_state
+            initial = State(current.task_input, current.memory_bank, [], iteration=0)
+            initial.created_at = current.created_at
+            return {"action": _INITIALIZE, "state": initial.to_dict(memory_size=record[1])}
+        return {
+            "action": record[0],
+            "from_iteration": record[1] - 1,
+            "to_iteration": record[1],
+            "kwargs": {},
+        }
 
     def get_current_state(self) -> Optional[State]:
         """获取当前状态"""
@@ -392,9 +648,13 @@ class StateMachine:
     def reset(self) -> None:
         """重置状态机"""
         self.current_state = None
-        self.history = []
+        self.history.clear()
         self.start_time = None
         self.total_transitions = 0
+        self._last_action = None
+        self._same_action_streak = 0
+        self._checked_step = None
+        self._release_selection()
         logger.debug("状态机已重置")
 
     def update_mdp_from_experience(self, state: str, action: str, next_state: str, reward: float):
@@ -409,7 +669,8 @@ class StateMachine:
         """
         if self.use_mdp and self.mdp_model:
             self.mdp_model.update_from_experience(state, action, next_state, reward)
-            logger.debug(f"MDP模型更新: {state} -> {action} -> {next_state}, 奖励: {reward}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"MDP模型更新: {state} -> {action} -> {next_state}, 奖励: {reward}")
 
     def get_mdp_stats(self) -> Dict[str, Any]:
         """
@@ -421,13 +682,13 @@ class StateMachine:
         if not self.use_mdp or self.mdp_model is None:
             return {"enabled": False}
 
+        state_actions = self.mdp_model._next_states
         return {
             "enabled": True,
-            "states_count": len(self.mdp_model.transition_probs),
-            "transitions_count": sum(
-                len(actions) for actions in self.mdp_model.transition_probs.values()
-            ),
-            "rewards_count": len(self.mdp_model.reward_function),
+            "states_count": len({state for state, _ in state_actions}),
+            "transitions_count": len(state_actions),
+            "rewards_count": len({state for state, _ in self.mdp_model.reward_function}),
+            "in_flight": sum(self.mdp_model.virtual_n.values()),
         }
 
     def get_statistics(self) -> Dict[str, Any]:
@@ -437,16 +698,114 @@ class StateMachine:
         Returns:
             统计信息字典
         """
-        mdp_stats = self.get_mdp_stats()
-        progress = self.get_progress()
+        progress = self._snapshot()
+        state = self.current_state
 
         return {
             "progress": progress,
-            "mdp": mdp_stats,
+            "mdp": self.get_mdp_stats(),
             "total_history_entries": len(self.history),
-            "current_state": self.current_state.to_dict() if self.current_state else None,
+            # 复用快照中的记忆条数，不再对记忆库重复求长度
+            "current_state": state.to_dict(memory_size=progress["memory_size"]) if state else None,
             "config": {
                 "max_iterations": self.max_iterations,
                 "use_mdp": self.use_mdp,
             }
         }
+
+
+class BatchStateMachine:
+    """
+    批量状态机：以列式NumPy数组同时推进B条相互独立的rollout
+
+    终止规则与StateMachine一致（达到最大迭代次数、执行ACT、连续5次相同动作），
+    最后一次迭代强制为ACT；不记录history、MDP经验与超时。已终止的rollout在
+    后续transition中保持不变。
+    """
+
+    def __init__(self, batch_size: int, max_iterations: int = 8):
+        """
+        初始化批量状态机
+
+        Args:
+            batch_size: 并行rollout条数B
+            max_iterations: 每条rollout的最大迭代次数
+        """
+        if np is None:
+            raise ImportError("BatchStateMachine需要安装numpy")
+        if batch_size <= 0:
+            raise ValueError(f"batch_size必须为正数，实际值: {batch_size}")
+        self.batch_size = batch_size
+        self.max_iterations = max_iterations
+        self.reset()
+
+    def reset(self) -> None:
+        """重置全部rollout"""
+        b = self.batch_size
+        self.iterations = np.zeros(b, dtype=np.int32)
+        self.terminated = np.zeros(b, dtype=bool)
+        self.last_action = np.full(b, -1, dtype=np.int8)
+        self.same_streak = np.zeros(b, dtype=np.int8)
+
+    @staticmethod
+    def encode(actions: Sequence[Union[Action, int]]):
+        """将动作序列转换为int8数组（Action为IntEnum，取值即编码）"""
+        return np.asarray(actions, dtype=np.int8)
+
+    def sample_actions(self, rng=None):
+        """
+        为全部rollout一次性均匀采样随机动作（替代B次random.choice）
+
+        Args:
+            rng: numpy.random.Generator，为None时使用全局随机状态
+
+        Returns:
+            长度为B的int8动作数组
+        """
+        n = len(_ALL_ACTIONS)
+        if rng is None:
+            return np.random.randint(0, n, size=self.batch_size).astype(np.int8)
+        return rng.integers(0, n, size=self.batch_size, dtype=np.int8)
+
+    def transition(self, actions: Sequence[Union[Action, int]]):
+        """
+        向量化推进所有未终止的rollout
+
+        Args:
+            actions: 长度为B的动作序列（Action或其整数编码）
+
+        Returns:
+            转移后各rollout是否终止的布尔数组
+        """
+        actions = self.encode(actions)
+        if actions.shape != (self.batch_size,):
+            raise ValueError(f"actions长度必须为{self.batch_size}，实际形状: {actions.shape}")
+
+        active = ~self.terminated
+        # 即将达到最大迭代次数的rollout强制转为ACT
+        actions = np.where(self.iterations >= self.max_iterations - 1, Action.ACT, actions)
+
+        self.iterations += active
+        streak = np.where(actions == self.last_action, self.same_streak + 1, 1)
+        self.same_streak = np.where(active, streak, self.same_streak).astype(np.int8)
+        self.last_action = np.where(active, actions, self.last_action).astype(np.int8)
+
+        self.terminated |= active & (
+            (self.iterations >= self.max_iterations)
+            | (actions == Action.ACT)
+            | (self.same_streak >= 5)
+        )
+        return self.terminated
+
+    def all_terminated(self) -> bool:
+        """是否所有rollout都已终止"""
+        return bool(self.terminated.all())
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """获取批量状态机统计信息"""
+        return {
+            "batch_size": self.batch_size,
+            "max_iterations": self.max_iterations,
+            "terminated": int(self.terminated.sum()),
+            "mean_iterations": float(self.iterations.mean()),
+        }
@@ -1,138 +1,157 @@
 import argparse
+import asyncio
+import functools
 import os
-from typing import Optional
-import dotenv
-from src.agent.remem_agent import ReMemAgent
+from typing import Any, Dict, List, Optional
 
-dotenv.load_dotenv()
 
+# 各provider所需的API密钥环境变量
+_API_KEY_ENVS = {
+    "kimi": "KIMI_API_KEY",
+    "mimo": "MIMO_API_KEY",
+    "deepseek": "DEEPSEEK_API_KEY",
+}
 
-def _create_llm(provider: Optional[str]):
-    if provider == "mock":
-        from src.llm.mock_llm import MockLLM
-        return MockLLM()
 
-    # 支持 kimi provider
-    if provider == "kimi":
-        api_key = os.getenv("KIMI_API_KEY")
-        if not api_key:
-            raise RuntimeError("KIMI_API_KEY is required for --llm kimi")
-
-        timeout_env = os.getenv("LLM_TIMEOUT")
-        max_retries_env = os.getenv("LLM_MAX_RETRIES")
-        kwargs = {}
-        if timeout_env:
-            try:
-                kwargs["timeout"] = int(timeout_env)
-            except ValueError:
-                pass
-        if max_retries_env:
-            try:
-                kwargs["max_retries"] = int(max_retries_env)
-            except ValueError:
-                pass
+@functools.lru_cache(maxsize=1)
+def _load_env_once() -> bool:
+    """加载.env（只在首次创建真实LLM客户端时执行一次；mock不需要）"""
+    import dotenv
 
-        from src.llm.kimi_client import KimiClient
-        return KimiClient.from_env(**kwargs)
+    return dotenv.load_dotenv()
 
-    # 支持 mimo provider
-    if provider == "mimo":
-        api_key = os.getenv("MIMO_API_KEY")
-        if not api_key:
-            raise RuntimeError("MIMO_API_KEY is required for --llm mimo")
-
-        timeout_env = os.getenv("LLM_TIMEOUT")
-        max_retries_env = os.getenv("LLM_MAX_RETRIES")
-        kwargs = {}
-        if timeout_env:
-            try:
-                kwargs["timeout"] = int(timeout_env)
-            except ValueError:
-                pass
-        if max_retries_env:
+
+@functools.lru_cache(maxsize=1)
+def _client_overrides() -> Dict[str, Any]:
+    """
+    解析客户端的timeout/max_retries覆盖（进程内只解析一次）
+
+    API密钥不在此缓存，由_create_llm在每次创建客户端时检查。
+    """
+    kwargs = {}
+    for name, env in (("timeout", "LLM_TIMEOUT"), ("max_retries", "LLM_MAX_RETRIES")):
+        value = os.getenv(env)
+        if value:
             try:
-                kwargs["max_retries"] = int(max_retries_env)
+                kwargs[name] = int(value)
             except ValueError:
                 pass
+    return kwargs
 
-        from src.llm.mimo_client import MimoClient
-        return MimoClient.from_env(**kwargs)
 
-    # 默认使用 deepseek
-    api_key = os.getenv("DEEPSEEK_API_KEY")
-    if not api_key:
-        raise RuntimeError("DEEPSEEK_API_KEY is required for --llm deepseek")
+def _create_llm(provider: Optional[str]):
+    if provider == "mock":
+        from src.llm.mock_llm import MockLLM
+        return MockLLM()
 
-    timeout_env = os.getenv("LLM_TIMEOUT")
-    max_retries_env = os.getenv("LLM_MAX_RETRIES")
-    kwargs = {}
-    if timeout_env:
-        try:
-            kwargs["timeout"] = int(timeout_env)
-        except ValueError:
-            pass
-    if max_retries_env:
-        try:
-            kwargs["max_retries"] = int(max_retries_env)
-        except ValueError:
-            pass
+    # 支持 kimi / mimo provider，其余默认使用 deepseek
+    if provider not in ("kimi", "mimo"):
+        provider = "deepseek"
+    _load_env_once()
+    if not os.getenv(_API_KEY_ENVS[provider]):
+        raise RuntimeError(f"{_API_KEY_ENVS[provider]} is required for --llm {provider}")
+    overrides = _client_overrides()
 
+    # 客户端模块只在选中对应provider时导入
+    if provider == "kimi":
+        from src.llm.kimi_client import KimiClient
+        return KimiClient.from_env(**overrides)
+    if provider == "mimo":
+        from src.llm.mimo_client import MimoClient
+        return MimoClient.from_env(**overrides)
     from src.llm.deepseek_client import DeepSeekClient
-    return DeepSeekClient.from_env(**kwargs)
+    return DeepSeekClient.from_env(**overrides)
 
 
-def _run_single_task(args: argparse.Namespace) -> int:
-    llm = _create_llm(args.llm)
-    agent = ReMemAgent(
-        llm=llm,
+def _create_agent(args: argparse.Namespace):
+    # Agent及其记忆/检索依赖较重，仅在实际执行任务时导入
+    from src.agent.remem_agent import ReMemAgent
+
+    return ReMemAgent(
+        llm=_create_llm(args.llm),
         persist_path=args.persist,
         max_iterations=args.max_iterations,
         retrieval_k=args.retrieval_k,
     )
-    result = agent.run_task(args.task)
-    print(result["action"])
+
+
+def _run_single_task(args: argparse.Namespace) -> int:
+    agent = _create_agent(args)
+    tasks = args.task
+    if len(tasks) == 1:
+        result = agent.run_task(tasks[0])
+        print(result["action"])
+        return 0
+
+    # 多个任务之间相互独立，并发执行以重叠LLM往返
+    results = asyncio.run(
+        agent.run_tasks_async(tasks, max_concurrency=args.max_concurrency)
+    )
+    for result in results:
+        print(result["action"])
     return 0
 
 
 def _interactive(args: argparse.Namespace) -> int:
-    llm = _create_llm(args.llm)
-    agent = ReMemAgent(
-        llm=llm,
-        persist_path=args.persist,
-        max_iterations=args.max_iterations,
-        retrieval_k=args.retrieval_k,
-    )
+    agent = _create_agent(args)
     print("pm-mem 交互模式，输入任务，Ctrl-C 退出")
     while True:
         try:
             task = input("> ").strip()
             if not task:
                 continue
-            result = agent.run_task(task)
-            print(result["action"])
-        except KeyboardInterrupt:
+            # 交互模式下逐条打印执行轨迹，Act响应按token流式输出，不必等任务结束
+            stream = agent.run_task_stream(task)
+            streamed = False
+            while True:
+                try:
+                    kind, text = next(stream)
+                except StopIteration as stop:
+                    result = stop.value
+                    break
+                if kind == "trace":
+                    print(f"  · {text[:200]}")
+                elif kind == "act":
+                    print(text, end="", flush=True)
+                    streamed = True
+            if streamed:
+                print()
+            else:
+                print(result["action"])
+        except (KeyboardInterrupt, EOFError):
+            # stdin关闭（管道/CI冒烟测试）时直接退出，而不是抛出异常
             print("\n退出")
             break
     return 0
 
 
-def main() -> int:
+@functools.lru_cache(maxsize=1)
+def _build_parser() -> argparse.ArgumentParser:
+    """构建命令行解析器（进程内只构建一次，重复调用main时复用）"""
     parser = argparse.ArgumentParser(prog="pm-mem")
     subparsers = parser.add_subparsers(dest="cmd")
     common = argparse.ArgumentParser(add_help=False)
     common.add_argument("--llm", choices=["mock", "deepseek", "mimo", "kimi"], default=None)
-    common.add_argument("--persist", default="./data/memory.json")
+    common.add_argument(
+        "--persist",
+        default="./data/memory.json",
+        help="记忆存储路径；以 .mem 结尾时使用二进制列式目录格式",
+    )
     common.add_argument("--max-iterations", type=int, default=8)
     common.add_argument("--retrieval-k", type=int, default=5)
 
     p_run = subparsers.add_parser("run", parents=[common])
-    p_run.add_argument("--task", required=True)
+    p_run.add_argument("--task", required=True, action="append")
+    p_run.add_argument("--max-concurrency", type=int, default=4)
     p_run.set_defaults(func=_run_single_task)
 
     p_inter = subparsers.add_parser("interactive", parents=[common])
     p_inter.set_defaults(func=_interactive)
+    return parser
+
 
-    args = parser.parse_args()
+def main(argv: Optional[List[str]] = None) -> int:
+    args = _build_parser().parse_args(argv)
     if not getattr(args, "cmd", None):
         args.cmd = "interactive"
         args.func = _interactive
@@ -4,20 +4,88 @@ API密钥安全管理模块
 支持API密钥的加密存储、多环境配置、密钥轮换和自动刷新等功能。
 """
 
+import atexit
+import functools
+import heapq
 import os
 import json
-import base64
 import hashlib
+import mmap
+import threading
 import time
-from typing import Dict, Any, Optional, List
+from contextlib import contextmanager
+from typing import Dict, Any, Iterator, Optional, List, Tuple, Union
 import logging
 from pathlib import Path
 from dataclasses import dataclass
 from enum import Enum
 
+try:
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+except ImportError:  # pragma: no cover - optional dependency
+    AESGCM = None
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+# pybase64按CPU特性使用SIMD编解码，接口与标准库base64一致
+try:
+    import pybase64 as base64
+except ImportError:  # pragma: no cover - optional dependency
+    import base64
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
 logger = logging.getLogger(__name__)
 
 
+def _with_key_lock(method):
+    """在实例的_lock内执行方法；密钥缓存、索引与批量写入状态只在该锁内读写"""
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+
+    return wrapper
+
+def _dumps(data: Dict[str, Any]) -> str:
+    """序列化密钥数据；安装orjson时优先使用，orjson不支持的值退回标准库"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(data).decode()
+        except TypeError:
+            pass
+    return json.dumps(data, ensure_ascii=False)
+
+
+def _loads(data: Union[str, bytes, memoryview]) -> Any:
+    """解析密钥数据；orjson.JSONDecodeError是json.JSONDecodeError的子类"""
+    if orjson is not None:
+        return orjson.loads(data)
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    return json.loads(data)
+
+
+# AES-GCM密文前缀；无前缀的数据按旧版异或格式解密
+_AESGCM_PREFIX = "aesgcm:"
+_AESGCM_PREFIX_BYTES = _AESGCM_PREFIX.encode()
+# 异或格式明文前的魔数：解密后据此判断密钥是否正确，无需先解析JSON
+_XOR_MAGIC = b"PMMK"
+_SALT_SIZE = 16
+_NONCE_SIZE = 12
+
+# 使用统计等非关键更新的延迟写入：距上次写入超过该秒数或积累的脏密钥超过该数量时落盘
+_FLUSH_INTERVAL = 1.0
+_FLUSH_MAX_DIRTY = 16
+
+
 class KeyStorageMethod(Enum):
     """密钥存储方法"""
     ENCRYPTED_FILE = "encrypted_file"  # 加密文件存储
@@ -33,9 +101,9 @@ class KeyStatus(Enum):
     PENDING_REFRESH = "pending_refresh"  # 待刷新
 
 
-@dataclass
+@dataclass(slots=True)
 class APIKeyInfo:
-    """API密钥信息"""
+    """API密钥信息（slots：无实例__dict__，大量密钥时内存占用更小）"""
     key_id: str
     provider: str
     key_value: str
@@ -72,53 +140,110 @@ class APIKeyManager:
         # 确保存储目录存在
         os.makedirs(os.path.dirname(self.storage_path), exist_ok=True)
 
+        # AES-GCM密钥由scrypt派生，开销较大，按盐值缓存；加载已有文件时沿用其盐值
+        self._salt: Optional[bytes] = None
+        self._aes_key: Optional[bytes] = None
+        # 异或回退路径的密钥字节数组（numpy可用时）
+        self._key_arr = None
+        if self.encryption_key and np is not None:
+            self._key_arr = np.frombuffer(self.encryption_key.encode(), dtype=np.uint8)
+
+        # 保护密钥缓存、索引与批量写入状态；公开方法与过期线程都在此锁内访问（可重入）
+        self._lock = threading.RLock()
         # 密钥缓存
         self._keys_cache: Dict[str, APIKeyInfo] = {}
+        # 已修改但尚未写入文件的密钥ID；文件是整体加密的，落盘时仍整体重写
+        self._dirty: set = set()
+        self._last_flush = time.monotonic()
+        self._atexit_registered = False
+        # _batch()嵌套深度与批内是否有被推迟的保存
+        self._batch_depth = 0
+        self._batch_pending = False
+        # 二级索引：提供商/环境/状态 -> 密钥ID集合；_seq记录插入顺序，保证get_keys结果有序
+        self._by_provider: Dict[str, set] = {}
+        self._by_env: Dict[str, set] = {}
+        self._by_status: Dict[KeyStatus, set] = {}
+        self._seq: Dict[str, int] = {}
+        self._next_seq = 0
+        # 轮换宽限期到期调度：(到期时刻(monotonic), 密钥ID)最小堆，由单个后台线程处理
+        self._expiry_heap: List[Tuple[float, str]] = []
+        self._expiry_cond = threading.Condition()
+        self._expiry_thread: Optional[threading.Thread] = None
         self._load_keys()
+        self._rebuild_index()
+
+    def _xor(self, data: bytes) -> Union[bytes, memoryview]:
+        """与循环重复的加密密钥逐字节异或（整段向量化，不逐字节循环）"""
+        if not data:
+            return data
+        if self._key_arr is not None:
+            d = np.frombuffer(data, dtype=np.uint8)
+            out = np.empty_like(d)
+            np.bitwise_xor(d, np.resize(self._key_arr, d.shape), out=out)
+            # 直接返回结果缓冲区，调用方按字节序列使用，不再复制成bytes
+            return out.data
+        # 无numpy时把整段数据视为大整数做一次异或
+        key_bytes = self.encryption_key.encode()
+        key_stream = (key_bytes * (len(data) // len(key_bytes) + 1))[:len(data)]
+        value = int.from_bytes(data, "big") ^ int.from_bytes(key_stream, "big")
+        return value.to_bytes(len(data), "big")
+
+    def _derive_key(self, salt: bytes) -> bytes:
+        """由加密密钥和盐值派生32字节AES密钥（同一盐值只派生一次）"""
+        if self._aes_key is None or self._salt != salt:
+            self._aes_key = hashlib.scrypt(
+                self.encryption_key.encode(), salt=salt, n=2**14, r=8, p=1, dklen=32
+            )
+            self._salt = salt
+        return self._aes_key
 
     def _simple_encrypt(self, data: str) -> str:
-        """简单加密（实际生产环境应使用更安全的加密方法）"""
+        """加密：安装cryptography时使用AES-GCM，否则退回简单异或（仅用于演示）"""
         if not self.encryption_key:
             return data  # 无加密密钥时返回明文
 
-        # 使用base64和简单异或加密（仅用于演示）
-        key_bytes = self.encryption_key.encode()
-        data_bytes = data.encode()
+        if AESGCM is not None:
+            salt = self._salt or os.urandom(_SALT_SIZE)
+            nonce = os.urandom(_NONCE_SIZE)
+            ciphertext = AESGCM(self._derive_key(salt)).encrypt(nonce, data.encode(), None)
+            return _AESGCM_PREFIX + base64.b64encode(salt + nonce + ciphertext).decode()
 
-        # 简单异或加密
-        encrypted = bytearray()
-        for i, byte in enumerate(data_bytes):
-            key_byte = key_bytes[i % len(key_bytes)]
-            encrypted.append(byte ^ key_byte)
+        # 使用base64和简单异或加密（仅用于演示）
+        return base64.b64encode(self._xor(_XOR_MAGIC + data.encode())).decode()
 
-        return base64.b64encode(encrypted).decode()
+    def _simple_decrypt(self, encrypted_data: Union[str, memoryview]) -> Union[str, memoryview]:
+        """
+        简单解密，错误密钥时抛出ValueError异常
 
-    def _simple_decrypt(self, encrypted_data: str) -> str:
-        """简单解密，错误密钥时抛出ValueError异常"""
+        encrypted_data可以是字符串或字节缓冲区（如mmap的memoryview）；无加密密钥时原样返回。
+        """
         if not self.encryption_key:
             return encrypted_data  # 无加密密钥时返回原数据
 
         try:
             # 验证输入数据
-            if not encrypted_data or not isinstance(encrypted_data, str):
+            if not encrypted_data or not isinstance(encrypted_data, (str, memoryview)):
                 raise ValueError("加密数据为空或类型错误")
 
+            prefix = _AESGCM_PREFIX if isinstance(encrypted_data, str) else _AESGCM_PREFIX_BYTES
+            if encrypted_data[:len(prefix)] == prefix:
+                return self._decrypt_aesgcm(encrypted_data[len(prefix):])
+
             # 验证base64格式
             try:
                 encrypted_bytes = base64.b64decode(encrypted_data)
             except Exception as e:
                 raise ValueError(f"Base64解码失败: {e}")
 
-            key_bytes = self.encryption_key.encode()
-
-            # 简单异或解密
-            decrypted = bytearray()
-            for i, byte in enumerate(encrypted_bytes):
-                key_byte = key_bytes[i % len(key_bytes)]
-                decrypted.append(byte ^ key_byte)
-
-            result = decrypted.decode()
-            return result
+            # 简单异或解密；带魔数的数据据此校验密钥，无魔数的旧文件按原样解码
+            decrypted = self._xor(encrypted_bytes)
+            magic = len(_XOR_MAGIC)
+            if decrypted[:magic] == _XOR_MAGIC:
+                return str(decrypted[magic:], "utf-8")
+            try:
+                return str(decrypted, "utf-8")
+            except UnicodeDecodeError:
+                raise ValueError("解密失败：加密密钥错误或数据已损坏")
 
         except ValueError as e:
             # 重新抛出ValueError
@@ -126,6 +251,27 @@ class APIKeyManager:
         except Exception as e:
             raise ValueError(f"解密失败: {e}")
 
+    def _decrypt_aesgcm(self, payload: Union[str, memoryview]) -> str:
+        """解密AES-GCM数据（盐值||nonce||密文），认证标签校验失败即密钥错误"""
+        if AESGCM is None:
+            raise ValueError("密钥文件使用AES-GCM加密，需要安装cryptography")
+        try:
+            raw = base64.b64decode(payload)
+        except Exception as e:
+            raise ValueError(f"Base64解码失败: {e}")
+        if len(raw) < _SALT_SIZE + _NONCE_SIZE:
+            raise ValueError("加密数据长度不足")
+
+        salt = raw[:_SALT_SIZE]
+        nonce = raw[_SALT_SIZE:_SALT_SIZE + _NONCE_SIZE]
+        try:
+            plaintext = AESGCM(self._derive_key(salt)).decrypt(
+                nonce, raw[_SALT_SIZE + _NONCE_SIZE:], None
+            )
+        except Exception:
+            raise ValueError("解密失败：加密密钥错误或数据已损坏")
+        return plaintext.decode()
+
     def _load_keys(self) -> None:
         """从存储文件加载密钥"""
         if not os.path.exists(self.storage_path):
@@ -134,21 +280,19 @@ class APIKeyManager:
             return
 
         try:
-            with open(self.storage_path, 'r', encoding='utf-8') as f:
-                encrypted_data = f.read()
-
-            if not encrypted_data:
-                self._keys_cache = {}
-                return
-
-            # 解密数据
-            try:
-                json_data = self._simple_decrypt(encrypted_data)
-                keys_data = json.loads(json_data)
-            except (ValueError, json.JSONDecodeError) as e:
-                logger.error(f"解密或解析失败: {e}")
-                self._keys_cache = {}
-                return
+            with open(self.storage_path, 'rb') as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    self._keys_cache = {}
+                    return
+
+                # 映射文件后直接在映射上解码/解密，不先整体读入一份字符串副本
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as view:
+                    try:
+                        keys_data = _loads(self._simple_decrypt(view))
+                    except (ValueError, json.JSONDecodeError) as e:
+                        logger.error(f"解密或解析失败: {e}")
+                        self._keys_cache = {}
+                        return
 
             # 转换为APIKeyInfo对象
             self._keys_cache = {}
@@ -180,8 +324,27 @@ class APIKeyManager:
             logger.error(f"加载密钥存储文件失败: {e}")
             self._keys_cache = {}
 
+    @contextmanager
+    def _batch(self) -> Iterator[None]:
+        """批量修改：块内的保存推迟到最外层块结束时合并为一次写入"""
+        self._batch_depth += 1
+        try:
+            yield
+        finally:
+            self._batch_depth -= 1
+            if self._batch_depth == 0 and self._batch_pending:
+                self._batch_pending = False
+                self._write_keys()
+
     def _save_keys(self) -> bool:
-        """保存密钥到存储文件"""
+        """保存密钥到存储文件；处于_batch()块内时推迟到块结束"""
+        if self._batch_depth:
+            self._batch_pending = True
+            return True
+        return self._write_keys()
+
+    def _write_keys(self) -> bool:
+        """序列化、加密并写入全部密钥"""
         try:
             # 转换为可序列化的字典
             keys_data = {}
@@ -199,13 +362,15 @@ class APIKeyManager:
                 }
 
             # 加密数据
-            json_data = json.dumps(keys_data, ensure_ascii=False)
+            json_data = _dumps(keys_data)
             encrypted_data = self._simple_encrypt(json_data)
 
             # 写入文件
             with open(self.storage_path, 'w', encoding='utf-8') as f:
                 f.write(encrypted_data)
 
+            self._dirty.clear()
+            self._last_flush = time.monotonic()
             logger.debug(f"已保存 {len(self._keys_cache)} 个API密钥到 {self.storage_path}")
             return True
 
@@ -213,13 +378,74 @@ class APIKeyManager:
             logger.error(f"保存密钥失败: {e}")
             return False
 
+    def _rebuild_index(self) -> None:
+        """按当前缓存重建二级索引"""
+        self._by_provider = {}
+        self._by_env = {}
+        self._by_status = {}
+        self._seq = {}
+        for key_info in self._keys_cache.values():
+            if key_info is not None:
+                self._index_add(key_info)
+
+    def _index_add(self, key_info: APIKeyInfo) -> None:
+        """将密钥加入索引"""
+        key_id = key_info.key_id
+        self._by_provider.setdefault(key_info.provider, set()).add(key_id)
+        self._by_env.setdefault(key_info.environment, set()).add(key_id)
+        self._by_status.setdefault(key_info.status, set()).add(key_id)
+        self._seq[key_id] = self._next_seq
+        self._next_seq += 1
+
+    def _index_remove(self, key_info: APIKeyInfo) -> None:
+        """将密钥从索引中移除"""
+        key_id = key_info.key_id
+        self._by_provider.get(key_info.provider, set()).discard(key_id)
+        self._by_env.get(key_info.environment, set()).discard(key_id)
+        self._by_status.get(key_info.status, set()).discard(key_id)
+        self._seq.pop(key_id, None)
+
+    def _set_status(self, key_info: APIKeyInfo, status: KeyStatus) -> None:
+        """修改密钥状态并同步状态索引"""
+        if key_info.status is status:
+            return
+        self._by_status.get(key_info.status, set()).discard(key_info.key_id)
+        self._by_status.setdefault(status, set()).add(key_info.key_id)
+        key_info.status = status
+
+    def _mark_dirty(self, key_id: str) -> None:
+        """记录密钥已修改，按时间间隔或数量阈值合并写入"""
+        self._dirty.add(key_id)
+        if not self._atexit_registered:
+            # 进程退出时写入尚未落盘的修改
+            atexit.register(self.flush)
+            self._atexit_registered = True
+        if (
+            len(self._dirty) > _FLUSH_MAX_DIRTY
+            or time.monotonic() - self._last_flush > _FLUSH_INTERVAL
+        ):
+            self._save_keys()
+
+    @_with_key_lock
+    def flush(self) -> bool:
+        """
+        立即写入所有延迟的修改
+
+        Returns:
+            写入是否成功（没有待写入的修改时返回True）
+        """
+        if not self._dirty:
+            return True
+        return self._save_keys()
+
     def _generate_key_id(self, provider: str, environment: str) -> str:
         """生成唯一的密钥ID"""
         timestamp = time.time_ns()
         hash_input = f"{provider}_{environment}_{timestamp}"
-        hash_value = hashlib.md5(hash_input.encode()).hexdigest()[:8]
+        hash_value = hashlib.sha256(hash_input.encode()).hexdigest()[:12]
         return f"{provider}_{environment}_{hash_value}"
 
+    @_with_key_lock
     def add_key(
         self,
         provider: str,
@@ -267,7 +493,11 @@ class APIKeyManager:
         )
 
         # 保存到缓存
+        previous = self._keys_cache.get(key_id)
+        if previous is not None:
+            self._index_remove(previous)
         self._keys_cache[key_id] = key_info
+        self._index_add(key_info)
 
         # 持久化存储
         self._save_keys()
@@ -275,6 +505,7 @@ class APIKeyManager:
         logger.info(f"已添加API密钥: {key_id}")
         return key_id
 
+    @_with_key_lock
     def get_key(self, key_id: str, update_usage: bool = True, check_status: bool = None) -> Optional[APIKeyInfo]:
         """
         获取API密钥
@@ -309,8 +540,8 @@ class APIKeyManager:
         # 检查是否过期
         if key_info.expires_at and time.time() > key_info.expires_at:
             logger.warning(f"密钥 {key_id} 已过期")
-            key_info.status = KeyStatus.EXPIRED
-            self._save_keys()
+            self._set_status(key_info, KeyStatus.EXPIRED)
+            self._mark_dirty(key_id)
             if check_status:
                 return None
 
@@ -318,10 +549,11 @@ class APIKeyManager:
         if update_usage:
             key_info.last_used = time.time()
             key_info.usage_count += 1
-            self._save_keys()
+            self._mark_dirty(key_id)
 
         return key_info
 
+    @_with_key_lock
     def get_keys(
         self,
         provider: Optional[str] = None,
@@ -339,25 +571,25 @@ class APIKeyManager:
         Returns:
             APIKeyInfo列表
         """
-        filtered_keys = []
-
-        for key_info in self._keys_cache.values():
-            # 检查key_info是否为None
-            if key_info is None:
-                continue
-
-            # 过滤条件
-            if provider and key_info.provider != provider:
-                continue
-            if environment and key_info.environment != environment:
-                continue
-            if status and key_info.status != status:
-                continue
-
-            filtered_keys.append(key_info)
-
-        return filtered_keys
-
+        # 对给定的过滤条件取索引集合的交集，未给定的条件不参与
+        candidates = [
+            index.get(value, ())
+            for index, value in (
+                (self._by_provider, provider),
+                (self._by_env, environment),
+                (self._by_status, status),
+            )
+            if value
+        ]
+        if not candidates:
+            return [k for k in self._keys_cache.values() if k is not None]
+
+        candidates.sort(key=len)
+        ids = set(candidates[0]).intersection(*candidates[1:])
+        # 按插入顺序返回，与遍历缓存的结果一致
+        return [self._keys_cache[key_id] for key_id in sorted(ids, key=self._seq.__getitem__)]
+
+    @_with_key_lock
     def update_key_status(self, key_id: str, status: KeyStatus) -> bool:
         """
         更新密钥状态
@@ -379,7 +611,7 @@ class APIKeyManager:
             return False
 
         old_status = key_info.status
-        key_info.status = status
+        self._set_status(key_info, status)
 
         if self._save_keys():
             logger.info(f"密钥 {key_id} 状态已从 {old_status.value} 更新为 {status.value}")
@@ -387,6 +619,7 @@ class APIKeyManager:
         else:
             return False
 
+    @_with_key_lock
     def delete_key(self, key_id: str) -> bool:
         """
         删除API密钥
@@ -401,7 +634,9 @@ class APIKeyManager:
             logger.error(f"密钥 {key_id} 不存在")
             return False
 
-        del self._keys_cache[key_id]
+        key_info = self._keys_cache.pop(key_id)
+        if key_info is not None:
+            self._index_remove(key_info)
 
         if self._save_keys():
             logger.info(f"已删除API密钥: {key_id}")
@@ -409,6 +644,7 @@ class APIKeyManager:
         else:
             return False
 
+    @_with_key_lock
     def rotate_key(
         self,
         old_key_id: str,
@@ -442,44 +678,75 @@ class APIKeyManager:
             # 确保过期时间不为负数
             expires_in = max(0, int(remaining))
 
-        # 添加新密钥
-        new_key_id = self.add_key(
-            provider=old_key.provider,
-            key_value=new_key_value,
-            environment=old_key.environment,
-            expires_in=expires_in,
-            metadata=old_key.metadata
-        )
-
-        if not new_key_id:
-            return None
+        # 添加新密钥与修改旧密钥状态合并为一次写入
+        with self._batch():
+            new_key_id = self.add_key(
+                provider=old_key.provider,
+                key_value=new_key_value,
+                environment=old_key.environment,
+                expires_in=expires_in,
+                metadata=old_key.metadata
+            )
+
+            if not new_key_id:
+                return None
 
-        # 验证新密钥ID与旧密钥ID不同
-        if new_key_id == old_key_id:
-            logger.error(f"新密钥ID与旧密钥ID相同: {new_key_id}")
-            return None
+            # 验证新密钥ID与旧密钥ID不同
+            if new_key_id == old_key_id:
+                logger.error(f"新密钥ID与旧密钥ID相同: {new_key_id}")
+                return None
 
-        # 设置旧密钥为待刷新状态
-        self._keys_cache[old_key_id].status = KeyStatus.PENDING_REFRESH
-        self._save_keys()
+            # 设置旧密钥为待刷新状态
+            self._set_status(self._keys_cache[old_key_id], KeyStatus.PENDING_REFRESH)
+            self._save_keys()
 
         # 设置宽限期后自动过期
         if grace_period > 0:
-            def _expire_old_key():
-                time.sleep(grace_period)
-                if old_key_id in self._keys_cache:
-                    old_key_info = self._keys_cache[old_key_id]
-                    if old_key_info is not None:
-                        old_key_info.status = KeyStatus.EXPIRED
-                        self._save_keys()
-                        logger.info(f"宽限期结束，旧密钥 {old_key_id} 已过期")
-
-            import threading
-            threading.Thread(target=_expire_old_key, daemon=True).start()
+            self._schedule_expiry(old_key_id, grace_period)
 
         logger.info(f"已轮换密钥: {old_key_id} -> {new_key_id}")
         return new_key_id
 
+    def _schedule_expiry(self, key_id: str, delay: float) -> None:
+        """安排密钥在delay秒后过期；所有轮换共用一个后台线程"""
+        with self._expiry_cond:
+            heapq.heappush(self._expiry_heap, (time.monotonic() + delay, key_id))
+            if self._expiry_thread is None:
+                self._expiry_thread = threading.Thread(
+                    target=self._expiry_worker, name="api-key-expiry", daemon=True
+                )
+                self._expiry_thread.start()
+            self._expiry_cond.notify()
+
+    def _expiry_worker(self) -> None:
+        """等待堆顶密钥到期并将其置为过期"""
+        while True:
+            key_id = self._next_expired()
+            # 条件变量只保护到期堆；修改密钥与写文件在_lock内进行，不阻塞新的调度
+            with self._lock:
+                key_info = self._keys_cache.get(key_id)
+                if key_info is None:
+                    continue
+                self._set_status(key_info, KeyStatus.EXPIRED)
+                self._save_keys()
+            logger.info(f"宽限期结束，旧密钥 {key_id} 已过期")
+
+    def _next_expired(self) -> str:
+        """阻塞直到堆顶密钥到期，弹出并返回其ID"""
+        heap = self._expiry_heap
+        with self._expiry_cond:
+            while True:
+                if not heap:
+                    self._expiry_cond.wait()
+                    continue
+                delay = heap[0][0] - time.monotonic()
+                if delay > 0:
+                    # 新的更早到期项入堆时会被notify唤醒
+                    self._expiry_cond.wait(delay)
+                    continue
+                return heapq.heappop(heap)[1]
+
+    @_with_key_lock
     def validate_key(self, key_id: str) -> Dict[str, Any]:
         """
         验证API密钥有效性
@@ -533,36 +800,34 @@ class APIKeyManager:
 
         return result
 
+    @_with_key_lock
     def get_stats(self) -> Dict[str, Any]:
-        """获取密钥统计信息"""
+        """获取密钥统计信息（由提供商/状态索引计算，不遍历密钥对象）"""
         total_keys = len(self._keys_cache)
-        active_keys = len([k for k in self._keys_cache.values() if k is not None and k.status == KeyStatus.ACTIVE])
-        expired_keys = len([k for k in self._keys_cache.values() if k is not None and k.status == KeyStatus.EXPIRED])
+        active_ids = self._by_status.get(KeyStatus.ACTIVE, set())
+        expired_ids = self._by_status.get(KeyStatus.EXPIRED, set())
 
         # 按提供商统计
-        providers = {}
-        for key_info in self._keys_cache.values():
-            if key_info is None:
-                continue
-
-            provider = key_info.provider
-            if provider not in providers:
-                providers[provider] = {"total": 0, "active": 0, "expired": 0}
-            providers[provider]["total"] += 1
-            if key_info.status == KeyStatus.ACTIVE:
-                providers[provider]["active"] += 1
-            elif key_info.status == KeyStatus.EXPIRED:
-                providers[provider]["expired"] += 1
+        providers = {
+            provider: {
+                "total": len(ids),
+                "active": len(ids & active_ids),
+                "expired": len(ids & expired_ids),
+            }
+            for provider, ids in self._by_provider.items()
+            if ids
+        }
 
         return {
             "total_keys": total_keys,
-            "active_keys": active_keys,
-            "expired_keys": expired_keys,
+            "active_keys": len(active_ids),
+            "expired_keys": len(expired_ids),
             "providers": providers,
             "storage_path": self.storage_path,
             "encryption_enabled": bool(self.encryption_key),
         }
 
+    @_with_key_lock
     def backup_keys(self, backup_path: Optional[str] = None) -> bool:
         """
         备份密钥
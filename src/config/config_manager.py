@@ -4,15 +4,126 @@
 支持YAML/JSON格式配置文件，提供默认配置和用户配置合并，支持配置热重载。
 """
 
+import functools
 import os
 import yaml
 import json
-from typing import Dict, Any, Optional
+from typing import Callable, Dict, Any, List, Optional, Sequence, Tuple
 import logging
 from pathlib import Path
 
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # pragma: no cover - optional dependency
+    FileSystemEventHandler = object
+    Observer = None
+
+# PyYAML编译了libyaml时使用C实现的安全加载/输出器
+try:
+    from yaml import CSafeLoader as _SafeLoader, CSafeDumper as _SafeDumper
+except ImportError:  # pragma: no cover - PyYAML未编译libyaml
+    from yaml import SafeLoader as _SafeLoader, SafeDumper as _SafeDumper
+
 logger = logging.getLogger(__name__)
 
+# 环境变量 -> 配置路径映射（模块加载时构建一次）
+_ENV_MAPPING: Tuple[Tuple[str, str], ...] = (
+    # LLM配置
+    ("DEEPSEEK_API_KEY", "llm.deepseek.api_key"),
+    ("DEEPSEEK_API_BASE", "llm.deepseek.api_base"),
+    ("LLM_PROVIDER", "llm.provider"),
+    ("LLM_MODEL_NAME", "llm.model_name"),
+    ("LLM_MAX_TOKENS", "llm.max_tokens"),
+    ("LLM_TEMPERATURE", "llm.temperature"),
+    ("LLM_TIMEOUT", "llm.timeout"),
+    ("LLM_MAX_RETRIES", "llm.max_retries"),
+
+    # 记忆库配置
+    ("MEMORY_MAX_ENTRIES", "memory.max_entries"),
+    ("MEMORY_PERSISTENCE_PATH", "memory.persistence_path"),
+    ("MEMORY_WORKS_DIR", "memory.works_dir"),
+    ("MEMORY_BACKUP_DIR", "memory.backup_dir"),
+    ("MEMORY_PRUNE_RATIO", "memory.prune_ratio"),
+
+    # Agent配置
+    ("AGENT_MAX_ITERATIONS", "agent.max_iterations"),
+    ("AGENT_RETRIEVAL_K", "agent.retrieval_k"),
+    ("AGENT_ENABLE_PERSISTENCE", "agent.enable_persistence"),
+    ("AGENT_AUTO_SAVE", "agent.auto_save"),
+    ("AGENT_SAVE_INTERVAL", "agent.save_interval"),
+
+    # 日志配置
+    ("LOG_LEVEL", "logging.level"),
+    ("LOG_FILE_PATH", "logging.file_path"),
+    ("LOG_MAX_FILE_SIZE", "logging.max_file_size"),
+    ("LOG_BACKUP_COUNT", "logging.backup_count"),
+)
+_ENV_NAMES = frozenset(key for key, _ in _ENV_MAPPING)
+
+
+# 配置值不做缓存（config及其嵌套dict可被直接修改），只缓存点号路径的拆分结果
+@functools.lru_cache(maxsize=256)
+def _split_key(key: str) -> Tuple[str, ...]:
+    return tuple(key.split('.'))
+
+
+def _to_bool(value: str) -> bool:
+    return str(value).lower() in ('true', '1', 'yes', 'y')
+
+
+def _try_convert(convert: Callable[[str], Any]) -> Callable[[str], Any]:
+    """转换失败时保留原字符串"""
+    def _convert(value: str) -> Any:
+        try:
+            return convert(value)
+        except ValueError:
+            return value
+    return _convert
+
+
+_TO_INT = _try_convert(int)
+_TO_FLOAT = _try_convert(float)
+
+
+def _coercer_for(default: Any) -> Optional[Callable[[str], Any]]:
+    """按默认值类型选择环境变量字符串的转换函数（bool须先于int判断）"""
+    if isinstance(default, bool):
+        return _to_bool
+    if isinstance(default, int):
+        return _TO_INT
+    if isinstance(default, float):
+        return _TO_FLOAT
+    return None
+
+
+class _ConfigFileHandler(FileSystemEventHandler):
+    """配置文件变更事件处理器：只标记待重载，由reload_if_changed执行重载"""
+
+    def __init__(self, manager: "ConfigManager"):
+        super().__init__()
+        self._manager = manager
+
+    def _mark(self, *paths) -> None:
+        target = os.path.abspath(self._manager.config_path or "")
+        if any(path and os.path.abspath(path) == target for path in paths):
+            self._manager._reload_pending = True
+
+    # 只响应写入类事件；加载配置本身产生的打开/关闭事件不应触发重载
+    def on_modified(self, event) -> None:
+        self._mark(event.src_path)
+
+    def on_created(self, event) -> None:
+        self._mark(event.src_path)
+
+    def on_moved(self, event) -> None:
+        self._mark(event.dest_path)
+
 
 class ConfigManager:
     """配置管理器"""
@@ -35,10 +146,16 @@ class ConfigManager:
         self.env_prefix = env_prefix
         self.config: Dict[str, Any] = {}
         self.default_config = default_config or self._get_default_config()
+        # 环境变量 -> (拆分后的配置路径, 按默认值类型预先确定的转换函数)，构造时编译一次
+        self._env_paths = self._compile_env_paths()
         self._last_modified = 0
+        # 安装watchdog时由文件事件标记待重载，reload_if_changed无需每次stat配置文件
+        self._observer = None
+        self._reload_pending = False
 
         # 加载配置
         self.load()
+        self._start_watcher()
 
     def _get_default_config(self) -> Dict[str, Any]:
         """获取内置默认配置"""
@@ -147,9 +264,11 @@ class ConfigManager:
         try:
             with open(filepath, 'r', encoding='utf-8') as f:
                 if filepath.endswith('.json'):
+                    if orjson is not None:
+                        return orjson.loads(f.read())
                     return json.load(f)
                 else:  # yaml/yml
-                    return yaml.safe_load(f)
+                    return yaml.load(f, Loader=_SafeLoader)
         except Exception as e:
             logger.error(f"读取配置文件失败 {filepath}: {e}")
             return None
@@ -162,48 +281,47 @@ class ConfigManager:
             else:
                 base[key] = value
 
+    def _compile_env_paths(
+        self,
+    ) -> List[Tuple[str, str, Tuple[str, ...], Optional[Callable[[str], Any]]]]:
+        """预先拆分配置路径，并按默认配置中对应叶子的类型确定转换函数"""
+        compiled = []
+        for env_key, config_path in _ENV_MAPPING:
+            keys = tuple(config_path.split('.'))
+            default: Any = self.default_config
+            for key in keys:
+                default = default.get(key) if isinstance(default, dict) else None
+            compiled.append((env_key, self.env_prefix + env_key, keys, _coercer_for(default)))
+        return compiled
+
     def _load_from_env(self) -> None:
         """从环境变量加载配置"""
-        env_vars = {
-            # LLM配置
-            "DEEPSEEK_API_KEY": "llm.deepseek.api_key",
-            "DEEPSEEK_API_BASE": "llm.deepseek.api_base",
-            "LLM_PROVIDER": "llm.provider",
-            "LLM_MODEL_NAME": "llm.model_name",
-            "LLM_MAX_TOKENS": "llm.max_tokens",
-            "LLM_TEMPERATURE": "llm.temperature",
-            "LLM_TIMEOUT": "llm.timeout",
-            "LLM_MAX_RETRIES": "llm.max_retries",
-
-            # 记忆库配置
-            "MEMORY_MAX_ENTRIES": "memory.max_entries",
-            "MEMORY_PERSISTENCE_PATH": "memory.persistence_path",
-            "MEMORY_WORKS_DIR": "memory.works_dir",
-            "MEMORY_BACKUP_DIR": "memory.backup_dir",
-            "MEMORY_PRUNE_RATIO": "memory.prune_ratio",
-
-            # Agent配置
-            "AGENT_MAX_ITERATIONS": "agent.max_iterations",
-            "AGENT_RETRIEVAL_K": "agent.retrieval_k",
-            "AGENT_ENABLE_PERSISTENCE": "agent.enable_persistence",
-            "AGENT_AUTO_SAVE": "agent.auto_save",
-            "AGENT_SAVE_INTERVAL": "agent.save_interval",
-
-            # 日志配置
-            "LOG_LEVEL": "logging.level",
-            "LOG_FILE_PATH": "logging.file_path",
-            "LOG_MAX_FILE_SIZE": "logging.max_file_size",
-            "LOG_BACKUP_COUNT": "logging.backup_count",
-        }
+        # 先与os.environ求交集，只对实际设置了的变量逐个处理
+        environ = os.environ
+        names = environ.keys()
+        present = names & ({prefixed for _, prefixed, _, _ in self._env_paths} | _ENV_NAMES)
+        if not present:
+            return
+
+        for env_key, prefixed, keys, coerce in self._env_paths:
+            if prefixed in present:
+                value = environ[prefixed]
+            elif env_key in present:
+                value = environ[env_key]
+            else:
+                continue
 
-        for env_key, config_path in env_vars.items():
-            value = os.getenv(f"{self.env_prefix}{env_key}", os.getenv(env_key))
-            if value is not None:
-                self._set_nested_config(self.config, config_path, value)
+            current = self.config
+            for key in keys[:-1]:
+                current = current.setdefault(key, {})
+            current[keys[-1]] = coerce(value) if coerce is not None else value
 
     def _set_nested_config(self, config: Dict[str, Any], path: str, value: Any) -> None:
         """设置嵌套配置值"""
-        keys = path.split('.')
+        self._set_nested_keys(config, path.split('.'), value)
+
+    def _set_nested_keys(self, config: Dict[str, Any], keys: Sequence[str], value: Any) -> None:
+        """按已拆分的键路径设置嵌套配置值"""
         current = config
         for key in keys[:-1]:
             if key not in current:
@@ -239,9 +357,8 @@ class ConfigManager:
             配置值
         """
         try:
-            keys = key.split('.')
             current = self.config
-            for k in keys:
+            for k in _split_key(key):
                 current = current[k]
             return current
         except (KeyError, TypeError):
@@ -277,11 +394,26 @@ class ConfigManager:
             # 确保目录存在
             os.makedirs(os.path.dirname(path), exist_ok=True)
 
-            with open(path, 'w', encoding='utf-8') as f:
-                if path.endswith('.json'):
-                    json.dump(self.config, f, indent=2, ensure_ascii=False)
-                else:
-                    yaml.dump(self.config, f, default_flow_style=False, allow_unicode=True)
+            if path.endswith('.json'):
+                content = None
+                if orjson is not None:
+                    try:
+                        content = orjson.dumps(self.config, option=orjson.OPT_INDENT_2).decode()
+                    except TypeError:
+                        pass  # orjson不支持的值（如非字符串键）退回标准库
+                if content is None:
+                    content = json.dumps(self.config, indent=2, ensure_ascii=False)
+                with open(path, 'w', encoding='utf-8') as f:
+                    f.write(content)
+            else:
+                with open(path, 'w', encoding='utf-8') as f:
+                    yaml.dump(
+                        self.config,
+                        f,
+                        Dumper=_SafeDumper,
+                        default_flow_style=False,
+                        allow_unicode=True,
+                    )
 
             logger.info(f"配置已保存到: {path}")
             return True
@@ -290,6 +422,30 @@ class ConfigManager:
             logger.error(f"保存配置失败: {e}")
             return False
 
+    def _start_watcher(self) -> None:
+        """监听配置文件所在目录（inotify/FSEvents等）；未安装watchdog时退回mtime轮询"""
+        if Observer is None or not self.config_path or self._observer is not None:
+            return
+        try:
+            observer = Observer()
+            observer.schedule(
+                _ConfigFileHandler(self),
+                os.path.dirname(os.path.abspath(self.config_path)),
+                recursive=False,
+            )
+            observer.daemon = True
+            observer.start()
+        except Exception as e:
+            logger.warning(f"启动配置文件监听失败，使用mtime轮询: {e}")
+            return
+        self._observer = observer
+
+    def close(self) -> None:
+        """停止配置文件监听"""
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer = None
+
     def reload_if_changed(self) -> bool:
         """
         如果配置文件有修改则重新加载
@@ -297,6 +453,14 @@ class ConfigManager:
         Returns:
             是否重新加载了配置
         """
+        if self._observer is not None:
+            if not self._reload_pending:
+                return False
+            self._reload_pending = False
+            logger.info(f"配置文件已修改，重新加载: {self.config_path}")
+            self.load()
+            return True
+
         if not self.config_path or not os.path.exists(self.config_path):
             return False
 
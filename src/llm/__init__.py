@@ -4,33 +4,59 @@ LLM模块
 提供统一的LLM调用接口，支持DeepSeek、Kimi、Mimo API和模拟LLM。
 """
 
+import importlib
+
 from .llm_interface import LLMInterface, LLMClientBase
-try:
-    from .deepseek_client import DeepSeekClient
-except Exception:
-    DeepSeekClient = None
-try:
-    from .kimi_client import KimiClient
-except Exception:
-    KimiClient = None
-try:
-    from .mimo_client import MimoClient
-except Exception:
-    MimoClient = None
-from .mock_llm import MockLLM, DeterministicMockLLM, MockLLMAdapter
-from .llm_interface_enhanced import EnhancedLLMInterface, EnhancedLLMClientBase, LLMResponse, LLMCallMode
-try:
-    from .deepseek_client_enhanced import EnhancedDeepSeekClient
-except Exception:
-    EnhancedDeepSeekClient = None
-try:
-    from .kimi_client_enhanced import EnhancedKimiClient
-except Exception:
-    EnhancedKimiClient = None
-try:
-    from .mimo_client_enhanced import EnhancedMimoClient
-except Exception:
-    EnhancedMimoClient = None
+
+# 其余导出按需导入（PEP 562）：只用MockLLM时不解析各客户端及其openai/httpx依赖
+_LAZY = {
+    "DeepSeekClient": ".deepseek_client",
+    "KimiClient": ".kimi_client",
+    "MimoClient": ".mimo_client",
+    "MockLLM": ".mock_llm",
+    "DeterministicMockLLM": ".mock_llm",
+    "MockLLMAdapter": ".mock_llm",
+    "BatchingLLM": ".batching",
+    "CachedLLM": ".prompt_cache",
+    "EnhancedLLMInterface": ".llm_interface_enhanced",
+    "EnhancedLLMClientBase": ".llm_interface_enhanced",
+    "LLMResponse": ".llm_interface_enhanced",
+    "LLMCallMode": ".llm_interface_enhanced",
+    "EnhancedDeepSeekClient": ".deepseek_client_enhanced",
+    "EnhancedKimiClient": ".kimi_client_enhanced",
+    "EnhancedMimoClient": ".mimo_client_enhanced",
+    "enable_orjson": "._clients",
+    "disable_orjson": "._clients",
+}
+
+# 依赖可选第三方库的客户端，缺少依赖（ImportError）时导出None；其他异常照常抛出
+_OPTIONAL = {
+    "DeepSeekClient",
+    "KimiClient",
+    "MimoClient",
+    "EnhancedDeepSeekClient",
+    "EnhancedKimiClient",
+    "EnhancedMimoClient",
+}
+
+
+def __getattr__(name):
+    module_name = _LAZY.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    try:
+        value = getattr(importlib.import_module(module_name, __name__), name)
+    except ImportError:
+        if name not in _OPTIONAL:
+            raise
+        value = None
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY))
+
 
 __all__ = [
     # 基础接口
@@ -54,11 +80,21 @@ __all__ = [
     "DeterministicMockLLM",
     "MockLLMAdapter",
 
+    # 请求批处理
+    "BatchingLLM",
+
+    # 提示词缓存
+    "CachedLLM",
+
     # 增强接口
     "EnhancedLLMInterface",
     "EnhancedLLMClientBase",
     "LLMResponse",
     "LLMCallMode",
+
+    # OpenAI SDK的orjson编解码（显式启用）
+    "enable_orjson",
+    "disable_orjson",
 ]
 
 __version__ = "1.0.0"
@@ -0,0 +1,95 @@
+"""
+LLM响应磁盘缓存
+
+以(模型, 提示词, 采样参数)规范化JSON的SHA-256为键，将响应文本保存在本地SQLite
+文件中。重复运行示例或调试同一批提示词时可直接命中，不再访问网络。
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = ".llm-cache"
+
+
+class LLMResponseCache:
+    """基于SQLite的内容寻址LLM响应缓存"""
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR):
+        """
+        初始化响应缓存
+
+        Args:
+            cache_dir: 缓存目录，缓存文件为其中的responses.sqlite3
+        """
+        os.makedirs(cache_dir, exist_ok=True)
+        self.cache_dir = cache_dir
+        self.path = os.path.join(cache_dir, "responses.sqlite3")
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._conn.commit()
+
+    @staticmethod
+    def make_key(model: str, prompt: str, temperature: Any, max_tokens: Any) -> str:
+        """
+        生成缓存键
+
+        Args:
+            model: 模型名称
+            prompt: 提示词
+            temperature: 温度参数
+            max_tokens: 最大生成令牌数
+
+        Returns:
+            规范化请求的SHA-256十六进制摘要
+        """
+        payload = json.dumps(
+            {"m": model, "p": prompt, "t": temperature, "mt": max_tokens},
+            sort_keys=True,
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """读取缓存的响应，未命中返回None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, value: str) -> None:
+        """写入响应"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, created_at) VALUES (?, ?, ?)",
+                (key, value, time.time()),
+            )
+            self._conn.commit()
+
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def close(self) -> None:
+        """关闭底层数据库连接"""
+        with self._lock:
+            self._conn.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
@@ -0,0 +1,194 @@
+"""
+共享OpenAI客户端
+
+按(API密钥, API地址, 超时, 最大连接数)分别缓存OpenAI与AsyncOpenAI客户端，同一
+服务的所有客户端实例共用底层httpx连接池，TCP与TLS握手可跨实例复用，也避免每个
+实例各自持有小连接池时出现httpx.PoolTimeout。同步与异步客户端各自在首次获取时创建，
+只用同步调用时不会建立异步连接池。安装h2时启用HTTP/2。
+
+安装orjson时可调用enable_orjson()，把OpenAI SDK的请求体序列化与流式SSE数据块
+解析换成orjson（修改SDK私有模块，仅对验证过的openai版本默认生效）；orjson不支持的
+值退回标准库json。导入本模块不做任何替换。
+"""
+
+import functools
+import json
+import logging
+import types
+
+from openai import AsyncOpenAI, OpenAI
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover - openai自带httpx依赖，缺失时使用其默认客户端
+    httpx = None
+
+try:
+    import h2  # noqa: F401
+    HAS_HTTP2 = True
+except ImportError:  # pragma: no cover - optional dependency
+    HAS_HTTP2 = False
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_CONNECTIONS = 1000
+DEFAULT_MAX_KEEPALIVE = 200
+
+
+def _limits(max_connections: int):
+    """连接池上限：keep-alive连接数不超过总连接数"""
+    return httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=min(DEFAULT_MAX_KEEPALIVE, max_connections),
+    )
+
+
+@functools.lru_cache(maxsize=8)
+def shared_client(
+    api_key: str,
+    api_base: str,
+    timeout: float,
+    max_connections: int = DEFAULT_MAX_CONNECTIONS,
+) -> OpenAI:
+    """
+    获取共享的同步OpenAI客户端
+
+    Args:
+        api_key: API密钥
+        api_base: API基础URL
+        timeout: 请求超时时间（秒）
+        max_connections: 连接池最大连接数
+
+    Returns:
+        OpenAI客户端；相同参数返回同一实例
+    """
+    if httpx is None:
+        return OpenAI(api_key=api_key, base_url=api_base, timeout=timeout)
+    http_client = httpx.Client(
+        limits=_limits(max_connections), timeout=timeout, http2=HAS_HTTP2
+    )
+    logger.debug(f"创建共享OpenAI客户端 - {api_base}, 最大连接数: {max_connections}")
+    return OpenAI(api_key=api_key, base_url=api_base, timeout=timeout, http_client=http_client)
+
+
+@functools.lru_cache(maxsize=8)
+def shared_async_client(
+    api_key: str,
+    api_base: str,
+    timeout: float,
+    max_connections: int = DEFAULT_MAX_CONNECTIONS,
+) -> AsyncOpenAI:
+    """
+    获取共享的异步OpenAI客户端，参数与shared_client一致
+
+    Returns:
+        AsyncOpenAI客户端；相同参数返回同一实例
+    """
+    if httpx is None:
+        return AsyncOpenAI(api_key=api_key, base_url=api_base, timeout=timeout)
+    http_client = httpx.AsyncClient(
+        limits=_limits(max_connections), timeout=timeout, http2=HAS_HTTP2
+    )
+    logger.debug(f"创建共享AsyncOpenAI客户端 - {api_base}, 最大连接数: {max_connections}")
+    return AsyncOpenAI(
+        api_key=api_key, base_url=api_base, timeout=timeout, http_client=http_client
+    )
+
+
+# enable_orjson验证过的openai版本（主版本, 次版本），与依赖声明openai>=1.12.0,<1.14.0一致；
+# 替换依赖SDK私有模块，其他版本需force=True
+ORJSON_TESTED_OPENAI_VERSIONS = frozenset({(1, 12), (1, 13)})
+
+# 启用后保存被替换的(模块, 属性名, 原值)，disable_orjson据此还原
+_orjson_originals = None
+
+
+def _openai_version():
+    import openai
+
+    try:
+        return tuple(int(part) for part in openai.__version__.split(".")[:2])
+    except (AttributeError, ValueError):  # pragma: no cover - 非常规版本号
+        return None
+
+
+def enable_orjson(force: bool = False) -> bool:
+    """
+    让OpenAI SDK使用orjson编解码JSON（需显式调用，导入本模块不会修改SDK）
+
+    替换openai._streaming中的json，使每个SSE数据块用orjson解析；SDK提供
+    openai._utils._json.openapi_dumps时（较新版本）一并替换请求体序列化，
+    openai 1.12/1.13的请求体仍由httpx序列化。对进程内所有openai客户端生效，
+    非流式响应体仍由httpx解析。
+
+    Args:
+        force: openai版本不在ORJSON_TESTED_OPENAI_VERSIONS中时是否仍然替换
+
+    Returns:
+        是否已启用；未安装orjson、版本未验证或SDK内部结构不符合预期时返回False
+    """
+    global _orjson_originals
+    if _orjson_originals is not None:
+        return True
+    if orjson is None:
+        return False
+    version = _openai_version()
+    if not force and version not in ORJSON_TESTED_OPENAI_VERSIONS:
+        logger.warning(f"openai版本{version}未验证orjson替换，保持标准库json；可传入force=True")
+        return False
+    try:
+        from openai import _base_client, _streaming
+
+        if _streaming.json is not json:
+            raise AttributeError("openai._streaming的json用法已变化")
+    except (ImportError, AttributeError) as e:  # pragma: no cover - 依赖SDK内部结构
+        logger.warning(f"未启用orjson编解码: {e}")
+        return False
+
+    def loads(data, **kwargs):
+        return orjson.loads(data) if not kwargs else json.loads(data, **kwargs)
+
+    json_shim = types.ModuleType("json")
+    json_shim.__dict__.update(
+        {name: value for name, value in vars(json).items() if not name.startswith("__")}
+    )
+    json_shim.loads = loads
+    patches = [(_streaming, "json", json_shim)]
+
+    try:
+        from openai._utils import _json as openai_json
+    except ImportError:
+        openai_json = None
+    stdlib_dumps = getattr(openai_json, "openapi_dumps", None)
+    if stdlib_dumps is not None and getattr(_base_client, "openapi_dumps", None) is stdlib_dumps:
+        encoder = openai_json._CustomEncoder()
+
+        def openapi_dumps(obj) -> bytes:
+            # datetime由orjson原生处理，pydantic模型交给SDK的编码器；非字符串键等退回标准库
+            try:
+                return orjson.dumps(obj, default=encoder.default)
+            except TypeError:
+                return stdlib_dumps(obj)
+
+        patches.append((_base_client, "openapi_dumps", openapi_dumps))
+
+    _orjson_originals = [(module, name, getattr(module, name)) for module, name, _ in patches]
+    for module, name, value in patches:
+        setattr(module, name, value)
+    logger.debug("OpenAI SDK已启用orjson编解码")
+    return True
+
+
+def disable_orjson() -> None:
+    """还原enable_orjson替换的SDK序列化与解析函数"""
+    global _orjson_originals
+    if _orjson_originals is None:
+        return
+    for module, name, value in _orjson_originals:
+        setattr(module, name, value)
+    _orjson_originals = None
@@ -0,0 +1,298 @@
+"""
+LLM请求限流与重试
+
+按(API地址, 模型)在进程内共享一个令牌桶，请求发出前先取令牌，把并发客户端的请求
+速率压在服务端限额之下，减少落到网络上的429。桶内维护最近429比例的EWMA，比例升高
+时按比例收缩发放速率，恢复后逐步回到设定速率。
+
+收到RateLimitError时优先按响应头Retry-After等待，没有时退回指数退避，两者都加
+±20%抖动，避免多个客户端在同一时刻集中重试。其余API错误只对RETRYABLE_STATUS中的
+状态码（及没有状态码的连接错误）重试，其他状态码立即失败。call_with_retry /
+acall_with_retry把取令牌、重试等待与失败汇总封装为各客户端共用的同步/异步循环。
+"""
+
+import asyncio
+import email.utils
+import functools
+import logging
+import os
+import random
+import threading
+import time
+from typing import Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+
+from openai import APIError, APITimeoutError, RateLimitError
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# 默认速率（请求/秒）与突发容量，可用环境变量LLM_RATE_LIMIT / LLM_RATE_BURST覆盖
+DEFAULT_RATE = 10.0
+DEFAULT_BURST = 20
+# 429比例EWMA的平滑系数与速率收缩下限
+EWMA_ALPHA = 0.2
+MIN_RATE_FACTOR = 0.1
+JITTER = 0.2
+# 可重试的HTTP状态码：超时、冲突、过早请求、限流与网关/服务暂时不可用
+RETRYABLE_STATUS = frozenset({408, 409, 425, 429, 500, 502, 503, 504})
+
+
+class TokenBucket:
+    """线程安全的令牌桶，支持同步与异步取令牌"""
+
+    def __init__(self, rate_per_s: float = DEFAULT_RATE, burst: int = DEFAULT_BURST):
+        """
+        初始化令牌桶
+
+        Args:
+            rate_per_s: 每秒补充的令牌数
+            burst: 桶容量，即允许的突发请求数
+        """
+        if rate_per_s <= 0 or burst <= 0:
+            raise ValueError(f"rate_per_s与burst必须为正数，实际值: {rate_per_s}, {burst}")
+        self.base_rate = float(rate_per_s)
+        self.rate = float(rate_per_s)
+        self.burst = burst
+        self.throttle_ewma = 0.0
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self, tokens: float) -> float:
+        """预占令牌，返回需要等待的秒数（令牌不足时余额记为负数，由等待偿还）"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= tokens
+            return -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+    def acquire(self, tokens: float = 1.0) -> None:
+        """取令牌，不足时阻塞等待"""
+        wait = self._reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens: float = 1.0) -> None:
+        """异步取令牌，不足时让出事件循环等待"""
+        wait = self._reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def record(self, throttled: bool) -> None:
+        """
+        记录一次请求结果并调整发放速率
+
+        Args:
+            throttled: 该请求是否收到429
+        """
+        with self._lock:
+            self.throttle_ewma += EWMA_ALPHA * (float(throttled) - self.throttle_ewma)
+            self.rate = self.base_rate * max(MIN_RATE_FACTOR, 1.0 - self.throttle_ewma)
+
+
+_buckets: Dict[Tuple[str, str], TokenBucket] = {}
+_buckets_lock = threading.Lock()
+
+
+def get_bucket(api_base: str, model: str) -> TokenBucket:
+    """获取(API地址, 模型)共享的令牌桶，首次使用时按环境变量配置创建"""
+    key = (api_base, model)
+    bucket = _buckets.get(key)
+    if bucket is None:
+        with _buckets_lock:
+            bucket = _buckets.get(key)
+            if bucket is None:
+                bucket = TokenBucket(
+                    float(os.getenv("LLM_RATE_LIMIT", DEFAULT_RATE)),
+                    int(os.getenv("LLM_RATE_BURST", DEFAULT_BURST)),
+                )
+                _buckets[key] = bucket
+    return bucket
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """
+    从异常的HTTP响应头读取Retry-After
+
+    Returns:
+        建议等待的秒数；响应头缺失或无法解析时返回None
+    """
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return max(float(value) / 1000.0, 0.0)
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        # HTTP-date格式
+        return max(email.utils.parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable(error: Exception) -> bool:
+    """API错误是否值得重试：没有状态码（连接错误等）或状态码在RETRYABLE_STATUS中"""
+    status = getattr(error, "status_code", None)
+    return status is None or status in RETRYABLE_STATUS
+
+
+def rate_limit_wait(error: Exception, attempt: int) -> float:
+    """
+    计算RateLimitError后的重试等待秒数
+
+    Args:
+        error: RateLimitError异常
+        attempt: 当前重试序号（从0开始）
+
+    Returns:
+        Retry-After或指数退避秒数，加±20%抖动
+    """
+    wait = retry_after(error)
+    if wait is None:
+        wait = 2 ** attempt
+    return wait * random.uniform(1.0 - JITTER, 1.0 + JITTER)
+
+
+def _on_rate_limit(
+    error: Exception, attempt: int, bucket: Optional[TokenBucket]
+) -> Optional[float]:
+    if bucket is not None:
+        bucket.record(True)
+    # 优先遵循Retry-After，否则指数退避，均带抖动
+    wait_time = rate_limit_wait(error, attempt)
+    logger.warning(f"API速率限制，第{attempt + 1}次重试，等待{wait_time:.1f}秒: {error}")
+    return wait_time
+
+
+def _on_timeout(
+    error: Exception, attempt: int, bucket: Optional[TokenBucket]
+) -> Optional[float]:
+    wait_time = min(2 ** attempt, 8) + random.uniform(0, 0.5)
+    logger.warning(f"API请求超时，第{attempt + 1}次重试，等待{wait_time:.1f}秒: {error}")
+    return wait_time
+
+
+def _on_api_error(
+    error: Exception, attempt: int, bucket: Optional[TokenBucket]
+) -> Optional[float]:
+    logger.error(f"API错误: {error}")
+    # 非重试性错误（如400/401/403/404）直接失败，不再等待
+    return 1 if is_retryable(error) else None
+
+
+def _on_unknown(
+    error: Exception, attempt: int, bucket: Optional[TokenBucket]
+) -> Optional[float]:
+    logger.error(f"未知错误: {error}")
+    return None
+
+
+_RetryHandler = Callable[[Exception, int, Optional[TokenBucket]], Optional[float]]
+
+# 异常类型 -> 等待时间计算函数；RateLimitError与APITimeoutError都是APIError的子类
+_RETRY_HANDLERS: Dict[type, _RetryHandler] = {
+    RateLimitError: _on_rate_limit,
+    APITimeoutError: _on_timeout,
+    APIError: _on_api_error,
+}
+
+
+@functools.lru_cache(maxsize=64)
+def _retry_handler(error_type: type) -> _RetryHandler:
+    """按MRO找到最具体的处理函数，结果按异常类型缓存"""
+    for cls in error_type.__mro__:
+        handler = _RETRY_HANDLERS.get(cls)
+        if handler is not None:
+            return handler
+    return _on_unknown
+
+
+def retry_wait(
+    error: Exception, attempt: int, bucket: Optional[TokenBucket] = None
+) -> Optional[float]:
+    """
+    根据异常类型计算重试前的等待秒数
+
+    Args:
+        error: 本次请求的异常
+        attempt: 当前重试序号（从0开始）
+        bucket: 请求所用的令牌桶，收到429时记录以收缩发放速率
+
+    Returns:
+        等待秒数；不应重试时返回None
+    """
+    return _retry_handler(type(error))(error, attempt, bucket)
+
+
+def _retries_exhausted(description: str, max_retries: int, last_error: Optional[Exception]):
+    error_msg = f"{description}，已重试{max_retries}次: {last_error}"
+    logger.error(error_msg)
+    return Exception(error_msg)
+
+
+def call_with_retry(
+    create: Callable[[], T], bucket: TokenBucket, max_retries: int, description: str
+) -> Tuple[T, int]:
+    """
+    取令牌后调用create，失败时按retry_wait等待重试
+
+    Args:
+        create: 发出请求的函数
+        bucket: 请求所用的令牌桶
+        max_retries: 最大尝试次数
+        description: 全部失败时异常信息的前缀，如"DeepSeek API调用失败"
+
+    Returns:
+        (create的返回值, 重试次数)
+
+    Raises:
+        Exception: 当所有重试都失败或遇到不可重试的错误时抛出
+    """
+    last_error = None
+    for attempt in range(max_retries):
+        bucket.acquire()
+        try:
+            result = create()
+        except Exception as e:
+            last_error = e
+            wait_time = retry_wait(e, attempt, bucket)
+            if wait_time is None:
+                break
+            time.sleep(wait_time)
+        else:
+            bucket.record(False)
+            return result, attempt
+    raise _retries_exhausted(description, max_retries, last_error)
+
+
+async def acall_with_retry(
+    create: Callable[[], Awaitable[T]], bucket: TokenBucket, max_retries: int, description: str
+) -> Tuple[T, int]:
+    """call_with_retry的异步版本，create返回协程，等待通过asyncio.sleep完成"""
+    last_error = None
+    for attempt in range(max_retries):
+        await bucket.acquire_async()
+        try:
+            result = await create()
+        except Exception as e:
+            last_error = e
+            wait_time = retry_wait(e, attempt, bucket)
+            if wait_time is None:
+                break
+            await asyncio.sleep(wait_time)
+        else:
+            bucket.record(False)
+            return result, attempt
+    raise _retries_exhausted(description, max_retries, last_error)
@@ -0,0 +1,206 @@
+"""
+LLM响应内存缓存
+
+在进程内OrderedDict中按LRU保存响应，可选TTL过期，命中只需一次哈希查询，不再经过
+HTTPS往返。可在其后挂一个磁盘缓存（_cache.LLMResponseCache）作为后备存储：内存
+未命中时查询磁盘并回填，写入时同时写入磁盘，两层共用LLMResponseCache.make_key的键。
+
+temperature > 0时同一请求的输出本就不确定，默认不缓存，调用方需显式开启。
+InflightRequests按同一个键合并并发的相同请求，只向API发出一次。
+"""
+
+import asyncio
+import concurrent.futures
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+
+from ._cache import LLMResponseCache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAXSIZE = 4096
+
+T = TypeVar("T")
+
+
+class LLMCache:
+    """带LRU淘汰与TTL的LLM响应内存缓存，可选以磁盘缓存为后备存储"""
+
+    # 与磁盘缓存共用同一套键
+    make_key = staticmethod(LLMResponseCache.make_key)
+
+    def __init__(
+        self,
+        maxsize: int = DEFAULT_MAXSIZE,
+        ttl: Optional[float] = None,
+        backend: Optional[LLMResponseCache] = None,
+    ):
+        """
+        初始化响应缓存
+
+        Args:
+            maxsize: 内存中保留的最大条目数
+            ttl: 内存条目有效期（秒），None表示不过期
+            backend: 后备的磁盘响应缓存，为None时只使用内存缓存
+        """
+        if maxsize <= 0:
+            raise ValueError(f"maxsize必须为正数，实际值: {maxsize}")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.backend = backend
+        self._lock = threading.Lock()
+        # 键 -> (响应, 过期时刻monotonic或None)
+        self._entries: "OrderedDict[str, Tuple[str, Optional[float]]]" = OrderedDict()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    @staticmethod
+    def cacheable(temperature: float, force: bool = False) -> bool:
+        """temperature为0或调用方显式开启时才缓存"""
+        return force or not temperature
+
+    def get(self, key: str) -> Optional[str]:
+        """读取缓存的响应，内存未命中时查询后备存储，均未命中或已过期返回None"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at is None or expires_at > now:
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return value
+                del self._entries[key]
+
+        value = self.backend.get(key) if self.backend is not None else None
+        with self._lock:
+            if value is None:
+                self._stats["misses"] += 1
+                return None
+            self._put(key, value, now)
+            self._stats["hits"] += 1
+        return value
+
+    def set(self, key: str, value: str) -> None:
+        """写入响应（同时写入后备存储）"""
+        if not value:
+            return
+        with self._lock:
+            self._put(key, value, time.monotonic())
+        if self.backend is not None:
+            self.backend.set(key, value)
+
+    def clear(self) -> None:
+        """清空内存缓存与后备存储"""
+        with self._lock:
+            self._entries.clear()
+        if self.backend is not None:
+            self.backend.clear()
+
+    def get_stats(self) -> dict:
+        """获取缓存统计信息"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _put(self, key: str, value: str, now: float) -> None:
+        """写入内存LRU（调用方持有锁）"""
+        expires_at = now + self.ttl if self.ttl is not None else None
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
+
+
+class InflightRequests:
+    """
+    合并进行中的相同请求
+
+    同一键的请求正在进行时，后到的调用方等待首个请求的结果（或异常），
+    不再重复请求API。键沿用LLMCache.make_key，只对可缓存的请求合并。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._futures: Dict[str, concurrent.futures.Future] = {}
+        self._async_futures: Dict[Tuple[int, str], "asyncio.Future"] = {}
+
+    def run(self, key: str, fn: Callable[[], T]) -> T:
+        """
+        执行fn，或等待同键请求的结果
+
+        Args:
+            key: 请求键
+            fn: 实际发起请求的函数
+
+        Returns:
+            fn的返回值
+        """
+        with self._lock:
+            future = self._futures.get(key)
+            owner = future is None
+            if owner:
+                future = self._futures[key] = concurrent.futures.Future()
+        if not owner:
+            return future.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._futures[key]
+
+    async def run_async(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        异步执行fn，或等待同键请求的结果
+
+        asyncio.Future绑定事件循环，按(事件循环, 键)区分。
+
+        Args:
+            key: 请求键
+            fn: 返回协程的请求函数
+
+        Returns:
+            协程的返回值
+        """
+        loop = asyncio.get_running_loop()
+        slot = (id(loop), key)
+        with self._lock:
+            future = self._async_futures.get(slot)
+            owner = future is None
+            if owner:
+                future = self._async_futures[slot] = loop.create_future()
+        if not owner:
+            return await asyncio.shield(future)
+
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # 没有等待者时避免"exception was never retrieved"警告
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._async_futures[slot]
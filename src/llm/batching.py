@@ -0,0 +1,170 @@
+"""
+LLM请求批处理
+
+BatchingLLM包装任意LLMInterface：异步调用先进入队列，后台协程在短时间窗口内
+收集至多batch_size个请求，作为一批并发下发（受max_concurrency限制），再把结果
+分发回各自的Future。并行运行多个Agent任务时可减少零散请求带来的调度开销。
+同步call直接透传给被包装的LLM。
+"""
+
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from .llm_interface import LLMInterface
+
+logger = logging.getLogger(__name__)
+
+
+class BatchingLLM(LLMInterface):
+    """在时间窗口内合并异步LLM请求并批量下发的包装器"""
+
+    def __init__(
+        self,
+        llm: LLMInterface,
+        batch_size: int = 8,
+        max_wait_ms: float = 20.0,
+        max_concurrency: int = 16,
+        dedupe: bool = False,
+    ):
+        """
+        初始化批处理包装器
+
+        Args:
+            llm: 被包装的LLM实例
+            batch_size: 单批最多请求数
+            max_wait_ms: 收集一批请求的最长等待时间（毫秒）
+            max_concurrency: 同时在途的底层请求上限
+            dedupe: 是否将同一批内提示词与参数完全相同的请求合并为一次调用
+        """
+        if batch_size <= 0:
+            raise ValueError(f"batch_size必须为正整数，实际值: {batch_size}")
+        if max_concurrency <= 0:
+            raise ValueError(f"max_concurrency必须为正整数，实际值: {max_concurrency}")
+
+        self.llm = llm
+        self.batch_size = batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_concurrency = max_concurrency
+        self.dedupe = dedupe
+
+        # 队列、信号量与后台协程均绑定到具体事件循环，首次异步调用时创建
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._inflight: set = set()  # 持有在途批次任务的引用，避免被垃圾回收
+        self._stats = {"requests": 0, "batches": 0, "upstream_calls": 0, "max_batch_size": 0}
+
+    def call(self, prompt: str, **kwargs) -> str:
+        """同步调用，直接透传"""
+        return self.llm.call(prompt, **kwargs)
+
+    async def acall(self, prompt: str, **kwargs) -> str:
+        """
+        异步调用：请求入队，等待所在批次完成
+
+        Args:
+            prompt: 输入提示词
+            **kwargs: 额外参数
+
+        Returns:
+            LLM生成的文本
+        """
+        queue = self._ensure_worker()
+        future = asyncio.get_running_loop().create_future()
+        self._stats["requests"] += 1
+        await queue.put((prompt, kwargs, future))
+        return await future
+
+    def get_model_info(self) -> Dict[str, Any]:
+        """获取模型信息（附带批处理配置）"""
+        info = dict(self.llm.get_model_info())
+        info["batching"] = {
+            "batch_size": self.batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "max_concurrency": self.max_concurrency,
+            "dedupe": self.dedupe,
+        }
+        return info
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取批处理统计信息"""
+        stats = dict(self._stats)
+        batches = stats["batches"]
+        stats["avg_batch_size"] = stats["requests"] / batches if batches else 0.0
+        return stats
+
+    def _ensure_worker(self) -> asyncio.Queue:
+        """确保当前事件循环上的队列与后台协程已启动"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._worker = loop.create_task(self._collect_batches(self._queue))
+        return self._queue
+
+    async def _collect_batches(self, queue: asyncio.Queue) -> None:
+        """后台协程：按时间窗口收集请求并提交批次"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            self._stats["batches"] += 1
+            self._stats["max_batch_size"] = max(self._stats["max_batch_size"], len(batch))
+            # 下发不阻塞下一批的收集
+            task = loop.create_task(self._dispatch(batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _dispatch(self, batch: List[Tuple[str, Dict[str, Any], asyncio.Future]]) -> None:
+        """并发下发一批请求并把结果分发回各Future"""
+        groups: Dict[Any, List[Tuple[str, Dict[str, Any], asyncio.Future]]] = {}
+        for index, item in enumerate(batch):
+            key = self._request_key(item[0], item[1]) if self.dedupe else index
+            groups.setdefault(key, []).append(item)
+
+        async def run(items):
+            prompt, kwargs, _ = items[0]
+            try:
+                result = await self._call_upstream(prompt, kwargs)
+            except Exception as e:
+                for _, _, future in items:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+            for _, _, future in items:
+                if not future.done():
+                    future.set_result(result)
+
+        logger.debug(f"批量下发LLM请求: {len(batch)} 个请求, {len(groups)} 次调用")
+        await asyncio.gather(*(run(items) for items in groups.values()))
+
+    async def _call_upstream(self, prompt: str, kwargs: Dict[str, Any]) -> str:
+        """在并发上限内调用被包装的LLM"""
+        async with self._semaphore:
+            self._stats["upstream_calls"] += 1
+            acall = getattr(self.llm, "acall", None)
+            if acall is not None:
+                return await acall(prompt, **kwargs)
+            return await asyncio.to_thread(self.llm, prompt, **kwargs)
+
+    @staticmethod
+    def _request_key(prompt: str, kwargs: Dict[str, Any]) -> Any:
+        """去重用的请求键；参数不可哈希时退化为repr"""
+        try:
+            key = (prompt, tuple(sorted(kwargs.items())))
+            hash(key)
+            return key
+        except TypeError:
+            return (prompt, repr(sorted(kwargs.items(), key=lambda item: item[0])))
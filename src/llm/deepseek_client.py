@@ -5,14 +5,11 @@ DeepSeek API客户端
 """
 
 import os
-import time
-import random
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Generator, Tuple, Union
 import logging
 
 try:
-    from openai import OpenAI
-    from openai import APIError, APITimeoutError, RateLimitError
+    from openai import AsyncOpenAI, OpenAI
 except ImportError:
     raise ImportError(
         "请安装openai包: pip install openai>=1.12.0"
@@ -20,9 +17,20 @@ except ImportError:
 
 from .llm_interface import LLMClientBase
 from .deepseek_models import get_model_context_length
+from ._cache import LLMResponseCache
+from ._response_cache import InflightRequests, LLMCache
+from ._clients import shared_async_client, shared_client
+from ._limiter import acall_with_retry, call_with_retry, get_bucket
 
 logger = logging.getLogger(__name__)
 
+# 进行中的可缓存请求，并发的相同请求只发出一次
+_inflight = InflightRequests()
+
+# 一次请求选用的(缓存, 缓存键)
+_ResponseStore = Union[LLMCache, LLMResponseCache]
+_CacheSlot = Tuple[_ResponseStore, str]
+
 
 class DeepSeekClient(LLMClientBase):
     """DeepSeek API客户端"""
@@ -39,6 +47,9 @@ class DeepSeekClient(LLMClientBase):
         temperature: float = 0.7,
         timeout: int = 60,
         max_retries: int = 3,
+        response_cache: Optional[LLMResponseCache] = None,
+        enable_cache: bool = True,
+        memory_cache: Optional[LLMCache] = None,
     ):
         """
         初始化DeepSeek客户端
@@ -51,8 +62,16 @@ class DeepSeekClient(LLMClientBase):
             temperature: 温度参数
             timeout: 请求超时时间（秒）
             max_retries: 最大重试次数
+            response_cache: 可选的磁盘响应缓存，命中时不再请求API
+            enable_cache: 是否启用进程内响应缓存（temperature为0或调用时传入use_cache=True才生效）
+            memory_cache: 进程内响应缓存，为None且enable_cache为True时新建，
+                并以response_cache为后备存储
         """
         super().__init__(model_name, max_tokens, temperature, timeout, max_retries)
+        self.response_cache = response_cache
+        if memory_cache is None and enable_cache:
+            memory_cache = LLMCache(backend=response_cache)
+        self.memory_cache = memory_cache
 
         # 获取API密钥
         self.api_key = api_key or os.getenv("DEEPSEEK_API_KEY")
@@ -64,12 +83,10 @@ class DeepSeekClient(LLMClientBase):
         # 设置API基础URL
         self.api_base = api_base or os.getenv("DEEPSEEK_API_BASE") or self.DEFAULT_API_BASE
 
-        # 初始化OpenAI客户端
-        self.client = OpenAI(
-            api_key=self.api_key,
-            base_url=self.api_base,
-            timeout=self.timeout,
-        )
+        # 同一服务的客户端实例共用OpenAI客户端与连接池
+        self.client = shared_client(self.api_key, self.api_base, self.timeout)
+        # 异步客户端绑定事件循环内的连接池，首次acall时获取
+        self._async_client: Optional[AsyncOpenAI] = None
         # 记录模型上下文长度
         self.context_length_tokens = get_model_context_length(model_name)
 
@@ -81,7 +98,8 @@ class DeepSeekClient(LLMClientBase):
 
         Args:
             prompt: 输入提示词
-            **kwargs: 额外参数，可覆盖默认参数
+            **kwargs: 额外参数，可覆盖默认参数；no_cache=True时跳过响应缓存，
+                use_cache=True时temperature > 0也使用进程内缓存
 
         Returns:
             LLM生成的文本
@@ -92,11 +110,151 @@ class DeepSeekClient(LLMClientBase):
         if not self._validate_prompt(prompt):
             return ""
 
+        request, cache_slot, cached = self._prepare_request(prompt, kwargs)
+        if cached is not None:
+            return cached
+
+        max_retries = kwargs.get("max_retries", self.max_retries)
+        if cache_slot is not None:
+            return _inflight.run(
+                cache_slot[1], lambda: self._call_api(request, cache_slot, max_retries)
+            )
+        return self._call_api(request, cache_slot, max_retries)
+
+    def _call_api(
+        self,
+        request: Dict[str, Any],
+        cache_slot: Optional[_CacheSlot],
+        max_retries: int,
+    ) -> str:
+        """按重试策略发出同步请求（call使用）"""
+        response, _ = call_with_retry(
+            lambda: self.client.chat.completions.create(**request),
+            get_bucket(self.api_base, request["model"]),
+            max_retries,
+            "DeepSeek API调用失败",
+        )
+        return self._finish_response(request, response, cache_slot)
+
+    async def acall(self, prompt: str, **kwargs) -> str:
+        """
+        异步调用DeepSeek API生成文本
+
+        使用AsyncOpenAI原生协程请求，重试等待通过asyncio.sleep完成，
+        并发任务的网络往返可在同一事件循环内重叠，不占用线程池。
+
+        Args:
+            prompt: 输入提示词
+            **kwargs: 额外参数，与call一致
+
+        Returns:
+            LLM生成的文本
+
+        Raises:
+            Exception: 当所有重试都失败时抛出异常
+        """
+        if not self._validate_prompt(prompt):
+            return ""
+
+        request, cache_slot, cached = self._prepare_request(prompt, kwargs)
+        if cached is not None:
+            return cached
+
+        if self._async_client is None:
+            self._async_client = shared_async_client(self.api_key, self.api_base, self.timeout)
+
+        max_retries = kwargs.get("max_retries", self.max_retries)
+        if cache_slot is not None:
+            return await _inflight.run_async(
+                cache_slot[1], lambda: self._acall_api(request, cache_slot, max_retries)
+            )
+        return await self._acall_api(request, cache_slot, max_retries)
+
+    async def _acall_api(
+        self,
+        request: Dict[str, Any],
+        cache_slot: Optional[_CacheSlot],
+        max_retries: int,
+    ) -> str:
+        """按重试策略发出异步请求（acall使用）"""
+        response, _ = await acall_with_retry(
+            lambda: self._async_client.chat.completions.create(**request),
+            get_bucket(self.api_base, request["model"]),
+            max_retries,
+            "DeepSeek API调用失败",
+        )
+        return self._finish_response(request, response, cache_slot)
+
+    def stream_call(self, prompt: str, **kwargs) -> Generator[str, None, None]:
+        """
+        流式调用DeepSeek API，逐块产出文本
+
+        首个文本块到达前的失败按call的策略重试；开始产出后出错直接抛出，
+        避免调用方收到重复内容。完整响应结束后写入响应缓存。
+
+        Args:
+            prompt: 输入提示词
+            **kwargs: 额外参数，与call一致
+
+        Yields:
+            文本块
+
+        Raises:
+            Exception: 当所有重试都失败时抛出异常
+        """
+        if not self._validate_prompt(prompt):
+            return
+
+        request, cache_slot, cached = self._prepare_request(prompt, kwargs)
+        if cached is not None:
+            yield cached
+            return
+        request["stream"] = True
+
+        stream, _ = call_with_retry(
+            lambda: self.client.chat.completions.create(**request),
+            get_bucket(self.api_base, request["model"]),
+            kwargs.get("max_retries", self.max_retries),
+            "DeepSeek API流式调用失败",
+        )
+
+        parts = []
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                content = chunk.choices[0].delta.content
+                parts.append(content)
+                yield content
+        result = "".join(parts).strip()
+        self._log_call(request["messages"][0]["content"], result)
+        if result:
+            self._store_response(cache_slot, result)
+
+    def _prepare_request(
+        self, prompt: str, kwargs: Dict[str, Any]
+    ) -> Tuple[Dict[str, Any], Optional[_CacheSlot], Optional[str]]:
+        """
+        合并参数、查询响应缓存并按上下文窗口裁剪提示词（call/acall共用）
+
+        可缓存的请求查询进程内缓存（未命中时由其查询后备的磁盘缓存），
+        其余请求只查询磁盘缓存。
+
+        Returns:
+            (请求参数, (使用的缓存, 缓存键)或None, 缓存命中的响应)
+        """
         # 合并参数：kwargs优先，然后是实例参数
         model_name = kwargs.get("model_name", self.model_name)
         max_tokens = kwargs.get("max_tokens", self.max_tokens)
         temperature = kwargs.get("temperature", self.temperature)
-        max_retries = kwargs.get("max_retries", self.max_retries)
+
+        cache_slot = None
+        cache = self._select_cache(temperature, kwargs)
+        if cache is not None:
+            cache_key = LLMResponseCache.make_key(model_name, prompt, temperature, max_tokens)
+            cache_slot = (cache, cache_key)
+            cached = cache.get(cache_key)
+            if cached is not None:
+                logger.debug("LLM响应缓存命中")
+                return {}, cache_slot, cached
 
         # 估算输入token并裁剪，避免超过上下文窗口
         input_tokens = self._estimate_tokens(prompt)
@@ -109,57 +267,48 @@ class DeepSeekClient(LLMClientBase):
         if input_tokens + max_tokens + safety_generation > self.context_length_tokens:
             prompt = self._truncate_to_budget(prompt, self.context_length_tokens - max_tokens - safety_generation)
 
-        last_error = None
-        for attempt in range(max_retries):
-            try:
-                response = self.client.chat.completions.create(
-                    model=model_name,
-                    messages=[
-                        {"role": "user", "content": prompt}
-                    ],
-                    max_tokens=max_tokens,
-                    temperature=temperature,
-                    stream=False,
-                )
-
-                result = response.choices[0].message.content.strip()
-                # logger.warning(f"DeepSeek原始响应: {result}")
-                self._log_call(prompt, result)
-                return result
-
-            except RateLimitError as e:
-                last_error = e
-                wait_time = 2 ** attempt  # 指数退避
-                logger.warning(
-                    f"API速率限制，第{attempt + 1}次重试，等待{wait_time}秒: {e}"
-                )
-                time.sleep(wait_time)
-
-            except APITimeoutError as e:
-                last_error = e
-                wait_time = min(2 ** attempt, 8) + random.uniform(0, 0.5)
-                logger.warning(
-                    f"API请求超时，第{attempt + 1}次重试，等待{wait_time:.1f}秒: {e}"
-                )
-                time.sleep(wait_time)
-
-            except APIError as e:
-                last_error = e
-                logger.error(f"API错误: {e}")
-                # 对于非重试性错误，直接跳出
-                if e.status_code and e.status_code >= 400 and e.status_code < 500:
-                    break
-                time.sleep(1)
-
-            except Exception as e:
-                last_error = e
-                logger.error(f"未知错误: {e}")
-                break
-
-        # 所有重试都失败
-        error_msg = f"DeepSeek API调用失败，已重试{max_retries}次: {last_error}"
-        logger.error(error_msg)
-        raise Exception(error_msg)
+        request = {
+            "model": model_name,
+            "messages": [
+                {"role": "user", "content": prompt}
+            ],
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            "stream": False,
+        }
+        return request, cache_slot, None
+
+    def _select_cache(
+        self, temperature: float, kwargs: Dict[str, Any]
+    ) -> Optional[_ResponseStore]:
+        """no_cache=True时不使用缓存；可缓存的请求使用进程内缓存，否则只使用磁盘缓存"""
+        if kwargs.get("no_cache", False):
+            return None
+        if self.memory_cache is not None and LLMCache.cacheable(
+            temperature, kwargs.get("use_cache", False)
+        ):
+            return self.memory_cache
+        return self.response_cache
+
+    def _finish_response(
+        self,
+        request: Dict[str, Any],
+        response: Any,
+        cache_slot: Optional[_CacheSlot],
+    ) -> str:
+        """提取响应文本，记录日志并写入缓存"""
+        result = response.choices[0].message.content.strip()
+        # logger.warning(f"DeepSeek原始响应: {result}")
+        self._log_call(request["messages"][0]["content"], result)
+        self._store_response(cache_slot, result)
+        return result
+
+    @staticmethod
+    def _store_response(cache_slot: Optional[_CacheSlot], result: str) -> None:
+        """写入_prepare_request选定的缓存"""
+        if cache_slot is not None:
+            cache, key = cache_slot
+            cache.set(key, result)
 
     def get_model_info(self) -> Dict[str, Any]:
         """获取DeepSeek模型信息"""
@@ -194,6 +343,9 @@ class DeepSeekClient(LLMClientBase):
 
         if model_env and "model_name" not in kwargs:
             kwargs["model_name"] = model_env
+        cache_dir = os.getenv("LLM_CACHE_DIR")
+        if cache_dir and "response_cache" not in kwargs:
+            kwargs["response_cache"] = LLMResponseCache(cache_dir)
         return cls(api_key=api_key, api_base=api_base, **kwargs)
 
     def _estimate_tokens(self, text: str) -> int:
@@ -4,24 +4,47 @@
 在现有deepseek_client.py基础上，支持增强的LLM接口功能。
 """
 
+import hashlib
 import os
 import time
-import asyncio
-from typing import Optional, Dict, Any, Generator, AsyncGenerator
+from typing import TYPE_CHECKING, Optional, Dict, Any, Generator, AsyncGenerator, List, Tuple
 import logging
 
 try:
     from openai import OpenAI, AsyncOpenAI
-    from openai import APIError, APITimeoutError, RateLimitError
 except ImportError:
     raise ImportError(
         "请安装openai包: pip install openai>=1.12.0"
     )
 
 from .llm_interface_enhanced import EnhancedLLMClientBase, LLMResponse, LLMCallMode
+from ._response_cache import InflightRequests, LLMCache
+from ._clients import shared_async_client, shared_client
+from .deepseek_models import count_tokens, get_model_context_length
+from ._limiter import acall_with_retry, call_with_retry, get_bucket
+
+if TYPE_CHECKING:  # pragma: no cover - 仅用于类型标注，避免导入时加载向量内核
+    from ..memory.semantic_cache import SemanticCache
 
 logger = logging.getLogger(__name__)
 
+# 进行中的可缓存请求，并发的相同请求只发出一次
+_inflight = InflightRequests()
+
+# 语义缓存只在温度不高于该值时启用，高温采样的输出本就不应复用
+SEMANTIC_MAX_TEMPERATURE = 0.3
+
+# 调用参数名 -> chat.completions.create参数名
+_CREATE_KWARGS = (
+    ("model_name", "model"),
+    ("max_tokens", "max_tokens"),
+    ("temperature", "temperature"),
+)
+
+# 流式输出合并：累计满该字符数或距上次产出超过该秒数时产出一块
+STREAM_FLUSH_CHARS = 64
+STREAM_FLUSH_SECONDS = 0.02
+
 
 class EnhancedDeepSeekClient(EnhancedLLMClientBase):
     """增强的DeepSeek API客户端"""
@@ -39,6 +62,10 @@ class EnhancedDeepSeekClient(EnhancedLLMClientBase):
         timeout: int = 30,
         max_retries: int = 3,
         connection_pool_size: int = 5,
+        enable_cache: bool = True,
+        response_cache: Optional[LLMCache] = None,
+        system_prompt: Optional[str] = None,
+        semantic_cache: Optional["SemanticCache"] = None,
     ):
         """
         初始化增强的DeepSeek客户端
@@ -51,7 +78,13 @@ class EnhancedDeepSeekClient(EnhancedLLMClientBase):
             temperature: 温度参数
             timeout: 请求超时时间（秒）
             max_retries: 最大重试次数
-            connection_pool_size: 连接池大小
+            connection_pool_size: 共享连接池的最大连接数
+            enable_cache: 是否启用进程内响应缓存（temperature为0或调用时传入use_cache=True才生效）
+            response_cache: 响应缓存，为None且enable_cache为True时新建
+            system_prompt: 固定的系统提示词，作为首条消息发送并据此生成prompt_cache_key，
+                便于服务端复用相同前缀的缓存；其中不要放时间戳、请求ID等每次变化的内容
+            semantic_cache: 可选的语义缓存（memory.semantic_cache.SemanticCache），
+                精确缓存未命中时按提示词相似度复用响应，仅在temperature不高于0.3时使用
         """
         super().__init__(
             model_name=model_name,
@@ -72,21 +105,49 @@ class EnhancedDeepSeekClient(EnhancedLLMClientBase):
         # 设置API基础URL
         self.api_base = api_base or os.getenv("DEEPSEEK_API_BASE") or self.DEFAULT_API_BASE
 
-        # 初始化OpenAI客户端（同步和异步）
-        self.client = OpenAI(
-            api_key=self.api_key,
-            base_url=self.api_base,
-            timeout=self.timeout,
-        )
+        if response_cache is None and enable_cache:
+            response_cache = LLMCache()
+        self.response_cache = response_cache
 
-        self.async_client = AsyncOpenAI(
-            api_key=self.api_key,
-            base_url=self.api_base,
-            timeout=self.timeout,
-        )
+        # OpenAI客户端（同步和异步）在首次使用时获取，同一服务的实例共用连接池
+        self._client: Optional[OpenAI] = None
+        self._async_client: Optional[AsyncOpenAI] = None
+
+        self.system_prompt = system_prompt
+        self.semantic_cache = semantic_cache
+
+        # create的公共参数只构造一次，调用未覆盖时直接复用
+        self._base_state = None
+        self._base_kwargs: Dict[str, Any] = {}
 
         logger.info(f"增强的DeepSeek客户端已初始化 - 模型: {model_name}, API基础URL: {self.api_base}")
 
+    @property
+    def client(self) -> OpenAI:
+        """同步OpenAI客户端，首次访问时获取"""
+        if self._client is None:
+            self._client = shared_client(
+                self.api_key, self.api_base, self.timeout, self.connection_pool_size
+            )
+        return self._client
+
+    @client.setter
+    def client(self, value: OpenAI) -> None:
+        self._client = value
+
+    @property
+    def async_client(self) -> AsyncOpenAI:
+        """异步OpenAI客户端，首次访问时获取"""
+        if self._async_client is None:
+            self._async_client = shared_async_client(
+                self.api_key, self.api_base, self.timeout, self.connection_pool_size
+            )
+        return self._async_client
+
+    @async_client.setter
+    def async_client(self, value: AsyncOpenAI) -> None:
+        self._async_client = value
+
     def _execute_call(self, prompt: str, connection, **kwargs) -> str:
         """
         执行实际的DeepSeek API调用
@@ -100,60 +161,44 @@ class EnhancedDeepSeekClient(EnhancedLLMClientBase):
             LLM生成的文本
         """
         # 合并参数：kwargs优先，然后是实例参数
-        model_name = kwargs.get("model_name", self.model_name)
-        max_tokens = kwargs.get("max_tokens", self.max_tokens)
-        temperature = kwargs.get("temperature", self.temperature)
+        create_kwargs = self._fit_context(prompt, self._create_kwargs(kwargs))
         max_retries = kwargs.get("max_retries", self.max_retries)
+        messages = self._messages(prompt)
+
+        cache_key = self._cache_key(prompt, create_kwargs, kwargs)
+        namespace = self._semantic_namespace(create_kwargs, kwargs)
+        cached = self._lookup_cached(prompt, cache_key, namespace)
+        if cached is not None:
+            return cached
+        if cache_key is not None:
+            return _inflight.run(
+                cache_key,
+                lambda: self._request(messages, create_kwargs, max_retries, cache_key, namespace),
+            )
+        return self._request(messages, create_kwargs, max_retries, None, namespace)
 
-        last_error = None
-        for attempt in range(max_retries):
-            try:
-                response = self.client.chat.completions.create(
-                    model=model_name,
-                    messages=[
-                        {"role": "user", "content": prompt}
-                    ],
-                    max_tokens=max_tokens,
-                    temperature=temperature,
-                    stream=False,
-                )
-
-                result = response.choices[0].message.content.strip()
-                self._log_call(prompt, result, LLMCallMode.SYNC)
-                return result
-
-            except RateLimitError as e:
-                last_error = e
-                wait_time = 2 ** attempt  # 指数退避
-                logger.warning(
-                    f"API速率限制，第{attempt + 1}次重试，等待{wait_time}秒: {e}"
-                )
-                time.sleep(wait_time)
-
-            except APITimeoutError as e:
-                last_error = e
-                logger.warning(
-                    f"API请求超时，第{attempt + 1}次重试: {e}"
-                )
-                time.sleep(1)  # 短时间等待后重试
-
-            except APIError as e:
-                last_error = e
-                logger.error(f"API错误: {e}")
-                # 对于非重试性错误，直接跳出
-                if e.status_code and e.status_code >= 400 and e.status_code < 500:
-                    break
-                time.sleep(1)
-
-            except Exception as e:
-                last_error = e
-                logger.error(f"未知错误: {e}")
-                break
-
-        # 所有重试都失败
-        error_msg = f"DeepSeek API调用失败，已重试{max_retries}次: {last_error}"
-        logger.error(error_msg)
-        raise Exception(error_msg)
+    def _request(
+        self,
+        messages: List[Dict[str, str]],
+        create_kwargs: Dict[str, Any],
+        max_retries: int,
+        cache_key: Optional[str],
+        namespace: Optional[str] = None,
+    ) -> str:
+        """按重试策略发出同步请求（_execute_call使用），重试间复用同一组参数"""
+        model_name = create_kwargs["model"]
+        response, _ = call_with_retry(
+            lambda: self.client.chat.completions.create(
+                messages=messages, stream=False, **create_kwargs
+            ),
+            get_bucket(self.api_base, model_name),
+            max_retries,
+            "DeepSeek API调用失败",
+        )
+        result = response.choices[0].message.content.strip()
+        self._log_call(messages[-1]["content"], result, LLMCallMode.SYNC)
+        self._store_response(messages[-1]["content"], result, cache_key, namespace)
+        return result
 
     async def async_call(self, prompt: str, **kwargs) -> LLMResponse:
         """
@@ -167,6 +212,7 @@ class EnhancedDeepSeekClient(EnhancedLLMClientBase):
             LLMResponse: 包含响应内容和元数据
         """
         start_time = time.time()
+        start_ns = time.perf_counter_ns()
 
         try:
             # 验证提示词
@@ -174,84 +220,95 @@ class EnhancedDeepSeekClient(EnhancedLLMClientBase):
                 raise ValueError("无效的提示词")
 
             # 合并参数
-            model_name = kwargs.get("model_name", self.model_name)
-            max_tokens = kwargs.get("max_tokens", self.max_tokens)
-            temperature = kwargs.get("temperature", self.temperature)
+            create_kwargs = self._fit_context(prompt, self._create_kwargs(kwargs))
+            model_name = create_kwargs["model"]
             max_retries = kwargs.get("max_retries", self.max_retries)
+            messages = self._messages(prompt)
+
+            cache_key = self._cache_key(prompt, create_kwargs, kwargs)
+            namespace = self._semantic_namespace(create_kwargs, kwargs)
+            cached = self._lookup_cached(prompt, cache_key, namespace)
+            if cached is not None:
+                latency = self._elapsed(start_ns)
+                tokens = count_tokens(cached)
+                self._update_stats(success=True, tokens=tokens, latency=latency)
+                return LLMResponse(
+                    content=cached,
+                    model=model_name,
+                    tokens_used=tokens,
+                    latency=latency,
+                    metadata={
+                        "mode": LLMCallMode.ASYNC.value,
+                        "retries": 0,
+                        "timestamp": start_time,
+                        "cached": True,
+                    }
+                )
+
+            if cache_key is not None:
+                result, attempt = await _inflight.run_async(
+                    cache_key,
+                    lambda: self._arequest(
+                        messages, create_kwargs, max_retries, cache_key, namespace
+                    ),
+                )
+            else:
+                result, attempt = await self._arequest(
+                    messages, create_kwargs, max_retries, None, namespace
+                )
+            latency = self._elapsed(start_ns)
+            tokens = count_tokens(result)
 
-            last_error = None
-            for attempt in range(max_retries):
-                try:
-                    response = await self.async_client.chat.completions.create(
-                        model=model_name,
-                        messages=[
-                            {"role": "user", "content": prompt}
-                        ],
-                        max_tokens=max_tokens,
-                        temperature=temperature,
-                        stream=False,
-                    )
-
-                    result = response.choices[0].message.content.strip()
-                    latency = time.time() - start_time
-
-                    # 更新统计
-                    self._update_stats(success=True, tokens=len(result.split()), latency=latency)
-
-                    # 创建响应对象
-                    response_obj = LLMResponse(
-                        content=result,
-                        model=model_name,
-                        tokens_used=len(result.split()),
-                        latency=latency,
-                        metadata={
-                            "mode": LLMCallMode.ASYNC.value,
-                            "retries": attempt,
-                            "timestamp": start_time,
-                        }
-                    )
-
-                    self._log_call(prompt, result, LLMCallMode.ASYNC)
-                    return response_obj
-
-                except RateLimitError as e:
-                    last_error = e
-                    wait_time = 2 ** attempt
-                    logger.warning(
-                        f"API速率限制，第{attempt + 1}次重试，等待{wait_time}秒: {e}"
-                    )
-                    await asyncio.sleep(wait_time)
-
-                except APITimeoutError as e:
-                    last_error = e
-                    logger.warning(
-                        f"API请求超时，第{attempt + 1}次重试: {e}"
-                    )
-                    await asyncio.sleep(1)
-
-                except APIError as e:
-                    last_error = e
-                    logger.error(f"API错误: {e}")
-                    if e.status_code and e.status_code >= 400 and e.status_code < 500:
-                        break
-                    await asyncio.sleep(1)
-
-                except Exception as e:
-                    last_error = e
-                    logger.error(f"未知错误: {e}")
-                    break
-
-            # 所有重试都失败
-            error_msg = f"DeepSeek API异步调用失败，已重试{max_retries}次: {last_error}"
-            logger.error(error_msg)
-            raise Exception(error_msg)
+            # 更新统计
+            self._update_stats(success=True, tokens=tokens, latency=latency)
+
+            # 创建响应对象
+            return LLMResponse(
+                content=result,
+                model=model_name,
+                tokens_used=tokens,
+                latency=latency,
+                metadata={
+                    "mode": LLMCallMode.ASYNC.value,
+                    "retries": attempt,
+                    "timestamp": start_time,
+                }
+            )
 
         except Exception as e:
             # 更新统计
-            self._update_stats(success=False, tokens=0, latency=time.time() - start_time)
+            self._update_stats(success=False, tokens=0, latency=self._elapsed(start_ns))
             logger.error(f"LLM异步调用失败: {e}")
             raise
 
+    async def _arequest(
+        self,
+        messages: List[Dict[str, str]],
+        create_kwargs: Dict[str, Any],
+        max_retries: int,
+        cache_key: Optional[str],
+        namespace: Optional[str] = None,
+    ) -> Tuple[str, int]:
+        """
+        按重试策略发出异步请求（async_call使用），重试间复用同一组参数
+
+        Returns:
+            (响应文本, 重试次数)
+        """
+        model_name = create_kwargs["model"]
+        response, attempt = await acall_with_retry(
+            lambda: self.async_client.chat.completions.create(
+                messages=messages, stream=False, **create_kwargs
+            ),
+            get_bucket(self.api_base, model_name),
+            max_retries,
+            "DeepSeek API异步调用失败",
+        )
+        result = response.choices[0].message.content.strip()
+        self._store_response(messages[-1]["content"], result, cache_key, namespace)
+        self._log_call(messages[-1]["content"], result, LLMCallMode.ASYNC)
+        return result, attempt
+
     def stream_call(self, prompt: str, **kwargs) -> Generator[str, None, None]:
         """
         流式调用DeepSeek API
@@ -264,29 +321,35 @@ class EnhancedDeepSeekClient(EnhancedLLMClientBase):
             str: 文本块
         """
         # 合并参数
-        model_name = kwargs.get("model_name", self.model_name)
-        max_tokens = kwargs.get("max_tokens", self.max_tokens)
-        temperature = kwargs.get("temperature", self.temperature)
+        create_kwargs = self._create_kwargs(kwargs)
 
         try:
+            get_bucket(self.api_base, create_kwargs["model"]).acquire()
             stream = self.client.chat.completions.create(
-                model=model_name,
-                messages=[
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=max_tokens,
-                temperature=temperature,
-                stream=True,
+                messages=self._messages(prompt), stream=True, **create_kwargs
             )
 
-            full_response = ""
+            # 逐块累积到列表，仅在记录DEBUG日志时拼接；token级增量合并后再产出，减少调度开销
+            parts = []
+            buf = []
+            buf_len = 0
+            last = time.monotonic()
             for chunk in stream:
                 if chunk.choices and chunk.choices[0].delta.content is not None:
                     content = chunk.choices[0].delta.content
-                    full_response += content
-                    yield content
-
-            self._log_call(prompt, full_response, LLMCallMode.STREAM)
+                    parts.append(content)
+                    buf.append(content)
+                    buf_len += len(content)
+                    now = time.monotonic()
+                    if buf_len >= STREAM_FLUSH_CHARS or now - last > STREAM_FLUSH_SECONDS:
+                        yield "".join(buf)
+                        buf.clear()
+                        buf_len = 0
+                        last = now
+            if buf:
+                yield "".join(buf)
+
+            self._log_call(prompt, lambda: "".join(parts), LLMCallMode.STREAM)
 
         except Exception as e:
             logger.error(f"流式调用失败: {e}")
@@ -304,34 +367,164 @@ class EnhancedDeepSeekClient(EnhancedLLMClientBase):
             str: 文本块
         """
         # 合并参数
-        model_name = kwargs.get("model_name", self.model_name)
-        max_tokens = kwargs.get("max_tokens", self.max_tokens)
-        temperature = kwargs.get("temperature", self.temperature)
+        create_kwargs = self._create_kwargs(kwargs)
 
         try:
+            await get_bucket(self.api_base, create_kwargs["model"]).acquire_async()
             stream = await self.async_client.chat.completions.create(
-                model=model_name,
-                messages=[
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=max_tokens,
-                temperature=temperature,
-                stream=True,
+                messages=self._messages(prompt), stream=True, **create_kwargs
             )
 
-            full_response = ""
+            # 逐块累积到列表，仅在记录DEBUG日志时拼接；token级增量合并后再产出，减少调度开销
+            parts = []
+            buf = []
+            buf_len = 0
+            last = time.monotonic()
             async for chunk in stream:
                 if chunk.choices and chunk.choices[0].delta.content is not None:
                     content = chunk.choices[0].delta.content
-                    full_response += content
-                    yield content
-
-            self._log_call(prompt, full_response, LLMCallMode.STREAM)
+                    parts.append(content)
+                    buf.append(content)
+                    buf_len += len(content)
+                    now = time.monotonic()
+                    if buf_len >= STREAM_FLUSH_CHARS or now - last > STREAM_FLUSH_SECONDS:
+                        yield "".join(buf)
+                        buf.clear()
+                        buf_len = 0
+                        last = now
+            if buf:
+                yield "".join(buf)
+
+            self._log_call(prompt, lambda: "".join(parts), LLMCallMode.STREAM)
 
         except Exception as e:
             logger.error(f"异步流式调用失败: {e}")
             raise
 
+    def _messages(self, prompt: str) -> List[Dict[str, str]]:
+        """构造消息列表：固定的系统提示词在前，变化的用户提示词在后"""
+        if self.system_prompt:
+            return [
+                {"role": "system", "content": self.system_prompt},
+                {"role": "user", "content": prompt},
+            ]
+        return [{"role": "user", "content": prompt}]
+
+    def _build_base_kwargs(self) -> Dict[str, Any]:
+        """按实例参数构造create的公共参数"""
+        base = {
+            "model": self.model_name,
+            "max_tokens": self.max_tokens,
+            "temperature": self.temperature,
+        }
+        if self.system_prompt:
+            # 相同系统提示词的请求带同一个键，服务端可复用前缀缓存
+            prefix_key = hashlib.sha1(self.system_prompt.encode("utf-8")).hexdigest()
+            base["extra_body"] = {"prompt_cache_key": prefix_key}
+        return base
+
+    def _create_kwargs(self, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        合并调用参数与实例参数，得到create的参数
+
+        调用未覆盖任何参数时直接返回缓存的公共参数（调用方不得修改）；
+        实例的model_name/max_tokens/temperature/system_prompt被改动后重新构造。
+        """
+        state = (self.model_name, self.max_tokens, self.temperature, self.system_prompt)
+        if state != self._base_state:
+            self._base_state = state
+            self._base_kwargs = self._build_base_kwargs()
+        base = self._base_kwargs
+        overrides = {name: kwargs[key] for key, name in _CREATE_KWARGS if key in kwargs}
+        return {**base, **overrides} if overrides else base
+
+    def _fit_context(self, prompt: str, create_kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        按模型上下文窗口检查请求
+
+        上下文窗口同时计入输入与输出：提示词token数加max_tokens超出窗口时收缩
+        max_tokens并告警；提示词本身已超出窗口时只告警，由API返回错误。
+        """
+        context_length = get_model_context_length(create_kwargs["model"])
+        prompt_tokens = count_tokens(prompt)
+        if self.system_prompt:
+            prompt_tokens += count_tokens(self.system_prompt)
+        budget = context_length - prompt_tokens
+        if budget <= 0:
+            logger.warning(f"提示词约{prompt_tokens} token，超出模型上下文窗口{context_length}")
+            return create_kwargs
+        if create_kwargs["max_tokens"] > budget:
+            logger.warning(
+                f"提示词约{prompt_tokens} token，max_tokens由{create_kwargs['max_tokens']}收缩为{budget}"
+            )
+            return {**create_kwargs, "max_tokens": budget}
+        return create_kwargs
+
+    def _cache_key(
+        self,
+        prompt: str,
+        create_kwargs: Dict[str, Any],
+        kwargs: Dict[str, Any],
+    ) -> Optional[str]:
+        """
+        计算响应缓存键
+
+        未启用缓存、传入no_cache=True，或temperature > 0且未传入use_cache=True时返回None。
+        流式调用不经过缓存。
+        """
+        if self.response_cache is None or kwargs.get("no_cache", False):
+            return None
+        temperature = create_kwargs["temperature"]
+        if not LLMCache.cacheable(temperature, kwargs.get("use_cache", False)):
+            return None
+        if self.system_prompt:
+            prompt = f"{self.system_prompt}\x00{prompt}"
+        return LLMCache.make_key(
+            create_kwargs["model"], prompt, temperature, create_kwargs["max_tokens"]
+        )
+
+    def _semantic_namespace(
+        self, create_kwargs: Dict[str, Any], kwargs: Dict[str, Any]
+    ) -> Optional[str]:
+        """
+        计算语义缓存的命名空间（模型与系统提示词相同的请求才互相匹配）
+
+        未配置语义缓存、传入no_cache=True或temperature高于SEMANTIC_MAX_TEMPERATURE时返回None。
+        """
+        if self.semantic_cache is None or kwargs.get("no_cache", False):
+            return None
+        if create_kwargs["temperature"] > SEMANTIC_MAX_TEMPERATURE:
+            return None
+        prefix_key = create_kwargs.get("extra_body", {}).get("prompt_cache_key", "")
+        return f"{create_kwargs['model']}|{prefix_key}"
+
+    def _lookup_cached(
+        self, prompt: str, cache_key: Optional[str], namespace: Optional[str]
+    ) -> Optional[str]:
+        """依次查询精确缓存与语义缓存，未命中返回None"""
+        if cache_key is not None:
+            cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                return cached
+        if namespace is not None:
+            hit = self.semantic_cache.get(prompt, namespace)
+            if hit is not None:
+                return hit["response"]
+        return None
+
+    def _store_response(
+        self,
+        prompt: str,
+        result: str,
+        cache_key: Optional[str],
+        namespace: Optional[str],
+    ) -> None:
+        """写入精确缓存与语义缓存"""
+        if cache_key is not None:
+            self.response_cache.set(cache_key, result)
+        if namespace is not None and result:
+            self.semantic_cache.put(prompt, {"response": result}, namespace)
+
     def get_model_info(self) -> Dict[str, Any]:
         """获取DeepSeek模型信息"""
         info = super().get_model_info()
@@ -1,3 +1,12 @@
+import functools
+import sys
+from types import MappingProxyType
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - optional dependency
+    tiktoken = None
+
 DEEPSEEK_MODELS = {
     "deepseek-chat": {
         "context_length_tokens": 64000,
@@ -15,7 +24,38 @@ DEEPSEEK_MODELS = {
     },
 }
 
+# 只读视图，键驻留，避免调用方意外修改模型表
+DEEPSEEK_MODELS = MappingProxyType(
+    {sys.intern(k): MappingProxyType(v) for k, v in DEEPSEEK_MODELS.items()}
+)
+
+DEFAULT_CTX: int = 64000
+
+
+@functools.lru_cache(maxsize=16)
 def get_model_context_length(model_name: str) -> int:
-    info = DEEPSEEK_MODELS.get(model_name, {})
-    return int(info.get("context_length_tokens", 64000))
+    info = DEEPSEEK_MODELS.get(model_name)
+    return int(info["context_length_tokens"]) if info is not None else DEFAULT_CTX
+
+
+# cl100k_base编码，首次count_tokens时加载；加载失败记为False，之后按字符比例估算
+_encoding = None
+
 
+def count_tokens(text: str) -> int:
+    """统计token数：安装tiktoken时用cl100k_base近似DeepSeek分词，否则按中英文字符比例估算"""
+    global _encoding
+    if not text:
+        return 0
+    if _encoding is None:
+        _encoding = False
+        if tiktoken is not None:
+            try:
+                _encoding = tiktoken.get_encoding("cl100k_base")
+            except Exception:  # pragma: no cover - 编码文件下载失败等
+                _encoding = False
+    if _encoding:
+        return len(_encoding.encode(text, disallowed_special=()))
+    non_ascii = sum(1 for c in text if ord(c) > 127)
+    ratio = 0.6 if non_ascii > (len(text) // 10) else 0.3
+    return int(len(text) * ratio)
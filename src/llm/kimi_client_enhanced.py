@@ -18,6 +18,7 @@ except ImportError:
         "请安装openai包: pip install openai>=1.12.0"
     )
 
+from .deepseek_models import count_tokens
 from .llm_interface_enhanced import EnhancedLLMClientBase, LLMResponse, LLMCallMode
 
 logger = logging.getLogger(__name__)
@@ -167,6 +168,7 @@ class EnhancedKimiClient(EnhancedLLMClientBase):
             LLMResponse: 包含响应内容和元数据
         """
         start_time = time.time()
+        start_ns = time.perf_counter_ns()
 
         try:
             # 验证提示词
@@ -193,16 +195,17 @@ class EnhancedKimiClient(EnhancedLLMClientBase):
                     )
 
                     result = response.choices[0].message.content.strip()
-                    latency = time.time() - start_time
+                    latency = self._elapsed(start_ns)
 
                     # 更新统计
-                    self._update_stats(success=True, tokens=len(result.split()), latency=latency)
+                    tokens = count_tokens(result)
+                    self._update_stats(success=True, tokens=tokens, latency=latency)
 
                     # 创建响应对象
                     response_obj = LLMResponse(
                         content=result,
                         model=model_name,
-                        tokens_used=len(result.split()),
+                        tokens_used=tokens,
                         latency=latency,
                         metadata={
                             "mode": LLMCallMode.ASYNC.value,
@@ -248,7 +251,7 @@ class EnhancedKimiClient(EnhancedLLMClientBase):
 
         except Exception as e:
             # 更新统计
-            self._update_stats(success=False, tokens=0, latency=time.time() - start_time)
+            self._update_stats(success=False, tokens=0, latency=self._elapsed(start_ns))
             logger.error(f"LLM异步调用失败: {e}")
             raise
 
@@ -1,3 +1,7 @@
+import functools
+import sys
+from types import MappingProxyType
+
 KIMI_MODELS = {
     "kimi-k2-0905-preview": {
         "context_length_tokens": 128000,
@@ -8,6 +12,15 @@ KIMI_MODELS = {
     },
 }
 
+# 只读视图，键驻留，避免调用方意外修改模型表
+KIMI_MODELS = MappingProxyType(
+    {sys.intern(k): MappingProxyType(v) for k, v in KIMI_MODELS.items()}
+)
+
+DEFAULT_CTX: int = 128000
+
+
+@functools.lru_cache(maxsize=16)
 def get_model_context_length(model_name: str) -> int:
-    info = KIMI_MODELS.get(model_name, {})
-    return int(info.get("context_length_tokens", 128000))
+    info = KIMI_MODELS.get(model_name)
+    return int(info["context_length_tokens"]) if info is not None else DEFAULT_CTX
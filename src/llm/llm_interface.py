@@ -4,8 +4,9 @@ LLM抽象接口定义
 定义统一的LLM调用接口，支持不同的LLM实现（DeepSeek、模拟LLM等）。
 """
 
+import asyncio
 from abc import ABC, abstractmethod
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Generator
 import logging
 
 logger = logging.getLogger(__name__)
@@ -38,6 +39,37 @@ class LLMInterface(ABC):
         """
         pass
 
+    async def acall(self, prompt: str, **kwargs) -> str:
+        """
+        异步调用LLM生成文本
+
+        默认在线程池中执行同步call，子类可覆盖为原生异步实现。
+
+        Args:
+            prompt: 输入提示词
+            **kwargs: 额外参数（温度、最大令牌数等）
+
+        Returns:
+            LLM生成的文本
+        """
+        return await asyncio.to_thread(self.call, prompt, **kwargs)
+
+    def stream_call(self, prompt: str, **kwargs) -> Generator[str, None, None]:
+        """
+        流式调用LLM，逐块生成文本
+
+        默认一次性返回call的完整结果，支持流式接口的子类可覆盖为逐token产出，
+        调用方在首个token到达时即可开始展示。
+
+        Args:
+            prompt: 输入提示词
+            **kwargs: 额外参数（温度、最大令牌数等）
+
+        Yields:
+            文本块
+        """
+        yield self.call(prompt, **kwargs)
+
     def __call__(self, prompt: str, **kwargs) -> str:
         """使实例可调用，方便使用"""
         return self.call(prompt, **kwargs)
@@ -93,6 +125,9 @@ class LLMClientBase(LLMInterface):
 
     def _log_call(self, prompt: str, response: str) -> None:
         """记录LLM调用日志"""
+        # 预览截断和拼接只在DEBUG级别启用时才有意义
+        if not logger.isEnabledFor(logging.DEBUG):
+            return
         prompt_preview = prompt[:100] + "..." if len(prompt) > 100 else prompt
         response_preview = response[:100] + "..." if len(response) > 100 else response
 
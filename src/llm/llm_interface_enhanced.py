@@ -7,11 +7,13 @@
 import asyncio
 import time
 from abc import ABC, abstractmethod
-from typing import Optional, Dict, Any, AsyncGenerator, Generator, Union
+from typing import Optional, Dict, Any, AsyncGenerator, Callable, Generator, List, Union
 import logging
 from dataclasses import dataclass
 from enum import Enum
 
+from .deepseek_models import count_tokens
+
 logger = logging.getLogger(__name__)
 
 
@@ -179,6 +181,7 @@ class EnhancedLLMClientBase(EnhancedLLMInterface):
     def call(self, prompt: str, **kwargs) -> LLMResponse:
         """同步调用实现"""
         start_time = time.time()
+        start_ns = time.perf_counter_ns()
 
         try:
             # 验证提示词
@@ -192,16 +195,17 @@ class EnhancedLLMClientBase(EnhancedLLMInterface):
             response_content = self._execute_call(prompt, connection, **kwargs)
 
             # 计算延迟
-            latency = time.time() - start_time
+            latency = self._elapsed(start_ns)
 
             # 更新统计
-            self._update_stats(success=True, tokens=len(response_content.split()), latency=latency)
+            tokens = count_tokens(response_content)
+            self._update_stats(success=True, tokens=tokens, latency=latency)
 
             # 创建响应对象
             response = LLMResponse(
                 content=response_content,
                 model=self.model_name,
-                tokens_used=len(response_content.split()),
+                tokens_used=tokens,
                 latency=latency,
                 metadata={
                     "mode": LLMCallMode.SYNC.value,
@@ -214,7 +218,7 @@ class EnhancedLLMClientBase(EnhancedLLMInterface):
 
         except Exception as e:
             # 更新统计
-            self._update_stats(success=False, tokens=0, latency=time.time() - start_time)
+            self._update_stats(success=False, tokens=0, latency=self._elapsed(start_ns))
             logger.error(f"LLM调用失败: {e}")
             raise
 
@@ -224,6 +228,33 @@ class EnhancedLLMClientBase(EnhancedLLMInterface):
         loop = asyncio.get_event_loop()
         return await loop.run_in_executor(None, lambda: self.call(prompt, **kwargs))
 
+    async def async_batch(
+        self, prompts: List[str], max_concurrency: int = 64, **kwargs
+    ) -> List[Union[LLMResponse, BaseException]]:
+        """
+        并发异步调用一批提示词
+
+        通过asyncio.gather并发执行async_call，信号量限制同时在途的请求数；
+        可逐步调大max_concurrency，直到429比例或延迟不再改善。
+
+        Args:
+            prompts: 提示词列表
+            max_concurrency: 同时在途的请求上限
+            **kwargs: 传给async_call的额外参数
+
+        Returns:
+            与prompts顺序一致的结果列表；单个请求失败时对应位置为异常对象
+        """
+        if max_concurrency <= 0:
+            raise ValueError(f"max_concurrency必须为正整数，实际值: {max_concurrency}")
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def one(prompt: str) -> LLMResponse:
+            async with semaphore:
+                return await self.async_call(prompt, **kwargs)
+
+        return await asyncio.gather(*(one(p) for p in prompts), return_exceptions=True)
+
     def stream_call(self, prompt: str, **kwargs) -> Generator[str, None, None]:
         """流式调用实现"""
         # 简化实现：模拟流式响应
@@ -281,6 +312,11 @@ class EnhancedLLMClientBase(EnhancedLLMInterface):
         """执行实际的LLM调用（由子类实现）"""
         raise NotImplementedError("子类必须实现_execute_call方法")
 
+    @staticmethod
+    def _elapsed(start_ns: int) -> float:
+        """自start_ns（time.perf_counter_ns()）起经过的秒数，不受系统时钟调整影响"""
+        return (time.perf_counter_ns() - start_ns) / 1e9
+
     def _update_stats(self, success: bool, tokens: int, latency: float):
         """更新统计信息"""
         self._stats["total_calls"] += 1
@@ -292,8 +328,15 @@ class EnhancedLLMClientBase(EnhancedLLMInterface):
             self._stats["failed_calls"] += 1
         self._stats["last_call_time"] = time.time()
 
-    def _log_call(self, prompt: str, response: str, mode: LLMCallMode) -> None:
-        """记录LLM调用日志"""
+    def _log_call(
+        self, prompt: str, response: Union[str, Callable[[], str]], mode: LLMCallMode
+    ) -> None:
+        """记录LLM调用日志；response可传入返回文本的函数，仅在DEBUG启用时才拼出完整响应"""
+        # 预览截断和拼接只在DEBUG级别启用时才有意义
+        if not logger.isEnabledFor(logging.DEBUG):
+            return
+        if callable(response):
+            response = response()
         prompt_preview = prompt[:100] + "..." if len(prompt) > 100 else prompt
         response_preview = response[:100] + "..." if len(response) > 100 else response
 
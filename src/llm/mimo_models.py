@@ -1,3 +1,7 @@
+import functools
+import sys
+from types import MappingProxyType
+
 MIMO_MODELS = {
     "mimo-v2-flash": {
         "context_length_tokens": 32000,
@@ -8,6 +12,15 @@ MIMO_MODELS = {
     },
 }
 
+# 只读视图，键驻留，避免调用方意外修改模型表
+MIMO_MODELS = MappingProxyType(
+    {sys.intern(k): MappingProxyType(v) for k, v in MIMO_MODELS.items()}
+)
+
+DEFAULT_CTX: int = 32000
+
+
+@functools.lru_cache(maxsize=16)
 def get_model_context_length(model_name: str) -> int:
-    info = MIMO_MODELS.get(model_name, {})
-    return int(info.get("context_length_tokens", 32000))
+    info = MIMO_MODELS.get(model_name)
+    return int(info["context_length_tokens"]) if info is not None else DEFAULT_CTX
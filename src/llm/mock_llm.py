@@ -4,15 +4,101 @@
 提供与DeepSeek API兼容的测试用模拟LLM接口。
 """
 
+import asyncio
+import random
 import re
 import time
-from typing import Dict, Any, Optional, Callable, List, Union, Generator
+from typing import Dict, Any, Optional, Callable, List, Tuple, Union, Generator
 import logging
 
 from .llm_interface import LLMClientBase
 
 logger = logging.getLogger(__name__)
 
+_MATCH_CACHE_LIMIT = 4096  # 匹配结果缓存上限，超出后整体清空
+
+
+class _KeywordAutomaton:
+    """
+    Aho–Corasick 多模式匹配自动机
+
+    一次扫描提示词即可找出所有命中的关键词；多个关键词同时命中时，
+    返回注册顺序最靠前的一个，与逐个 `in` 检查的结果保持一致。
+    """
+
+    def __init__(self, patterns: List[str]):
+        """
+        构建自动机
+
+        Args:
+            patterns: 关键词列表（已小写），列表下标即优先级
+        """
+        self.size = len(patterns)
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[int] = [-1]  # 该状态（含失败链）命中的最高优先级
+
+        self._empty = -1  # 空关键词总是命中
+        for priority, pattern in enumerate(patterns):
+            if not pattern:
+                if self._empty == -1:
+                    self._empty = priority
+                continue
+            state = 0
+            for char in pattern:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append(-1)
+                state = next_state
+            if self._output[state] == -1:
+                self._output[state] = priority
+
+        # 广度优先计算失败指针，并沿失败链合并最高优先级
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                inherited = self._output[self._fail[next_state]]
+                if inherited != -1 and (self._output[next_state] == -1 or inherited < self._output[next_state]):
+                    self._output[next_state] = inherited
+
+    def search(self, text: str) -> int:
+        """
+        查找命中的最高优先级关键词
+
+        Args:
+            text: 待匹配文本（已小写）
+
+        Returns:
+            关键词下标，无命中时返回-1
+        """
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        best = self._empty
+        if best == 0:
+            return best
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            hit = output[state]
+            if hit != -1 and (best == -1 or hit < best):
+                best = hit
+                if best == 0:
+                    break
+        return best
+
 
 class MockLLM(LLMClientBase):
     """
@@ -34,6 +120,7 @@ class MockLLM(LLMClientBase):
         enable_pattern_matching: bool = True,
         enable_latency_simulation: bool = False,
         latency_range: tuple = (0.01, 0.1),
+        enable_memoization: bool = True,
         **kwargs,  # 接受额外参数以保持兼容性
     ):
         """
@@ -50,6 +137,7 @@ class MockLLM(LLMClientBase):
             enable_pattern_matching: 是否启用模式匹配
             enable_latency_simulation: 是否启用延迟模拟
             latency_range: 延迟范围（秒），格式为(min, max)
+            enable_memoization: 是否缓存提示词的匹配结果，重复提示词跳过关键词匹配
             **kwargs: 额外参数（为兼容性保留，如api_key, api_base等）
         """
         # 调用父类初始化（LLMClientBase）
@@ -67,6 +155,14 @@ class MockLLM(LLMClientBase):
         self.enable_latency_simulation = enable_latency_simulation
         self.latency_range = latency_range
         self.response_function = None
+        self._automaton: Optional[_KeywordAutomaton] = None
+        # 构建自动机时的响应键（按顺序），与当前键不一致即重建
+        self._automaton_patterns: Tuple[str, ...] = ()
+        self.enable_memoization = enable_memoization
+        # 提示词 -> (响应键, 缺省响应)；只缓存匹配结论，响应值每次从responses读取，
+        # 可调用/列表响应仍按次求值。响应键（按顺序）变化时整体清空
+        self._match_cache: Dict[Tuple[str, bool], Tuple[Optional[str], Any]] = {}
+        self._match_cache_keys: Tuple[str, ...] = ()
         self.call_history = []  # 记录调用历史
         self.call_counter = 0  # 调用计数器
 
@@ -139,6 +235,31 @@ class MockLLM(LLMClientBase):
         if self.enable_latency_simulation:
             self._simulate_latency()
 
+        return self._respond(prompt, start_time, **kwargs)
+
+    async def acall(self, prompt: str, **kwargs) -> str:
+        """
+        异步模拟LLM调用
+
+        延迟模拟使用asyncio.sleep，不阻塞事件循环。
+
+        Args:
+            prompt: 输入提示词
+            **kwargs: 额外参数（同call）
+
+        Returns:
+            模拟响应文本
+        """
+        start_time = time.time()
+
+        if self.enable_latency_simulation:
+            min_latency, max_latency = self.latency_range
+            await asyncio.sleep(random.uniform(min_latency, max_latency))
+
+        return self._respond(prompt, start_time, **kwargs)
+
+    def _respond(self, prompt: str, start_time: float, **kwargs) -> str:
+        """生成响应并记录历史与统计（call/acall共用）"""
         # 验证提示词
         if not self._validate_prompt(prompt):
             logger.warning("提示词为空或无效")
@@ -169,12 +290,13 @@ class MockLLM(LLMClientBase):
         # 更新统计信息
         self._update_stats(success=True, tokens=len(response.split()), latency=latency)
 
-        logger.debug(
-            f"MockLLM调用 - 模型: {self.model_name}, "
-            f"提示词长度: {len(prompt)}, "
-            f"响应长度: {len(response)}, "
-            f"延迟: {latency:.3f}s"
-        )
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                f"MockLLM调用 - 模型: {self.model_name}, "
+                f"提示词长度: {len(prompt)}, "
+                f"响应长度: {len(response)}, "
+                f"延迟: {latency:.3f}s"
+            )
 
         return response
 
@@ -184,47 +306,71 @@ class MockLLM(LLMClientBase):
 
     def _simulate_latency(self) -> None:
         """模拟网络延迟"""
-        import random
         min_latency, max_latency = self.latency_range
         latency = random.uniform(min_latency, max_latency)
         time.sleep(latency)
 
     def _find_matching_response(self, prompt: str) -> str:
         """查找匹配的响应文本"""
-        prompt_lower = prompt.lower()
+        if self.enable_memoization:
+            keys = tuple(self.responses)
+            if keys != self._match_cache_keys or len(self._match_cache) >= _MATCH_CACHE_LIMIT:
+                self._match_cache.clear()
+                self._match_cache_keys = keys
+            cache_key = (prompt, self.enable_pattern_matching)
+            match = self._match_cache.get(cache_key)
+            if match is None:
+                match = self._match(prompt.lower())
+                self._match_cache[cache_key] = match
+        else:
+            match = self._match(prompt.lower())
+
+        key, fallback = match
+        if key is None:
+            # 返回默认响应
+            return self.default_response
+        return self._process_response(self.responses.get(key, fallback))
 
+    def _match(self, prompt_lower: str) -> Tuple[Optional[str], Any]:
+        """
+        确定提示词对应的响应键
+
+        Returns:
+            (响应键, 键不存在时的缺省响应)；响应键为None表示使用默认响应
+        """
         # 首先检查是否是动作选择提示
         if "请选择下一步动作" in prompt_lower or "请选择动作" in prompt_lower:
-            response = self.responses.get("请选择动作", self._get_action_sequence)
-            return self._process_response(response)
+            return "请选择动作", self._get_action_sequence
 
-        if self.enable_pattern_matching:
-            # 模式匹配 - 检查是否包含关键词
-            for pattern, response in self.responses.items():
-                pattern_lower = pattern.lower()
-                # 更宽松的匹配：检查是否包含关键词
-                if pattern_lower in prompt_lower:
-                    return self._process_response(response)
+        if self.enable_pattern_matching and self.responses:
+            # 模式匹配 - 单次扫描检查是否包含任一关键词
+            automaton = self._get_automaton()
+            index = automaton.search(prompt_lower)
+            if index != -1:
+                return self._automaton_patterns[index], None
 
         # 检查是否包含特定关键词（更宽松的匹配）
         if "索引" in prompt_lower and "列表" in prompt_lower:
-            response = self.responses.get("请仅输出索引列表", "0,1")
-            return self._process_response(response)
+            return "请仅输出索引列表", "0,1"
 
         if "refine:" in prompt_lower:
-            response = self.responses.get("refine:", "DELETE 0")
-            return self._process_response(response)
+            return "refine:", "DELETE 0"
 
         if "think:" in prompt_lower:
-            response = self.responses.get("think:", "Think: 模拟推理过程")
-            return self._process_response(response)
+            return "think:", "Think: 模拟推理过程"
 
         if "act:" in prompt_lower:
-            response = self.responses.get("act:", "Act: 模拟动作")
-            return self._process_response(response)
+            return "act:", "Act: 模拟动作"
+
+        return None, None
 
-        # 返回默认响应
-        return self.default_response
+    def _get_automaton(self) -> _KeywordAutomaton:
+        """获取关键词自动机，响应映射被替换或键有增删后惰性重建"""
+        patterns = tuple(self.responses)
+        if self._automaton is None or patterns != self._automaton_patterns:
+            self._automaton_patterns = patterns
+            self._automaton = _KeywordAutomaton([pattern.lower() for pattern in patterns])
+        return self._automaton
 
     def _process_response(self, response: Any) -> str:
         """处理响应，确保返回字符串"""
@@ -292,6 +438,9 @@ class MockLLM(LLMClientBase):
             pattern: 匹配模式（关键词）
             response: 响应文本或可调用函数
         """
+        if pattern not in self.responses:
+            self._automaton = None  # 新关键词，下次调用时重建自动机
+            self._match_cache.clear()
         self.responses[pattern] = response
 
     def set_default_response(self, response: str) -> None:
@@ -408,6 +557,12 @@ class DeterministicMockLLM(MockLLM):
 
         return self.fixed_response
 
+    async def acall(self, prompt: str, **kwargs) -> str:
+        """异步调用，同样总是返回固定响应"""
+        if self.enable_latency_simulation:
+            return await asyncio.to_thread(self.call, prompt, **kwargs)
+        return self.call(prompt, **kwargs)
+
 
 class MockLLMAdapter:
     """
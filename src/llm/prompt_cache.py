@@ -0,0 +1,273 @@
+"""
+LLM提示词缓存
+
+CachedLLM包装任意LLMInterface，按两级缓存复用响应：
+1. 精确匹配：以提示词与参数的SHA-256为键，命中无需任何计算；
+2. 语义匹配：按动作类型（动作选择/Think/Act）分别建立SemanticCache，
+   余弦相似度不低于该类型阈值时复用响应。Refine会修改记忆库，默认只做精确匹配。
+
+Agent各动作的提示词共用同一模板，整段向量化时模板文字占主导，不同任务之间的
+相似度也很高。因此语义匹配前先去掉与该类型参考提示词（首个见到的提示词）相同的
+行，只对任务、记忆、轨迹等变化部分向量化。
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .llm_interface import LLMInterface
+
+try:
+    from ..memory.semantic_cache import SemanticCache
+except (ImportError, ValueError):
+    from memory.semantic_cache import SemanticCache
+
+logger = logging.getLogger(__name__)
+
+# 各动作类型的语义命中阈值；None表示只做精确匹配
+DEFAULT_THRESHOLDS: Dict[str, Optional[float]] = {
+    "select": 0.97,
+    "think": 0.97,
+    "act": 0.97,
+    "refine": None,
+    "other": None,
+}
+
+
+def classify_prompt(prompt: str) -> str:
+    """
+    按ReMemAgent的提示词模板判断动作类型
+
+    Returns:
+        select / think / act / refine / other
+    """
+    head = prompt.lstrip()
+    if head.startswith("Think:"):
+        return "think"
+    if head.startswith("Act:"):
+        return "act"
+    if head.startswith("Refine:"):
+        return "refine"
+    if "请选择下一步动作" in prompt:
+        return "select"
+    return "other"
+
+
+class CachedLLM(LLMInterface):
+    """带精确匹配与语义匹配两级缓存的LLM包装器"""
+
+    def __init__(
+        self,
+        llm: LLMInterface,
+        embedder: Optional[Callable[[str], List[float]]] = None,
+        thresholds: Optional[Dict[str, Optional[float]]] = None,
+        max_entries: int = 1024,
+        classify: Callable[[str], str] = classify_prompt,
+    ):
+        """
+        初始化提示词缓存
+
+        Args:
+            llm: 被包装的LLM实例
+            embedder: 文本向量化函数；默认使用SemanticCache的HashingEmbedder
+            thresholds: 按动作类型覆盖DEFAULT_THRESHOLDS中的语义阈值
+            max_entries: 精确缓存与每个语义缓存的最大条目数
+            classify: 提示词到动作类型的映射函数
+        """
+        self.llm = llm
+        self.embedder = embedder
+        self.thresholds = dict(DEFAULT_THRESHOLDS)
+        if thresholds:
+            self.thresholds.update(thresholds)
+        self.max_entries = max_entries
+        self.classify = classify
+
+        self._exact: "OrderedDict[str, str]" = OrderedDict()
+        self._semantic: Dict[str, SemanticCache] = {}
+        self._references: Dict[str, List[str]] = {}  # 动作类型 -> 参考提示词的行
+        self._stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0}
+
+    def call(self, prompt: str, **kwargs) -> str:
+        """
+        调用LLM，命中缓存时直接返回
+
+        Args:
+            prompt: 输入提示词
+            **kwargs: 额外参数；带参数的调用只做精确匹配
+
+        Returns:
+            LLM生成的文本
+        """
+        key, kind, cached = self._lookup(prompt, kwargs)
+        if cached is not None:
+            return cached
+        response = self.llm.call(prompt, **kwargs)
+        self._store(key, kind, prompt, kwargs, response)
+        return response
+
+    async def acall(self, prompt: str, **kwargs) -> str:
+        """异步调用LLM，缓存语义与call一致"""
+        key, kind, cached = self._lookup(prompt, kwargs)
+        if cached is not None:
+            return cached
+        acall = getattr(self.llm, "acall", None)
+        if acall is not None:
+            response = await acall(prompt, **kwargs)
+        else:
+            response = await asyncio.to_thread(self.llm, prompt, **kwargs)
+        self._store(key, kind, prompt, kwargs, response)
+        return response
+
+    def get_model_info(self) -> Dict[str, Any]:
+        """获取模型信息（附带缓存配置）"""
+        info = dict(self.llm.get_model_info())
+        info["prompt_cache"] = {
+            "thresholds": dict(self.thresholds),
+            "max_entries": self.max_entries,
+        }
+        return info
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息"""
+        stats = dict(self._stats)
+        stats["exact_size"] = len(self._exact)
+        stats["semantic_size"] = {kind: len(cache) for kind, cache in self._semantic.items()}
+        lookups = stats["exact_hits"] + stats["semantic_hits"] + stats["misses"]
+        stats["hit_rate"] = (
+            (stats["exact_hits"] + stats["semantic_hits"]) / lookups if lookups else 0.0
+        )
+        return stats
+
+    def clear(self) -> None:
+        """清空缓存"""
+        self._exact.clear()
+        self._semantic.clear()
+        self._references.clear()
+
+    def save(self, path: str) -> None:
+        """
+        保存缓存到磁盘
+
+        精确缓存与参考提示词写入 path + ".json"，各类型语义缓存写入
+        path + ".<类型>" 前缀（见SemanticCache.save）。
+
+        Args:
+            path: 文件路径前缀
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path + ".json", "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "exact": list(self._exact.items()),
+                    "references": self._references,
+                    "semantic_kinds": [kind for kind, cache in self._semantic.items() if len(cache)],
+                },
+                f,
+                ensure_ascii=False,
+            )
+        for kind, cache in self._semantic.items():
+            if len(cache):
+                cache.save(f"{path}.{kind}")
+        logger.info(f"提示词缓存已保存: {len(self._exact)} 条 -> {path}")
+
+    def load(self, path: str) -> None:
+        """
+        从磁盘加载缓存（替换当前内容）
+
+        Args:
+            path: save使用的文件路径前缀
+        """
+        with open(path + ".json", "r", encoding="utf-8") as f:
+            data = json.load(f)
+        self.clear()
+        for key, response in data.get("exact", [])[-self.max_entries:]:
+            self._exact[key] = response
+        self._references = {kind: list(lines) for kind, lines in data.get("references", {}).items()}
+        for kind in data.get("semantic_kinds", []):
+            cache = self._semantic_cache(kind)
+            if cache is not None:
+                cache.load(f"{path}.{kind}")
+        logger.info(f"提示词缓存已加载: {len(self._exact)} 条 <- {path}")
+
+    def _lookup(
+        self, prompt: str, kwargs: Dict[str, Any]
+    ) -> Tuple[str, str, Optional[str]]:
+        """依次查询精确缓存与语义缓存，返回(精确键, 动作类型, 命中的响应)"""
+        key = self._exact_key(prompt, kwargs)
+        kind = self.classify(prompt)
+        cached = self._exact.get(key)
+        if cached is not None:
+            self._exact.move_to_end(key)
+            self._stats["exact_hits"] += 1
+            return key, kind, cached
+
+        if not kwargs:
+            cache = self._semantic_cache(kind)
+            if cache is not None and kind in self._references:
+                hit = cache.get(self._semantic_text(kind, prompt))
+                if hit is not None:
+                    self._stats["semantic_hits"] += 1
+                    logger.debug(f"提示词语义缓存命中: {kind}")
+                    return key, kind, hit["response"]
+
+        self._stats["misses"] += 1
+        return key, kind, None
+
+    def _store(
+        self, key: str, kind: str, prompt: str, kwargs: Dict[str, Any], response: str
+    ) -> None:
+        """写入精确缓存；无额外参数时同时写入语义缓存"""
+        if not response:
+            return
+        self._exact[key] = response
+        self._exact.move_to_end(key)
+        while len(self._exact) > self.max_entries:
+            self._exact.popitem(last=False)
+
+        if kwargs:
+            return
+        cache = self._semantic_cache(kind)
+        if cache is None:
+            return
+        if kind not in self._references:
+            self._references[kind] = prompt.splitlines()
+        text = self._semantic_text(kind, prompt)
+        if text:
+            cache.put(text, {"response": response})
+
+    def _semantic_cache(self, kind: str) -> Optional[SemanticCache]:
+        """获取动作类型对应的语义缓存；该类型未启用语义匹配时返回None"""
+        threshold = self.thresholds.get(kind)
+        if threshold is None:
+            return None
+        cache = self._semantic.get(kind)
+        if cache is None:
+            cache = SemanticCache(
+                embedder=self.embedder,
+                threshold=threshold,
+                max_entries=self.max_entries,
+                ttl_seconds=None,
+            )
+            self._semantic[kind] = cache
+        return cache
+
+    def _semantic_text(self, kind: str, prompt: str) -> str:
+        """去掉与参考提示词相同的模板行，只保留变化部分用于向量化"""
+        template = set(self._references.get(kind, ()))
+        return "\n".join(
+            line for line in prompt.splitlines() if line.strip() and line not in template
+        )
+
+    @staticmethod
+    def _exact_key(prompt: str, kwargs: Dict[str, Any]) -> str:
+        """精确匹配键：提示词与参数规范化JSON的SHA-256"""
+        payload = json.dumps(
+            {"p": prompt, "k": kwargs}, sort_keys=True, ensure_ascii=False, default=repr
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
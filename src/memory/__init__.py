@@ -1,5 +1,6 @@
 from .schema import MemoryOperation, MemoryRecord, TaskContext
 from .llm_retrieval import LLMWorkRetriever, RetrievalHit, RetrievalRun
+from .semantic_cache import HashingEmbedder, SemanticCache
 from .stores import (
     InMemoryTraceStore,
     JsonMemoryStore,
@@ -16,6 +17,8 @@ __all__ = [
     "LLMWorkRetriever",
     "RetrievalHit",
     "RetrievalRun",
+    "HashingEmbedder",
+    "SemanticCache",
     "MemoryStore",
     "JsonMemoryStore",
     "MarkdownLayerMemoryStore",
@@ -0,0 +1,249 @@
+"""
+向量检索数值内核
+
+提供余弦相似度Top-K打分。优先使用Numba JIT编译的并行内核（fastmath可向量化，
+cache=True后再次启动无需重新编译）；未安装Numba时使用_kernels_aot提前编译的扩展
+模块pm_mem_kernels，其次NumPy矩阵乘法，都不可用时退回纯Python实现。
+输入向量需已做L2归一化，点积即余弦相似度。
+
+JIT路径的float32打分与Top-K选择融合在一个内核中：各线程在自己的行区间内维护
+局部Top-K，最后合并，不生成长度为N的分数数组。
+
+另提供int8对称量化版本：每个向量按max|v|/127缩放为int8并保留一个float32比例，
+打分时以int32累加点积再乘回比例，扫描时的内存带宽约为float32的1/4。
+"""
+
+import heapq
+import logging
+from typing import List, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+try:
+    import numba
+except ImportError:  # pragma: no cover - optional dependency
+    numba = None
+
+try:
+    from . import pm_mem_kernels as _aot
+except ImportError:  # pragma: no cover - 需先运行 python -m src.memory._kernels_aot
+    _aot = None
+
+logger = logging.getLogger(__name__)
+
+HAS_NUMPY = np is not None
+HAS_AOT = HAS_NUMPY and _aot is not None
+HAS_NUMBA = HAS_NUMPY and numba is not None
+
+
+if HAS_NUMPY:
+
+    def _numpy_cosine_scores(q, E):
+        return E @ q
+
+    def _numpy_cosine_scores_int8(q, q_scale, E, scales):
+        acc = E.astype(np.int32) @ q.astype(np.int32)
+        return acc.astype(np.float32) * (q_scale * scales)
+
+
+if HAS_NUMBA:
+
+    @numba.njit(parallel=True, fastmath=True, cache=True)
+    def _cosine_scores(q, E):  # pragma: no cover - compiled
+        n = E.shape[0]
+        d = E.shape[1]
+        scores = np.empty(n, dtype=np.float32)
+        for i in numba.prange(n):
+            s = 0.0
+            for j in range(d):
+                s += q[j] * E[i, j]
+            scores[i] = s
+        return scores
+
+    @numba.njit(parallel=True, fastmath=True, cache=True)
+    def _cosine_topk_partials(q, E, k, n_chunks):  # pragma: no cover - compiled
+        n = E.shape[0]
+        d = E.shape[1]
+        size = (n + n_chunks - 1) // n_chunks
+        best_scores = np.full((n_chunks, k), -np.inf, dtype=np.float32)
+        best_rows = np.full((n_chunks, k), -1, dtype=np.int64)
+        for c in numba.prange(n_chunks):
+            top_scores = best_scores[c]
+            top_rows = best_rows[c]
+            for i in range(c * size, min(n, (c + 1) * size)):
+                s = np.float32(0.0)
+                for j in range(d):
+                    s += q[j] * E[i, j]
+                if s > top_scores[k - 1]:
+                    # 插入排序维护降序的局部Top-K
+                    p = k - 1
+                    while p > 0 and top_scores[p - 1] < s:
+                        top_scores[p] = top_scores[p - 1]
+                        top_rows[p] = top_rows[p - 1]
+                        p -= 1
+                    top_scores[p] = s
+                    top_rows[p] = i
+        return best_scores.ravel(), best_rows.ravel()
+
+    @numba.njit(parallel=True, fastmath=True, cache=True)
+    def _cosine_scores_int8(q, q_scale, E, scales):  # pragma: no cover - compiled
+        n = E.shape[0]
+        d = E.shape[1]
+        scores = np.empty(n, dtype=np.float32)
+        for i in numba.prange(n):
+            acc = np.int32(0)
+            for j in range(d):
+                acc += np.int32(q[j]) * np.int32(E[i, j])
+            scores[i] = acc * q_scale * scales[i]
+        return scores
+
+elif HAS_AOT:
+
+    # AOT签名固定为C连续可写数组；只读映射(np.load mmap)等输入退回NumPy
+    def _cosine_scores(q, E):
+        try:
+            return _aot.cosine_scores(q, E)
+        except TypeError:
+            return _numpy_cosine_scores(q, E)
+
+    def _cosine_scores_int8(q, q_scale, E, scales):
+        try:
+            return _aot.cosine_scores_int8(q, q_scale, E, scales)
+        except TypeError:
+            return _numpy_cosine_scores_int8(q, q_scale, E, scales)
+
+elif HAS_NUMPY:
+    _cosine_scores = _numpy_cosine_scores
+    _cosine_scores_int8 = _numpy_cosine_scores_int8
+
+
+def _select_topk(scores, k: int) -> List[Tuple[int, float]]:
+    """从分数数组中选出Top-K并按分数降序返回"""
+    n = len(scores)
+    if k < n:
+        idx = np.argpartition(-scores, k - 1)[:k]
+    else:
+        idx = np.arange(n)
+    idx = idx[np.argsort(-scores[idx], kind="stable")]
+    return [(int(i), float(scores[i])) for i in idx]
+
+
+def as_matrix(vectors: Sequence[Sequence[float]]):
+    """
+    将向量列表转换为连续的float32矩阵
+
+    Args:
+        vectors: 等长向量列表
+
+    Returns:
+        NumPy可用时返回C连续的二维数组，否则原样返回列表
+    """
+    if not HAS_NUMPY:
+        return [list(v) for v in vectors]
+    return np.ascontiguousarray(vectors, dtype=np.float32)
+
+
+def topk_cosine(query: Sequence[float], matrix, k: int) -> List[Tuple[int, float]]:
+    """
+    计算查询向量与矩阵各行的余弦相似度并返回Top-K
+
+    Args:
+        query: L2归一化的查询向量
+        matrix: as_matrix返回的向量矩阵（每行一条L2归一化向量）
+        k: 返回条数
+
+    Returns:
+        按相似度降序排列的(行号, 相似度)列表
+    """
+    n = len(matrix)
+    if n == 0 or k <= 0:
+        return []
+    k = min(k, n)
+
+    if not HAS_NUMPY:
+        scores = (sum(a * b for a, b in zip(query, row)) for row in matrix)
+        return heapq.nlargest(k, enumerate(scores), key=lambda item: item[1])
+
+    q = np.ascontiguousarray(query, dtype=np.float32)
+    if HAS_NUMBA:
+        scores, rows = _cosine_topk_partials(q, matrix, k, numba.get_num_threads())
+        valid = rows >= 0
+        scores, rows = scores[valid], rows[valid]
+        order = np.argsort(-scores, kind="stable")[:k]
+        return [(int(rows[i]), float(scores[i])) for i in order]
+    scores = _cosine_scores(q, matrix)
+    return _select_topk(scores, k)
+
+
+def quantize_int8(vectors: Sequence[Sequence[float]]):
+    """
+    按向量做int8对称量化
+
+    Args:
+        vectors: 等长向量列表
+
+    Returns:
+        (量化矩阵, 每行比例)；NumPy可用时为int8矩阵与float32数组，否则为列表
+    """
+    if not HAS_NUMPY:
+        quantized, scales = [], []
+        for vector in vectors:
+            peak = max((abs(v) for v in vector), default=0.0)
+            scale = peak / 127.0 if peak > 0.0 else 1.0
+            quantized.append([int(round(v / scale)) for v in vector])
+            scales.append(scale)
+        return quantized, scales
+
+    matrix = np.asarray(vectors, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1)
+    peaks = np.abs(matrix).max(axis=1) if matrix.size else np.zeros(len(matrix), dtype=np.float32)
+    scales = np.where(peaks > 0.0, peaks / 127.0, 1.0).astype(np.float32)
+    quantized = np.clip(np.rint(matrix / scales[:, None]), -127, 127).astype(np.int8)
+    return np.ascontiguousarray(quantized), scales
+
+
+def topk_cosine_int8(query: Sequence[float], quantized, scales, k: int) -> List[Tuple[int, float]]:
+    """
+    在int8量化矩阵上计算近似余弦相似度Top-K
+
+    Args:
+        query: L2归一化的查询向量（float），内部同样做int8量化
+        quantized: quantize_int8返回的量化矩阵
+        scales: quantize_int8返回的每行比例
+        k: 返回条数
+
+    Returns:
+        按近似相似度降序排列的(行号, 相似度)列表
+    """
+    n = len(quantized)
+    if n == 0 or k <= 0:
+        return []
+    k = min(k, n)
+
+    (q,), (q_scale,) = quantize_int8([query])
+    if not HAS_NUMPY:
+        scores = (
+            sum(a * b for a, b in zip(q, row)) * q_scale * scale
+            for row, scale in zip(quantized, scales)
+        )
+        return heapq.nlargest(k, enumerate(scores), key=lambda item: item[1])
+
+    scores = _cosine_scores_int8(q, np.float32(q_scale), quantized, scales)
+    return _select_topk(scores, k)
+
+
+def _warmup() -> None:
+    """以极小输入触发一次JIT编译，配合cache=True摊销首次编译开销"""
+    try:
+        topk_cosine([1.0, 0.0], as_matrix([[1.0, 0.0], [0.0, 1.0]]), 1)
+        topk_cosine_int8([1.0, 0.0], *quantize_int8([[1.0, 0.0], [0.0, 1.0]]), 1)
+    except Exception as e:  # pragma: no cover - 编译失败时保持可用
+        logger.warning(f"Numba内核预热失败: {e}")
+
+
+if HAS_NUMBA:
+    _warmup()
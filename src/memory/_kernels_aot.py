@@ -0,0 +1,73 @@
+"""
+向量检索内核的AOT编译脚本
+
+使用numba.pycc将_kernels中的打分循环提前编译为扩展模块pm_mem_kernels，
+供构建时有Numba、运行时未安装Numba的部署环境使用；运行时装有Numba时
+_kernels优先使用JIT内核（fastmath向量化，按cache=True缓存编译结果）。
+
+用法：
+    python -m src.memory._kernels_aot [--output-dir 目录]
+
+默认输出到本文件所在目录（src/memory），需安装numba。
+"""
+
+import argparse
+import os
+
+
+def build(output_dir: str) -> None:
+    """
+    编译pm_mem_kernels扩展模块
+
+    Args:
+        output_dir: 输出目录
+    """
+    from numba.pycc import CC
+
+    import numpy as np
+
+    cc = CC("pm_mem_kernels")
+    cc.output_dir = output_dir
+    cc.verbose = True
+
+    @cc.export("cosine_scores", "f4[:](f4[::1], f4[:, ::1])")
+    def cosine_scores(q, E):
+        n = E.shape[0]
+        d = E.shape[1]
+        scores = np.empty(n, dtype=np.float32)
+        for i in range(n):
+            s = np.float32(0.0)
+            for j in range(d):
+                s += q[j] * E[i, j]
+            scores[i] = s
+        return scores
+
+    @cc.export("cosine_scores_int8", "f4[:](i1[::1], f4, i1[:, ::1], f4[::1])")
+    def cosine_scores_int8(q, q_scale, E, scales):
+        n = E.shape[0]
+        d = E.shape[1]
+        scores = np.empty(n, dtype=np.float32)
+        for i in range(n):
+            acc = np.int32(0)
+            for j in range(d):
+                acc += np.int32(q[j]) * np.int32(E[i, j])
+            scores[i] = acc * q_scale * scales[i]
+        return scores
+
+    cc.compile()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="AOT编译向量检索内核")
+    parser.add_argument(
+        "--output-dir",
+        default=os.path.dirname(os.path.abspath(__file__)),
+        help="扩展模块输出目录（默认src/memory）",
+    )
+    args = parser.parse_args()
+    build(args.output_dir)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -2,18 +2,167 @@
 记忆库管理
 
 实现MemoryBank类管理记忆条目集合，支持添加、删除、合并、重标签操作，提供基于LLM的检索接口。
+
+记忆条目按列（SoA）存储：id/x/y/feedback/tag/timestamp各为一个列表，统计与扫描
+直接遍历单列；MemoryBank.entries返回兼容list用法的序列视图，元素为按需生成的
+条目视图，读写会直接落到对应的列上。添加的MemoryEntry对象本身会绑定为所在行的
+视图，之后对它的修改同样写入记忆库；条目ID在记忆库内必须唯一。
+
+设置向量化器（set_embedder）后，记忆较多时检索先按向量相似度粗筛候选，只把候选
+条目交给LLM评估。向量作为额外一列保存，缺失的向量在检索时批量计算，并缓存为
+连续的float32矩阵（或int8量化矩阵与每行比例）。
 """
 
-from typing import List, Optional, Dict, Any, Union
+from collections import Counter
+from collections.abc import MutableSequence
+from typing import Callable, List, Optional, Dict, Any, Union
 from datetime import datetime
 import logging
 import json
+import weakref
 
+from ._kernels import as_matrix, quantize_int8, topk_cosine, topk_cosine_int8
 from .entry import MemoryEntry
 from .retrieval_result import RetrievalResult
+from .semantic_cache import INDEX_KINDS, _create_index
 
 logger = logging.getLogger(__name__)
 
+_COLUMNS = ("x", "y", "feedback", "tag", "timestamp")
+
+
+def _column_property(name: str) -> property:
+    """生成条目视图的列属性：绑定记忆库时读写列数组，解绑后读写自身副本"""
+    base = getattr(MemoryEntry, name)
+    attr = "_" + name
+
+    def fget(self):
+        bank = self._bank
+        if bank is None:
+            return getattr(self, attr)
+        return getattr(bank, attr)[bank._position(self._id)]
+
+    def fset(self, value):
+        # 复用MemoryEntry的类型校验
+        base.fset(self, value)
+        bank = self._bank
+        if bank is not None:
+            bank._set_cell(name, bank._position(self._id), value)
+
+    return property(fget, fset, doc=base.__doc__)
+
+
+class _EntryView(MemoryEntry):
+    """记忆库列存储上的条目视图，从记忆库移除后自动解绑为独立条目"""
+
+    def __init__(self, bank: "MemoryBank", entry_id: str):
+        self._bank = bank
+        self._id = entry_id
+
+    x = _column_property("x")
+    y = _column_property("y")
+    feedback = _column_property("feedback")
+    tag = _column_property("tag")
+    timestamp = _column_property("timestamp")
+
+    @property
+    def id(self) -> str:
+        """获取记忆条目ID"""
+        return self._id
+
+    @id.setter
+    def id(self, value: str) -> None:
+        """设置记忆条目ID"""
+        old_id = self._id
+        if self._bank is not None and value != old_id:
+            self._bank._check_new_id(value)
+        MemoryEntry.id.fset(self, value)
+        if self._bank is not None:
+            self._bank._rename(old_id, value)
+
+    def _detach(self) -> None:
+        """将当前列值复制到自身并解除与记忆库的绑定"""
+        bank = self._bank
+        position = bank._position(self._id)
+        for name in _COLUMNS:
+            setattr(self, "_" + name, getattr(bank, "_" + name)[position])
+        self._bank = None
+
+
+class _EntriesView(MutableSequence):
+    """MemoryBank.entries的序列视图，兼容原List[MemoryEntry]的读写用法"""
+
+    __slots__ = ("_bank",)
+
+    def __init__(self, bank: "MemoryBank"):
+        self._bank = bank
+
+    def __len__(self) -> int:
+        return len(self._bank._ids)
+
+    def __getitem__(self, index):
+        bank = self._bank
+        if isinstance(index, slice):
+            return [bank._view(p) for p in range(*index.indices(len(bank._ids)))]
+        return bank._view(self._normalize(index))
+
+    def __setitem__(self, index, entry) -> None:
+        if isinstance(index, slice):
+            positions = range(*index.indices(len(self)))
+            if index.step not in (None, 1):
+                for position, item in zip(positions, list(entry), strict=True):
+                    self._bank._write_row(position, item)
+                return
+            items = list(entry)
+            self._bank._remove_rows(positions)
+            for offset, item in enumerate(items):
+                self._bank._insert_row(positions.start + offset, item)
+            return
+        self._bank._write_row(self._normalize(index), entry)
+
+    def __delitem__(self, index) -> None:
+        if isinstance(index, slice):
+            self._bank._remove_rows(range(*index.indices(len(self))))
+        else:
+            self._bank._remove_rows([self._normalize(index)])
+
+    def insert(self, index: int, entry: MemoryEntry) -> None:
+        n = len(self)
+        if index < 0:
+            index = max(0, n + index)
+        self._bank._insert_row(min(index, n), entry)
+
+    def __iter__(self):
+        bank = self._bank
+        for position in range(len(bank._ids)):
+            yield bank._view(position)
+
+    def sort(self, *, key=None, reverse: bool = False) -> None:
+        bank = self._bank
+        if key is None:
+            raise TypeError("MemoryEntry不支持直接比较，请提供key")
+        order = sorted(range(len(bank._ids)), key=lambda p: key(bank._view(p)), reverse=reverse)
+        bank._reorder(order)
+
+    def clear(self) -> None:
+        self._bank._remove_rows(range(len(self)))
+
+    def _normalize(self, index: int) -> int:
+        n = len(self._bank._ids)
+        if index < 0:
+            index += n
+        if not 0 <= index < n:
+            raise IndexError("list index out of range")
+        return index
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, (list, tuple, _EntriesView)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return repr(list(self))
+
 
 class MemoryBank:
     """记忆库类，管理记忆条目集合"""
@@ -25,29 +174,413 @@ class MemoryBank:
         Args:
             max_entries: 最大记忆容量
         """
-        self.entries: List[MemoryEntry] = []
+        # 列式存储
+        self._ids: List[str] = []
+        self._x: List[str] = []
+        self._y: List[str] = []
+        self._feedback: List[str] = []
+        self._tag: List[str] = []
+        self._timestamp: List[datetime] = []
+        self._positions: Optional[Dict[str, int]] = {}  # id -> 行号，为None时按需重建
+        self._tag_counter: Counter = Counter()  # 标签计数，随增删改增量维护
+        self._views: "weakref.WeakValueDictionary[str, _EntryView]" = weakref.WeakValueDictionary()
+        self._version = 0  # 内容版本号，任何列写入都会递增
+        self._texts: List[Optional[str]] = []  # to_text()结果缓存列，None表示需重新生成
+        # 向量列：None表示尚未计算或内容已变更；矩阵为其连续副本，变更时置空
+        self._embeddings: List[Optional[List[float]]] = []
+        self._embedding_matrix = None
+        self.embedder: Optional[Callable[[str], List[float]]] = None
+        self.candidate_limit = 32
+        self.quantize = False
+        # 近似最近邻索引（lsh/hnsw）：标签为自增整数，与条目ID双向映射
+        self.index_kind = "flat"
+        self._ann_index = None
+        self._ann_labels: Dict[str, int] = {}
+        self._ann_ids: Dict[int, str] = {}
+        self._next_label = 0
+        # 变更日志：供持久化层把增量写入WAL，None表示未跟踪（见reset_journal）
+        self._journal: Optional[Dict[str, Any]] = None
         self.max_entries = max_entries
         self.operation_history: List[Dict[str, Any]] = []  # 操作历史记录
 
+    @property
+    def version(self) -> int:
+        """内容版本号；版本不变即记忆内容未被修改，可据此复用检索结果"""
+        return self._version
+
+    @property
+    def journal(self) -> Optional[Dict[str, Any]]:
+        """自上次reset_journal以来的变更日志；未跟踪时为None"""
+        return self._journal
+
+    def reset_journal(self, full: bool = False) -> None:
+        """
+        从当前状态开始记录变更
+
+        日志记录新增(added)、修改(updated)、删除(removed)的条目ID。新增只支持追加到
+        末尾；插入到中间、重排或修改ID无法按条目增量表示，会置full标志。
+
+        Args:
+            full: 是否直接标记为需要整库写入
+        """
+        self._journal = {"added": {}, "updated": {}, "removed": {}, "full": full}
+
+    def take_journal(self) -> Optional[Dict[str, Any]]:
+        """取出当前变更日志并重新开始记录；未跟踪时返回None"""
+        journal = self._journal
+        if journal is not None:
+            self.reset_journal()
+        return journal
+
+    def _log_change(self, kind: str, entry_id: Optional[str] = None) -> None:
+        """向变更日志记录一次行级变更"""
+        journal = self._journal
+        if journal is None:
+            return
+        if kind == "full":
+            journal["full"] = True
+        elif kind == "add":
+            journal["added"][entry_id] = None
+        elif kind == "update":
+            if entry_id not in journal["added"]:
+                journal["updated"][entry_id] = None
+        elif entry_id in journal["added"]:
+            del journal["added"][entry_id]
+        else:
+            journal["updated"].pop(entry_id, None)
+            journal["removed"][entry_id] = None
+
+    @property
+    def entries(self) -> "_EntriesView":
+        """记忆条目序列视图"""
+        return _EntriesView(self)
+
+    @entries.setter
+    def entries(self, entries: List[MemoryEntry]) -> None:
+        """整体替换记忆条目"""
+        entries = list(entries)
+        self._remove_rows(range(len(self._ids)))
+        for entry in entries:
+            self._insert_row(len(self._ids), entry)
+
+    # ====== 列存储维护 ======
+
+    def _position(self, entry_id: str) -> int:
+        """返回条目ID所在行号"""
+        if self._positions is None:
+            self._positions = {entry_id: i for i, entry_id in enumerate(self._ids)}
+        return self._positions[entry_id]
+
+    def _check_new_id(self, entry_id: str) -> None:
+        """行按条目ID寻址，ID已存在时拒绝写入"""
+        try:
+            self._position(entry_id)
+        except KeyError:
+            return
+        raise ValueError(f"记忆条目ID已存在: {entry_id}")
+
+    def _bind(self, entry: MemoryEntry) -> None:
+        """
+        把传入的独立条目绑定为其所在行的视图，之后对它的读写直接落到列上
+
+        只绑定普通MemoryEntry与已解绑的视图；其他子类或绑定在别处的视图只复制列值。
+        """
+        if type(entry) is MemoryEntry or (type(entry) is _EntryView and entry._bank is None):
+            entry.__class__ = _EntryView
+            entry._bank = self
+            self._views[entry._id] = entry
+
+    def _view(self, position: int) -> _EntryView:
+        """返回指定行的条目视图，同一条目复用同一视图对象"""
+        entry_id = self._ids[position]
+        view = self._views.get(entry_id)
+        if view is None:
+            view = _EntryView(self, entry_id)
+            self._views[entry_id] = view
+        return view
+
+    def _insert_row(self, position: int, entry: MemoryEntry) -> None:
+        """在指定行号插入条目的各列值"""
+        if not isinstance(entry, MemoryEntry):
+            raise ValueError(f"entry必须是MemoryEntry实例，实际类型: {type(entry)}")
+        self._check_new_id(entry.id)
+        row = (entry.id, entry.x, entry.y, entry.feedback, entry.tag, entry.timestamp)
+        appending = position == len(self._ids)
+        for column, value in zip(
+            (self._ids, self._x, self._y, self._feedback, self._tag, self._timestamp), row
+        ):
+            column.insert(position, value)
+        self._embeddings.insert(position, None)
+        self._texts.insert(position, None)
+        self._embedding_matrix = None
+        self._tag_counter[row[4]] += 1
+        self._version += 1
+        self._log_change("add" if appending else "full", row[0])
+        if appending and self._positions is not None:
+            self._positions[row[0]] = position
+        else:
+            self._positions = None
+        self._bind(entry)
+
+    def _write_row(self, position: int, entry: MemoryEntry) -> None:
+        """用条目的各列值覆盖指定行"""
+        if not isinstance(entry, MemoryEntry):
+            raise ValueError(f"entry必须是MemoryEntry实例，实际类型: {type(entry)}")
+        row = (entry.id, entry.x, entry.y, entry.feedback, entry.tag, entry.timestamp)
+        old_id = self._ids[position]
+        if row[0] != old_id:
+            self._check_new_id(row[0])
+        view = self._views.get(old_id)
+        if view is not None and view is not entry:
+            view._detach()
+            del self._views[old_id]
+        self._untrack_tag(self._tag[position])
+        self._tag_counter[row[4]] += 1
+        for column, value in zip(
+            (self._ids, self._x, self._y, self._feedback, self._tag, self._timestamp), row
+        ):
+            column[position] = value
+        self._embeddings[position] = None
+        self._embedding_matrix = None
+        self._texts[position] = None
+        self._version += 1
+        self._log_change("update" if old_id == row[0] else "full", old_id)
+        if old_id != row[0]:
+            self._positions = None
+        self._bind(entry)
+
+    def _remove_rows(self, positions) -> None:
+        """删除指定行号集合，已生成的条目视图会解绑并保留当前值"""
+        positions = sorted(set(positions), reverse=True)
+        if not positions:
+            return
+        for position in positions:
+            view = self._views.pop(self._ids[position], None)
+            if view is not None:
+                view._detach()
+        for position in positions:
+            self._untrack_tag(self._tag[position])
+            self._log_change("remove", self._ids[position])
+            for column in (
+                self._ids, self._x, self._y, self._feedback, self._tag, self._timestamp,
+                self._embeddings, self._texts,
+            ):
+                del column[position]
+        self._embedding_matrix = None
+        self._version += 1
+        self._positions = None
+
+    def _set_cell(self, name: str, position: int, value: Any) -> None:
+        """写入单个列值（条目视图的属性赋值走这里）"""
+        if name == "tag":
+            self._untrack_tag(self._tag[position])
+            self._tag_counter[value] += 1
+        getattr(self, "_" + name)[position] = value
+        self._texts[position] = None
+        if name in ("x", "y"):
+            self._embeddings[position] = None
+            self._embedding_matrix = None
+        self._version += 1
+        self._log_change("update", self._ids[position])
+
+    def _untrack_tag(self, tag: str) -> None:
+        """标签计数减一，归零时移除"""
+        remaining = self._tag_counter[tag] - 1
+        if remaining > 0:
+            self._tag_counter[tag] = remaining
+        else:
+            del self._tag_counter[tag]
+
+    def _reorder(self, order: List[int]) -> None:
+        """按给定行号顺序重排所有列"""
+        for column in (
+            self._ids, self._x, self._y, self._feedback, self._tag, self._timestamp,
+            self._embeddings, self._texts,
+        ):
+            column[:] = [column[p] for p in order]
+        self._embedding_matrix = None
+        self._version += 1
+        if any(p != i for i, p in enumerate(order)):
+            self._log_change("full")
+        self._positions = None
+
+    def _rename(self, old_id: str, new_id: str) -> None:
+        """条目视图修改ID时同步列与视图缓存"""
+        position = self._position(old_id)
+        self._ids[position] = new_id
+        view = self._views.pop(old_id, None)
+        if view is not None:
+            self._views[new_id] = view
+        self._version += 1
+        self._log_change("full")
+        self._positions = None
+
+    def texts(self, positions: Optional[List[int]] = None) -> List[str]:
+        """
+        按行返回条目的标准化文本（与MemoryEntry.to_text一致）
+
+        直接读取列并缓存每行结果，条目未修改时重复构建记忆列表无需再次格式化。
+
+        Args:
+            positions: 行号列表，为None时返回全部条目
+
+        Returns:
+            文本列表
+        """
+        if positions is None:
+            positions = range(len(self._ids))
+        texts = self._texts
+        result = []
+        for i in positions:
+            text = texts[i]
+            if text is None:
+                text = (
+                    f"[Task]: {self._x[i]}\n"
+                    f"[Action]: {self._y[i]}\n"
+                    f"[Feedback]: {self._feedback[i]}\n"
+                    f"[Tag]: {self._tag[i]}\n"
+                    f"[Timestamp]: {self._timestamp[i].isoformat()}"
+                )
+                texts[i] = text
+            result.append(text)
+        return result
+
+    # ====== 向量粗筛 ======
+
+    def set_embedder(
+        self,
+        embedder: Optional[Callable[[str], List[float]]],
+        candidate_limit: int = 32,
+        index_kind: str = "flat",
+        quantize: bool = False,
+    ) -> None:
+        """
+        设置检索粗筛使用的向量化器
+
+        Args:
+            embedder: 文本向量化函数，返回L2归一化向量；提供embed_batch方法时批量调用。
+                为None时关闭粗筛
+            candidate_limit: 记忆条目超过该数量时，只把向量最相近的这么多条交给LLM评估
+            index_kind: 粗筛索引类型，flat（矩阵线性扫描）/lsh/hnsw（需要hnswlib）
+            quantize: flat索引是否以int8量化矩阵打分（内存与带宽约为float32的1/4，
+                相似度为近似值，只影响候选排序）
+        """
+        if candidate_limit <= 0:
+            raise ValueError(f"candidate_limit必须为正整数，实际值: {candidate_limit}")
+        if index_kind not in INDEX_KINDS:
+            raise ValueError(f"未知索引类型: {index_kind}，可选: {', '.join(INDEX_KINDS)}")
+        self.embedder = embedder
+        self.candidate_limit = candidate_limit
+        self.index_kind = index_kind
+        self.quantize = quantize
+        self._embeddings = [None] * len(self._ids)
+        self._embedding_matrix = None
+        self._ann_index = None
+        self._ann_labels.clear()
+        self._ann_ids.clear()
+
+    def _embed_missing(self) -> List[int]:
+        """批量补齐缺失的向量，返回本次计算的行号"""
+        missing = [i for i, vector in enumerate(self._embeddings) if vector is None]
+        if missing:
+            texts = [f"{self._x[i]}\n{self._y[i]}" for i in missing]
+            embed_batch = getattr(self.embedder, "embed_batch", None)
+            if embed_batch is not None:
+                vectors = embed_batch(texts)
+            else:
+                vectors = [self.embedder(text) for text in texts]
+            for i, vector in zip(missing, vectors):
+                self._embeddings[i] = vector
+            self._embedding_matrix = None
+        return missing
+
+    def _ensure_embeddings(self):
+        """批量补齐缺失的向量并返回向量矩阵；量化时返回(int8矩阵, 每行比例)"""
+        self._embed_missing()
+        if self._embedding_matrix is None:
+            if self.quantize:
+                self._embedding_matrix = quantize_int8(self._embeddings)
+            else:
+                self._embedding_matrix = as_matrix(self._embeddings)
+        return self._embedding_matrix
+
+    def _sync_ann_index(self):
+        """
+        增量同步近似最近邻索引
+
+        移除已不存在的条目，重新写入向量有变化或尚未入索引的条目。
+        """
+        refreshed = {self._ids[i] for i in self._embed_missing()}
+        if self._ann_index is None:
+            self._ann_index = _create_index(
+                self.index_kind,
+                len(self._embeddings[0]),
+                max(self.max_entries, len(self._ids)) + 1,
+            )
+        live = set(self._ids)
+        for entry_id in [entry_id for entry_id in self._ann_labels if entry_id not in live]:
+            label = self._ann_labels.pop(entry_id)
+            self._ann_index.remove(label)
+            del self._ann_ids[label]
+        for entry_id, vector in zip(self._ids, self._embeddings):
+            if entry_id in self._ann_labels and entry_id not in refreshed:
+                continue
+            old_label = self._ann_labels.pop(entry_id, None)
+            if old_label is not None:
+                self._ann_index.remove(old_label)
+                del self._ann_ids[old_label]
+            label = self._next_label
+            self._next_label += 1
+            self._ann_index.add(label, vector)
+            self._ann_labels[entry_id] = label
+            self._ann_ids[label] = entry_id
+        return self._ann_index
+
+    def _vector_candidates(self, query: str) -> Optional[List[int]]:
+        """
+        按向量相似度粗筛检索候选
+
+        Returns:
+            候选行号（保持原有顺序）；未设置向量化器、条目不多或索引无召回时返回None
+        """
+        if self.embedder is None or len(self._ids) <= self.candidate_limit:
+            return None
+        if self.index_kind == "flat":
+            matrix = self._ensure_embeddings()
+            if self.quantize:
+                hits = topk_cosine_int8(self.embedder(query), *matrix, self.candidate_limit)
+            else:
+                hits = topk_cosine(self.embedder(query), matrix, self.candidate_limit)
+            return sorted(position for position, _ in hits)
+        index = self._sync_ann_index()
+        hits = index.search(self.embedder(query), self.candidate_limit)
+        if not hits:
+            # 近似索引可能召回为空（如LSH无同桶候选），此时退回全量评估
+            return None
+        return sorted(self._position(self._ann_ids[label]) for label, _ in hits)
+
     def add(self, entry: MemoryEntry) -> None:
         """
         添加记忆条目
 
+        entry会绑定到新行：之后对它的修改直接写入记忆库，删除后自动解绑。
+
         Args:
             entry: 要添加的记忆条目
 
         Raises:
-            ValueError: 如果entry不是MemoryEntry实例
+            ValueError: 如果entry不是MemoryEntry实例，或其ID已在记忆库中
         """
         if not isinstance(entry, MemoryEntry):
             raise ValueError(f"entry必须是MemoryEntry实例，实际类型: {type(entry)}")
+        self._check_new_id(entry.id)
 
         # 如果已达到最大容量，删除最旧的条目以腾出空间
-        if len(self.entries) >= self.max_entries:
+        if len(self._ids) >= self.max_entries:
             logger.warning(f"记忆库已达最大容量 {self.max_entries}，将删除最旧的条目")
-            original_count = len(self.entries)
+            original_count = len(self._ids)
             # 按时间排序，删除最旧的
-            self.entries.sort(key=lambda e: e.timestamp)
+            self._reorder(sorted(range(len(self._ids)), key=self._timestamp.__getitem__))
             deleted_entry = self.entries.pop(0)
             # 记录删除操作
             self._record_operation(
@@ -57,14 +590,14 @@ class MemoryBank:
                     "reason": "capacity_full",
                     "original_count": original_count,
                     "deleted_count": 1,
-                    "remaining_count": len(self.entries),
+                    "remaining_count": len(self._ids),
                     "deleted_entries": [deleted_entry.id],
                 },
                 success=True
             )
             logger.debug(f"删除最旧的记忆条目: {deleted_entry.id}")
 
-        self.entries.append(entry)
+        self._insert_row(len(self._ids), entry)
 
         # 记录操作历史
         self._record_operation(
@@ -97,15 +630,16 @@ class MemoryBank:
         valid_indices = []
         deleted_entries = []
 
+        size = len(self._ids)
         for idx in indices:
             if not isinstance(idx, int):
                 raise ValueError(f"索引必须是整数，实际值: {idx} (类型: {type(idx)})")
 
-            if 0 <= idx < len(self.entries):
+            if 0 <= idx < size:
                 valid_indices.append(idx)
-                deleted_entries.append(self.entries[idx])
+                deleted_entries.append(self._ids[idx])
             else:
-                raise IndexError(f"索引超出范围: {idx} (有效范围: 0-{len(self.entries)-1})")
+                raise IndexError(f"索引超出范围: {idx} (有效范围: 0-{size-1})")
 
         if not valid_indices:
             logger.warning("删除操作：没有有效的索引")
@@ -113,9 +647,8 @@ class MemoryBank:
 
         # 按降序排序以避免索引偏移
         for idx in sorted(valid_indices, reverse=True):
-            deleted_entry = self.entries[idx]
-            del self.entries[idx]
-            logger.debug(f"删除记忆条目 {idx}: {deleted_entry.id}")
+            logger.debug(f"删除记忆条目 {idx}: {self._ids[idx]}")
+        self._remove_rows(valid_indices)
 
         # 记录操作历史
         self._record_operation(
@@ -123,7 +656,7 @@ class MemoryBank:
             details={
                 "indices": valid_indices,
                 "deleted_count": len(valid_indices),
-                "deleted_entries": [e.id for e in deleted_entries]
+                "deleted_entries": deleted_entries
             },
             success=True
         )
@@ -299,8 +832,8 @@ class MemoryBank:
             "operation_type": operation_type,
             "details": details,
             "success": success,
-            "memory_count_before": len(self.entries) - (1 if operation_type == "add" else 0),
-            "memory_count_after": len(self.entries)
+            "memory_count_before": len(self._ids) - (1 if operation_type == "add" else 0),
+            "memory_count_after": len(self._ids)
         }
 
         # 限制历史记录大小
@@ -350,12 +883,18 @@ class MemoryBank:
             logger.warning(f"无效的k值: {k}，返回空列表")
             return []
 
-        # 如果k大于记忆库大小，调整为记忆库大小
-        k = min(k, len(self.entries))
+        # 记忆较多且设置了向量化器时，只让LLM评估向量粗筛出的候选
+        candidates = self._vector_candidates(query)
+        if candidates is None:
+            candidates = list(range(len(self._ids)))
+        pool = [self._view(position) for position in candidates]
+
+        # 如果k大于候选数量，调整为候选数量
+        k = min(k, len(pool))
 
         # PM-111: 改进的LLM提示词模板
         memory_text = "\n\n".join(
-            [f"[{i}]\n{e.to_text()}" for i, e in enumerate(self.entries)]
+            [f"[{i}]\n{text}" for i, text in enumerate(self.texts(candidates))]
         )
 
         prompt = f"""
@@ -366,11 +905,11 @@ class MemoryBank:
 ## 用户查询
 "{query}"
 
-## 记忆条目列表（共{len(self.entries)}个）
+## 记忆条目列表（共{len(pool)}个）
 {memory_text}
 
 ## 任务要求
-请为每个记忆条目（索引0到{len(self.entries)-1}）评估其与查询的相关性，并严格输出有效的JSON对象（不要使用代码块标记，不要添加额外文字）。输出格式为一个对象，包含字段：
+请为每个记忆条目（索引0到{len(pool)-1}）评估其与查询的相关性，并严格输出有效的JSON对象（不要使用代码块标记，不要添加额外文字）。输出格式为一个对象，包含字段：
 - "results": 数组，其中每个元素包含 "index"、"relevance_score"、"semantic_relevance"、"task_applicability"、"timeliness"、"explanation"
 
 ## 评估维度说明（评分范围：0.0-1.0，保留两位小数）
@@ -527,7 +1066,7 @@ class MemoryBank:
                 explanation = item.get("explanation", "")
 
                 # 验证索引范围
-                if 0 <= idx < len(self.entries):
+                if 0 <= idx < len(pool):
                     evaluations.append({
                         "index": idx,
                         "score": score,
@@ -549,7 +1088,7 @@ class MemoryBank:
             results = []
             for eval_item in top_k:
                 idx = eval_item["index"]
-                memory_entry = self.entries[idx]
+                memory_entry = pool[idx]
 
                 if include_explanations:
                     # 返回RetrievalResult对象
@@ -770,22 +1309,22 @@ class MemoryBank:
         Args:
             target_ratio: 目标删除比例（20-30%）
         """
-        if len(self.entries) <= self.max_entries:
+        if len(self._ids) <= self.max_entries:
             return
 
         # 记录清理前的数量
-        original_count = len(self.entries)
+        original_count = len(self._ids)
 
         # 简单实现：按时间排序，删除最旧的条目
-        self.entries.sort(key=lambda e: e.timestamp)
-        delete_count = int(len(self.entries) * target_ratio)
-        delete_count = max(1, min(delete_count, len(self.entries) - self.max_entries))
+        self._reorder(sorted(range(original_count), key=self._timestamp.__getitem__))
+        delete_count = int(original_count * target_ratio)
+        delete_count = max(1, min(delete_count, original_count - self.max_entries))
 
         # 记录被删除的条目
-        deleted_entries = self.entries[:delete_count]
+        deleted_ids = self._ids[:delete_count]
 
         # 删除最旧的条目
-        del self.entries[:delete_count]
+        self._remove_rows(range(delete_count))
 
         # 记录清理操作
         self._record_operation(
@@ -793,8 +1332,8 @@ class MemoryBank:
             details={
                 "original_count": original_count,
                 "deleted_count": delete_count,
-                "remaining_count": len(self.entries),
-                "deleted_entries": [e.id for e in deleted_entries]
+                "remaining_count": len(self._ids),
+                "deleted_entries": deleted_ids
             },
             success=True
         )
@@ -808,7 +1347,7 @@ class MemoryBank:
         Returns:
             包含统计信息的字典
         """
-        if not self.entries:
+        if not self._ids:
             return {
                 "total_entries": 0,
                 "max_entries": self.max_entries,
@@ -818,17 +1357,12 @@ class MemoryBank:
                 "operation_history_count": len(self.operation_history),
             }
 
-        timestamps = [e.timestamp for e in self.entries]
-        tag_counts = {}
-        for e in self.entries:
-            tag_counts[e.tag] = tag_counts.get(e.tag, 0) + 1
-
         return {
-            "total_entries": len(self.entries),
+            "total_entries": len(self._ids),
             "max_entries": self.max_entries,
-            "oldest_timestamp": min(timestamps).isoformat(),
-            "newest_timestamp": max(timestamps).isoformat(),
-            "tag_distribution": tag_counts,
+            "oldest_timestamp": min(self._timestamp).isoformat(),
+            "newest_timestamp": max(self._timestamp).isoformat(),
+            "tag_distribution": dict(self._tag_counter),
             "operation_history_count": len(self.operation_history),
         }
 
@@ -848,7 +1382,19 @@ class MemoryBank:
         Returns:
             记忆条目字典列表
         """
-        return [e.to_dict() for e in self.entries]
+        return [
+            {
+                "id": entry_id,
+                "x": x,
+                "y": y,
+                "feedback": feedback,
+                "tag": tag,
+                "timestamp": timestamp.isoformat(),
+            }
+            for entry_id, x, y, feedback, tag, timestamp in zip(
+                self._ids, self._x, self._y, self._feedback, self._tag, self._timestamp
+            )
+        ]
 
     @classmethod
     def from_dict(cls, data: List[Dict[str, Any]], max_entries: int = 1000) -> "MemoryBank":
@@ -866,7 +1412,7 @@ class MemoryBank:
         for item in data:
             try:
                 entry = MemoryEntry.from_dict(item)
-                bank.entries.append(entry)
+                bank._insert_row(len(bank._ids), entry)
             except Exception as e:
                 logger.warning(f"加载记忆条目失败: {e}")
         return bank
@@ -892,10 +1438,12 @@ class MemoryBank:
         Returns:
             找到的记忆条目，如果不存在返回None
         """
-        for entry in self.entries:
-            if entry.id == entry_id:
-                return entry
-        return None
+        if self._positions is not None and entry_id not in self._positions:
+            return None
+        try:
+            return self._view(self._position(entry_id))
+        except KeyError:
+            return None
 
     def delete_entry(self, entry_id: str) -> bool:
         """
@@ -907,11 +1455,12 @@ class MemoryBank:
         Returns:
             是否成功删除
         """
-        for i, entry in enumerate(self.entries):
-            if entry.id == entry_id:
-                self.delete([i])
-                return True
-        return False
+        try:
+            position = self._position(entry_id)
+        except KeyError:
+            return False
+        self.delete([position])
+        return True
 
     def update_entry(self, entry_id: str, **kwargs) -> bool:
         """
@@ -969,13 +1518,15 @@ class MemoryBank:
         query_lower = query.lower()
         results = []
 
-        for entry in self.entries:
+        for position, (x, y, feedback, tag) in enumerate(
+            zip(self._x, self._y, self._feedback, self._tag)
+        ):
             # 检查x、y、feedback、tag字段是否包含查询词
-            if (query_lower in entry.x.lower() or
-                query_lower in entry.y.lower() or
-                query_lower in entry.feedback.lower() or
-                query_lower in entry.tag.lower()):
-                results.append(entry)
+            if (query_lower in x.lower() or
+                query_lower in y.lower() or
+                query_lower in feedback.lower() or
+                query_lower in tag.lower()):
+                results.append(self._view(position))
 
             if len(results) >= limit:
                 break
@@ -995,7 +1546,7 @@ class MemoryBank:
         if not tag:
             return []
 
-        return [entry for entry in self.entries if entry.tag == tag]
+        return [self._view(p) for p, entry_tag in enumerate(self._tag) if entry_tag == tag]
 
     def get_recent_entries(self, limit: int = 10) -> List[MemoryEntry]:
         """
@@ -1007,15 +1558,15 @@ class MemoryBank:
         Returns:
             最近的记忆条目列表（按时间戳降序）
         """
-        sorted_entries = sorted(self.entries, key=lambda e: e.timestamp, reverse=True)
-        return sorted_entries[:limit]
+        order = sorted(range(len(self._ids)), key=self._timestamp.__getitem__, reverse=True)
+        return [self._view(p) for p in order[:limit]]
 
     def clear(self) -> None:
         """
         清空记忆库
         """
-        original_count = len(self.entries)
-        self.entries.clear()
+        original_count = len(self._ids)
+        self._remove_rows(range(original_count))
 
         # 记录操作历史
         self._record_operation(
@@ -1030,7 +1581,7 @@ class MemoryBank:
 
     def __len__(self) -> int:
         """返回记忆条目数量"""
-        return len(self.entries)
+        return len(self._ids)
 
     def __getitem__(self, idx: int) -> MemoryEntry:
         """通过索引获取记忆条目"""
@@ -1038,4 +1589,4 @@ class MemoryBank:
 
     def __repr__(self) -> str:
         """字符串表示"""
-        return f"MemoryBank(entries={len(self.entries)}, max_entries={self.max_entries})"
+        return f"MemoryBank(entries={len(self._ids)}, max_entries={self.max_entries})"
@@ -12,6 +12,14 @@ from enum import Enum
 
 logger = logging.getLogger(__name__)
 
+# 命令分派：一次匹配确定命令类型（ADD要求紧跟"{"，与原startswith("ADD{")一致）
+_COMMAND_RE = re.compile(r"DELETE|ADD(?=\{)|MERGE|RELABEL", re.IGNORECASE)
+_DELETE_RE = re.compile(r"^DELETE\s+([\d\s,]+)$", re.IGNORECASE)
+_DELETE_SPLIT_RE = re.compile(r"[,\s]+")
+_ADD_RE = re.compile(r"^ADD\s*\{(.*)\}$", re.IGNORECASE)
+_MERGE_RE = re.compile(r"MERGE\s*(\d+)\s*&\s*(\d+)", re.IGNORECASE)
+_RELABEL_RE = re.compile(r"^RELABEL\s+(\d+)\s+(.+)$", re.IGNORECASE)
+
 
 class CommandType(Enum):
     """命令类型枚举"""
@@ -94,28 +102,19 @@ class RefineEditor:
     def _parse_segment(segment: str) -> ParseResult:
         """解析单个命令段"""
         # 检查命令类型
-        segment_upper = segment.upper()
-
-        if segment_upper.startswith("DELETE"):
-            return RefineEditor._parse_delete_enhanced(segment)
-        elif segment_upper.startswith("ADD{"):
-            return RefineEditor._parse_add_enhanced(segment)
-        elif segment_upper.startswith("MERGE"):
-            return RefineEditor._parse_merge_enhanced(segment)
-        elif segment_upper.startswith("RELABEL"):
-            return RefineEditor._parse_relabel_enhanced(segment)
-        else:
-            return ParseResult(
-                command_type=None,
-                error=f"未知命令类型: {segment.split()[0] if segment.split() else segment}"
-            )
+        match = _COMMAND_RE.match(segment)
+        if match:
+            return _SEGMENT_PARSERS[match.group(0).upper()](segment)
+        return ParseResult(
+            command_type=None,
+            error=f"未知命令类型: {segment.split()[0] if segment.split() else segment}"
+        )
 
     @staticmethod
     def _parse_delete_enhanced(segment: str) -> ParseResult:
         """增强版DELETE命令解析"""
         # 支持多种格式: DELETE 1, DELETE 1,2,3, DELETE 1 2 3
-        pattern = r"^DELETE\s+([\d\s,]+)$"
-        match = re.match(pattern, segment, re.IGNORECASE)
+        match = _DELETE_RE.match(segment)
 
         if not match:
             return ParseResult(
@@ -127,7 +126,7 @@ class RefineEditor:
         indices = []
 
         # 支持逗号分隔和空格分隔
-        for num in re.split(r'[,\s]+', numbers_str):
+        for num in _DELETE_SPLIT_RE.split(numbers_str):
             num = num.strip()
             if num and num.isdigit():
                 indices.append(int(num))
@@ -154,8 +153,7 @@ class RefineEditor:
     def _parse_add_enhanced(segment: str) -> ParseResult:
         """增强版ADD命令解析"""
         # 支持多种格式: ADD{text}, ADD {text}, ADD{ text }, ADD{}
-        pattern = r"^ADD\s*\{(.*)\}$"
-        match = re.match(pattern, segment, re.IGNORECASE)
+        match = _ADD_RE.match(segment)
 
         if not match:
             return ParseResult(
@@ -183,8 +181,7 @@ class RefineEditor:
         pairs = []
 
         # 提取所有数字对
-        pattern = r"MERGE\s*(\d+)\s*&\s*(\d+)"
-        matches = re.findall(pattern, segment, re.IGNORECASE)
+        matches = _MERGE_RE.findall(segment)
 
         if not matches:
             return ParseResult(
@@ -227,8 +224,7 @@ class RefineEditor:
     def _parse_relabel_enhanced(segment: str) -> ParseResult:
         """增强版RELABEL命令解析"""
         # 支持多种格式: RELABEL 1 new-tag, RELABEL 1 "new tag"
-        pattern = r"^RELABEL\s+(\d+)\s+(.+)$"
-        match = re.match(pattern, segment, re.IGNORECASE)
+        match = _RELABEL_RE.match(segment)
 
         if not match:
             return ParseResult(
@@ -378,4 +374,12 @@ class RefineEditor:
             "relabel_count": len(delta["relabel"]),
             "is_valid": RefineEditor.validate_command(cmd)[0],
             "operations": delta
-        }
\ No newline at end of file
+        }
+
+# 命令关键字 -> 命令段解析函数
+_SEGMENT_PARSERS = {
+    "DELETE": RefineEditor._parse_delete_enhanced,
+    "ADD": RefineEditor._parse_add_enhanced,
+    "MERGE": RefineEditor._parse_merge_enhanced,
+    "RELABEL": RefineEditor._parse_relabel_enhanced,
+}
@@ -2,21 +2,34 @@
 持久化存储模块
 
 基于JSON文件的自动保存/加载，支持记忆库的完整导出/导入。
+sync()只把自上次保存以来的变更（ADD/SET/DEL）追加到WAL，load()在快照上重放WAL，
+WAL过长或进程退出时合并为新快照。路径以 .mem 结尾时使用二进制列式目录格式（BinaryMemoryPersistence），
+大记忆库的保存/加载无需整库JSON编码与解析。
 """
 
+import atexit
 import json
 import os
 import shutil
+import weakref
 from typing import Optional, Dict, Any, List
 import logging
 from datetime import datetime, timedelta
 import hashlib
 
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
 from .bank import MemoryBank
 from .entry import MemoryEntry
 
 logger = logging.getLogger(__name__)
 
+# 二进制列式存储目录的路径后缀
+BINARY_SUFFIX = ".mem"
+
 
 class MemoryPersistence:
     """记忆持久化存储管理器"""
@@ -26,15 +39,173 @@ class MemoryPersistence:
     # 支持的旧版本（用于向后兼容）
     SUPPORTED_VERSIONS = ["1.0.0", "0.9.0", "0.8.0"]
 
-    def __init__(self, filepath: str = "./data/memory.json"):
+    def __init__(self, filepath: str = "./data/memory.json", compact_threshold: int = 1000):
         """
         初始化持久化管理器
 
         Args:
             filepath: 存储文件路径
+            compact_threshold: WAL记录数超过该值时，sync改为整库保存并清空WAL
         """
         self.filepath = filepath
+        self.compact_threshold = compact_threshold
         self._ensure_directory()
+        # 与磁盘状态（快照+WAL）保持一致、其变更日志可增量写入WAL的记忆库
+        self._tracked_bank: Optional["weakref.ref[MemoryBank]"] = None
+        self._wal_records = 0
+        self._atexit_registered = False
+
+    @property
+    def wal_path(self) -> str:
+        """追加日志（WAL）文件路径"""
+        return self.filepath + ".wal"
+
+    def save(self, memory_bank: MemoryBank) -> bool:
+        """
+        整库保存记忆库（检查点）：写入快照并清空WAL
+
+        Args:
+            memory_bank: 要保存的记忆库
+
+        Returns:
+            保存是否成功
+        """
+        if not self._write_snapshot(memory_bank):
+            return False
+        try:
+            if os.path.exists(self.wal_path):
+                os.remove(self.wal_path)
+        except OSError as e:
+            logger.warning(f"清空WAL失败: {e}")
+        self._wal_records = 0
+        self._track(memory_bank)
+        return True
+
+    def checkpoint(self, memory_bank: MemoryBank) -> bool:
+        """将WAL合并进快照（save的别名）"""
+        return self.save(memory_bank)
+
+    def load(self, memory_bank: Optional[MemoryBank] = None) -> MemoryBank:
+        """
+        加载快照并重放WAL
+
+        Args:
+            memory_bank: 可选的现有记忆库实例，如为None则创建新实例
+
+        Returns:
+            加载后的记忆库实例
+        """
+        merged = memory_bank is not None and len(memory_bank) > 0
+        memory_bank = self._load_snapshot(memory_bank)
+        self._replay_wal(memory_bank)
+        self._track(memory_bank)
+        if merged:
+            # 与已有条目合并后的内容不等于磁盘状态，下次同步需整库写入
+            memory_bank.reset_journal(full=True)
+        return memory_bank
+
+    def sync(self, memory_bank: MemoryBank) -> bool:
+        """
+        增量同步：把自上次保存/加载以来的变更追加到WAL
+
+        变更无法按条目增量表示（插入到中间、重排、改ID）、记忆库不是本实例
+        加载或保存的、或WAL过长时，退回整库保存。
+
+        Args:
+            memory_bank: 要同步的记忆库
+
+        Returns:
+            同步是否成功
+        """
+        tracked = self._tracked_bank() if self._tracked_bank is not None else None
+        journal = memory_bank.journal
+        if tracked is not memory_bank or journal is None or journal["full"]:
+            return self.save(memory_bank)
+        pending = len(journal["added"]) + len(journal["updated"]) + len(journal["removed"])
+        if not pending:
+            return True
+        if self._wal_records + pending > self.compact_threshold:
+            return self.save(memory_bank)
+
+        memory_bank.take_journal()
+        records: List[Dict[str, Any]] = []
+        if journal["removed"]:
+            records.append({"op": "DEL", "ids": list(journal["removed"])})
+        for entry_id in journal["updated"]:
+            records.append({"op": "SET", "entry": memory_bank.get_entry(entry_id).to_dict()})
+        for entry_id in journal["added"]:
+            records.append({"op": "ADD", "entry": memory_bank.get_entry(entry_id).to_dict()})
+        if not self._append_records(records):
+            return self.save(memory_bank)
+        logger.debug(f"记忆变更已追加到WAL: {len(records)} 条记录")
+        return True
+
+    def append(self, entry: MemoryEntry) -> bool:
+        """
+        追加单条新记忆到WAL，不重写快照
+
+        Args:
+            entry: 新记忆条目
+
+        Returns:
+            写入是否成功
+        """
+        return self._append_records([{"op": "ADD", "entry": entry.to_dict()}])
+
+    def _track(self, memory_bank: MemoryBank) -> None:
+        """记录与磁盘状态一致的记忆库并从当前状态开始记录变更"""
+        memory_bank.reset_journal()
+        self._tracked_bank = weakref.ref(memory_bank)
+
+    def _append_records(self, records: List[Dict[str, Any]]) -> bool:
+        """以JSON Lines追加WAL记录并落盘"""
+        try:
+            with open(self.wal_path, "a", encoding="utf-8") as f:
+                for record in records:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+        except Exception as e:
+            logger.error(f"写入WAL失败: {e}")
+            return False
+        self._wal_records += len(records)
+        if not self._atexit_registered:
+            # 进程退出时把WAL合并进快照，下次启动无需重放
+            atexit.register(self._compact_at_exit)
+            self._atexit_registered = True
+        return True
+
+    def _replay_wal(self, memory_bank: MemoryBank) -> None:
+        """在已加载的快照上按顺序重放WAL；记录幂等，重复重放结果不变"""
+        self._wal_records = 0
+        if not os.path.exists(self.wal_path):
+            return
+        with open(self.wal_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    op = record["op"]
+                    if op == "DEL":
+                        for entry_id in record["ids"]:
+                            memory_bank.delete_entry(entry_id)
+                    else:
+                        entry = self._load_entry_with_compatibility(record["entry"])
+                        if memory_bank.get_entry(entry.id) is None:
+                            memory_bank.add(entry)
+                        elif op == "SET":
+                            memory_bank.entries[memory_bank._position(entry.id)] = entry
+                except Exception as e:
+                    # 写入中断留下的残行等无法解析的记录直接跳过
+                    logger.warning(f"跳过无效WAL记录: {e}")
+                    continue
+                self._wal_records += 1
+        if self._wal_records:
+            logger.info(f"重放WAL: {self._wal_records} 条记录")
+
+    def _compact_at_exit(self) -> None:
+        tracked = self._tracked_bank() if self._tracked_bank is not None else None
+        if tracked is not None and self._wal_records:
+            self.save(tracked)
 
     def _ensure_directory(self) -> None:
         """确保存储目录存在"""
@@ -43,9 +214,9 @@ class MemoryPersistence:
             os.makedirs(directory, exist_ok=True)
             logger.debug(f"创建存储目录: {directory}")
 
-    def save(self, memory_bank: MemoryBank) -> bool:
+    def _write_snapshot(self, memory_bank: MemoryBank) -> bool:
         """
-        保存记忆库到文件
+        整库写入JSON快照文件
 
         Args:
             memory_bank: 要保存的记忆库
@@ -85,9 +256,9 @@ class MemoryPersistence:
             logger.error(f"保存记忆库失败: {e}")
             return False
 
-    def load(self, memory_bank: Optional[MemoryBank] = None) -> MemoryBank:
+    def _load_snapshot(self, memory_bank: Optional[MemoryBank] = None) -> MemoryBank:
         """
-        从文件加载记忆库
+        从JSON快照文件加载记忆库
 
         Args:
             memory_bank: 可选的现有记忆库实例，如为None则创建新实例
@@ -592,4 +763,291 @@ class MemoryPersistence:
         except json.JSONDecodeError as e:
             return {"valid": False, "error": f"JSON解析错误: {e}"}
         except Exception as e:
-            return {"valid": False, "error": str(e)}
\ No newline at end of file
+            return {"valid": False, "error": str(e)}
+
+class BinaryMemoryPersistence(MemoryPersistence):
+    """
+    二进制列式记忆持久化
+
+    以目录保存记忆库，避免整库JSON编码与缩进输出：
+    - meta.json: 格式版本、容量、条数、校验和等元信息
+    - text.bin: 各条目 id/x/y/feedback/tag/timestamp 六列UTF-8文本顺序拼接
+    - offsets.npy: text.bin中各字段的起止偏移（int64，长度6N+1）
+    - emb.npy: 记忆库已计算的向量矩阵（float32，可选）
+
+    加载时offsets.npy与emb.npy以mmap方式打开，向量行直接引用页缓存，无需解析。
+    """
+
+    FORMAT_VERSION = "2.0.0"
+    SUPPORTED_VERSIONS = ["2.0.0"]
+    FIELDS = ("id", "x", "y", "feedback", "tag", "timestamp")
+
+    def __init__(self, filepath: str = "./data/memory.mem", compact_threshold: int = 1000):
+        """
+        初始化二进制持久化管理器
+
+        Args:
+            filepath: 存储目录路径
+            compact_threshold: WAL记录数超过该值时，sync改为整库保存并清空WAL
+        """
+        if np is None:
+            raise ImportError("BinaryMemoryPersistence需要安装numpy")
+        super().__init__(filepath, compact_threshold)
+
+    @property
+    def wal_path(self) -> str:
+        """追加日志（WAL）文件路径"""
+        return self._path("memory.wal")
+
+    def _ensure_directory(self) -> None:
+        """确保存储目录存在"""
+        os.makedirs(self.filepath, exist_ok=True)
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.filepath, name)
+
+    def _write_snapshot(self, memory_bank: MemoryBank) -> bool:
+        """
+        以二进制列式格式整库写入快照
+
+        各文件先写入临时文件再原子替换，meta.json最后替换；
+        中途失败时校验和不匹配，加载会回退到备份。
+
+        Args:
+            memory_bank: 要保存的记忆库
+
+        Returns:
+            保存是否成功
+        """
+        try:
+            meta_path = self._path("meta.json")
+            if os.path.exists(meta_path):
+                self._create_backup(self.filepath)
+
+            chunks: List[bytes] = []
+            for row in zip(
+                memory_bank._ids, memory_bank._x, memory_bank._y,
+                memory_bank._feedback, memory_bank._tag, memory_bank._timestamp,
+            ):
+                entry_id, x, y, feedback, tag, timestamp = row
+                for value in (entry_id, x, y, feedback, tag, timestamp.isoformat()):
+                    chunks.append(value.encode("utf-8"))
+            offsets = np.zeros(len(chunks) + 1, dtype=np.int64)
+            np.cumsum([len(chunk) for chunk in chunks], out=offsets[1:])
+            blob = b"".join(chunks)
+
+            replacements = [("text.bin", blob), ("offsets.npy", offsets)]
+            embeddings = memory_bank._embeddings
+            embedder = memory_bank.embedder
+            has_embeddings = bool(embeddings) and embedder is not None and all(
+                vector is not None for vector in embeddings
+            )
+            if has_embeddings:
+                replacements.append(("emb.npy", np.asarray(embeddings, dtype=np.float32)))
+
+            for name, payload in replacements:
+                temp_path = self._path(name + ".tmp")
+                if isinstance(payload, bytes):
+                    with open(temp_path, "wb") as f:
+                        f.write(payload)
+                else:
+                    with open(temp_path, "wb") as f:
+                        np.save(f, payload)
+                os.replace(temp_path, self._path(name))
+            if not has_embeddings and os.path.exists(self._path("emb.npy")):
+                os.remove(self._path("emb.npy"))
+
+            meta = {
+                "version": self.FORMAT_VERSION,
+                "timestamp": datetime.utcnow().isoformat(),
+                "max_entries": memory_bank.max_entries,
+                "total_entries": len(memory_bank),
+                "generated_by": "pm-mem",
+                "checksum": hashlib.md5(blob).hexdigest(),
+                "embedder": type(embedder).__name__ if has_embeddings else None,
+            }
+            temp_path = meta_path + ".tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(meta, f, ensure_ascii=False)
+            os.replace(temp_path, meta_path)
+
+            logger.info(f"记忆库已保存到: {self.filepath} (共 {len(memory_bank)} 条记忆)")
+            return True
+
+        except Exception as e:
+            logger.error(f"保存记忆库失败: {e}")
+            return False
+
+    def _load_snapshot(self, memory_bank: Optional[MemoryBank] = None) -> MemoryBank:
+        """
+        从二进制快照目录加载记忆库
+
+        Args:
+            memory_bank: 可选的现有记忆库实例，如为None则创建新实例
+
+        Returns:
+            加载后的记忆库实例
+        """
+        if not os.path.exists(self._path("meta.json")):
+            logger.warning(f"存储文件不存在: {self.filepath}，返回空记忆库")
+            return memory_bank or MemoryBank()
+
+        try:
+            meta, rows, embeddings = self._read_snapshot(self.filepath)
+        except Exception as e:
+            logger.error(f"存储文件读取失败: {e}")
+            return self._recover_from_backup(memory_bank)
+
+        max_entries = meta.get("max_entries", 1000)
+        if memory_bank is None:
+            memory_bank = MemoryBank(max_entries=max_entries)
+        else:
+            memory_bank.max_entries = max_entries
+
+        # 向量仅在记忆库已设置同类向量化器时恢复，否则由记忆库按需重算
+        restore = (
+            embeddings is not None
+            and memory_bank.embedder is not None
+            and meta.get("embedder") == type(memory_bank.embedder).__name__
+        )
+        existing_ids = {e.id for e in memory_bank.entries}
+        loaded_count = 0
+        for i, fields in enumerate(rows):
+            try:
+                entry = MemoryEntry.from_dict(dict(zip(self.FIELDS, fields)))
+                if entry.id in existing_ids:
+                    continue
+                memory_bank.add(entry)
+                existing_ids.add(entry.id)
+                loaded_count += 1
+                if restore:
+                    memory_bank._embeddings[memory_bank._position(entry.id)] = embeddings[i]
+            except Exception as e:
+                logger.warning(f"加载记忆条目失败，跳过: {e}")
+        logger.info(f"从 {self.filepath} 加载了 {loaded_count} 条记忆（总数: {len(memory_bank)}）")
+        return memory_bank
+
+    def _read_snapshot(self, directory: str):
+        """读取并校验快照目录，返回(元信息, 各行字段列表, 向量矩阵或None)"""
+        with open(os.path.join(directory, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        version = meta.get("version")
+        if version not in self.SUPPORTED_VERSIONS:
+            raise ValueError(f"存储格式版本不支持: {version}")
+
+        with open(os.path.join(directory, "text.bin"), "rb") as f:
+            blob = f.read()
+        if hashlib.md5(blob).hexdigest() != meta.get("checksum"):
+            raise ValueError("数据校验和不匹配")
+        offsets = np.load(os.path.join(directory, "offsets.npy"), mmap_mode="r")
+        field_count = len(self.FIELDS)
+        if len(offsets) != meta.get("total_entries", 0) * field_count + 1:
+            raise ValueError("偏移数组与条目数不一致")
+
+        values = [
+            blob[start:end].decode("utf-8")
+            for start, end in zip(offsets[:-1].tolist(), offsets[1:].tolist())
+        ]
+        rows = [values[i:i + field_count] for i in range(0, len(values), field_count)]
+
+        embeddings = None
+        emb_path = os.path.join(directory, "emb.npy")
+        if meta.get("embedder") and os.path.exists(emb_path):
+            embeddings = np.load(emb_path, mmap_mode="r")
+            if len(embeddings) != len(rows):
+                embeddings = None
+        return meta, rows, embeddings
+
+    def _create_backup(self, filepath: str) -> bool:
+        """复制整个存储目录作为备份"""
+        try:
+            backup_dir = os.path.join(os.path.dirname(os.path.abspath(filepath)), "backups")
+            os.makedirs(backup_dir, exist_ok=True)
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            backup_path = os.path.join(
+                backup_dir, f"{os.path.basename(os.path.normpath(filepath))}.backup_{timestamp}"
+            )
+            shutil.copytree(
+                filepath, backup_path, dirs_exist_ok=True,
+                ignore=shutil.ignore_patterns("*.tmp"),
+            )
+            logger.debug(f"创建备份: {backup_path}")
+            return True
+        except Exception as e:
+            logger.warning(f"创建备份失败: {e}")
+            return False
+
+    def _recover_from_backup(self, memory_bank: Optional[MemoryBank]) -> MemoryBank:
+        """从最新的目录备份恢复"""
+        try:
+            backup_dir = os.path.join(os.path.dirname(os.path.abspath(self.filepath)), "backups")
+            prefix = os.path.basename(os.path.normpath(self.filepath)) + ".backup_"
+            candidates = []
+            if os.path.isdir(backup_dir):
+                candidates = [
+                    os.path.join(backup_dir, name)
+                    for name in os.listdir(backup_dir)
+                    if name.startswith(prefix)
+                ]
+            for backup_path in sorted(candidates, key=os.path.getmtime, reverse=True):
+                try:
+                    meta, rows, _ = self._read_snapshot(backup_path)
+                except Exception:
+                    continue
+                logger.warning(f"从备份恢复: {backup_path}")
+                entries = [dict(zip(self.FIELDS, fields)) for fields in rows]
+                return self._load_with_compatibility(
+                    {"max_entries": meta.get("max_entries", 1000), "entries": entries},
+                    memory_bank,
+                )
+            logger.error("没有找到可用的备份")
+        except Exception as e:
+            logger.error(f"从备份恢复失败: {e}")
+        return memory_bank or MemoryBank()
+
+    def get_file_info(self) -> Dict[str, Any]:
+        """
+        获取存储目录信息
+
+        Returns:
+            文件信息字典
+        """
+        meta_path = self._path("meta.json")
+        if not os.path.exists(meta_path):
+            return {"exists": False, "error": "文件不存在"}
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            size = sum(
+                os.path.getsize(self._path(name))
+                for name in os.listdir(self.filepath)
+                if not name.endswith(".tmp")
+            )
+            return {
+                "exists": True,
+                "file_size": size,
+                "modified_time": datetime.fromtimestamp(os.path.getmtime(meta_path)).isoformat(),
+                "version": meta.get("version", "unknown"),
+                "entry_count": meta.get("total_entries", 0),
+                "max_entries": meta.get("max_entries", 1000),
+                "has_embeddings": bool(meta.get("embedder")),
+            }
+        except Exception as e:
+            return {"exists": True, "error": str(e)}
+
+
+def open_persistence(filepath: str) -> MemoryPersistence:
+    """
+    按路径后缀选择持久化实现
+
+    以BINARY_SUFFIX结尾的路径使用BinaryMemoryPersistence（目录），其余使用JSON文件。
+
+    Args:
+        filepath: 存储路径
+
+    Returns:
+        持久化管理器实例
+    """
+    if filepath.rstrip("/\\").endswith(BINARY_SUFFIX):
+        return BinaryMemoryPersistence(filepath)
+    return MemoryPersistence(filepath)
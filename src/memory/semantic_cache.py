@@ -0,0 +1,465 @@
+"""
+任务级语义缓存
+
+对任务文本做向量化，命中余弦相似度不低于阈值的历史任务时直接复用其结果，
+未命中才走完整的Think/Refine/Act流程。默认使用无外部依赖的哈希向量化器。
+
+缓存规模较大时可切换近似最近邻索引：flat（线性扫描）、lsh（随机超平面哈希）、
+hnsw（需要安装hnswlib）。
+"""
+
+import hashlib
+import json
+import logging
+import math
+import random
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    import hnswlib
+except ImportError:  # pragma: no cover - optional dependency
+    hnswlib = None
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+try:
+    from ._kernels import as_matrix, quantize_int8, topk_cosine, topk_cosine_int8
+except ImportError:
+    from memory._kernels import as_matrix, quantize_int8, topk_cosine, topk_cosine_int8
+
+logger = logging.getLogger(__name__)
+
+INDEX_KINDS = ("flat", "lsh", "hnsw")
+
+
+class HashingEmbedder:
+    """
+    字符n-gram哈希向量化器
+
+    将文本的字符n-gram哈希到固定维度并做L2归一化，适合中英文混合的短任务文本；
+    不依赖任何模型，仅用于缓存命中判断。
+    """
+
+    def __init__(self, dim: int = 256, ngram_range: Tuple[int, int] = (1, 3)):
+        """
+        初始化向量化器
+
+        Args:
+            dim: 向量维度
+            ngram_range: 字符n-gram长度范围（含两端）
+        """
+        if dim <= 0:
+            raise ValueError(f"dim必须为正整数，实际值: {dim}")
+        self.dim = dim
+        self.ngram_range = ngram_range
+
+    def embed(self, text: str) -> List[float]:
+        """
+        向量化文本
+
+        Args:
+            text: 输入文本
+
+        Returns:
+            L2归一化后的向量；空文本返回全零向量
+        """
+        vector = [0.0] * self.dim
+        normalized = " ".join(text.lower().split())
+        min_n, max_n = self.ngram_range
+        for n in range(min_n, max_n + 1):
+            for start in range(len(normalized) - n + 1):
+                digest = hashlib.blake2b(
+                    normalized[start:start + n].encode("utf-8"), digest_size=8
+                ).digest()
+                value = int.from_bytes(digest, "little")
+                # 最低位决定符号，降低哈希碰撞带来的偏差
+                sign = 1.0 if value & 1 else -1.0
+                vector[(value >> 1) % self.dim] += sign
+
+        norm = math.sqrt(sum(v * v for v in vector))
+        if norm == 0.0:
+            return vector
+        return [v / norm for v in vector]
+
+    def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """批量向量化文本"""
+        return [self.embed(text) for text in texts]
+
+    def __call__(self, text: str) -> List[float]:
+        return self.embed(text)
+
+
+class _FlatIndex:
+    """线性扫描索引，O(N·d)，小规模缓存下最快；打分走_kernels数值内核"""
+
+    def __init__(self, dim: int, quantize: bool = False):
+        self.dim = dim
+        self.quantize = quantize
+        self._ids: List[int] = []
+        self._vectors: List[List[float]] = []
+        self._matrix = None  # 惰性构建的连续向量矩阵（或int8量化矩阵与比例），写入后失效
+
+    def add(self, item_id: int, vector: List[float]) -> None:
+        self._ids.append(item_id)
+        self._vectors.append(vector)
+        self._matrix = None
+
+    def bulk_load(self, item_ids: List[int], matrix) -> None:
+        """直接以已有矩阵（如np.load的mmap数组）初始化索引，不复制向量"""
+        self._ids = list(item_ids)
+        self._vectors = list(matrix)
+        self._matrix = None if self.quantize else matrix
+
+    def remove(self, item_id: int) -> None:
+        try:
+            position = self._ids.index(item_id)
+        except ValueError:
+            return
+        del self._ids[position]
+        del self._vectors[position]
+        self._matrix = None
+
+    def search(self, query: List[float], k: int) -> List[Tuple[int, float]]:
+        if self.quantize:
+            if self._matrix is None:
+                self._matrix = quantize_int8(self._vectors)
+            ranked = topk_cosine_int8(query, *self._matrix, k)
+        else:
+            if self._matrix is None:
+                self._matrix = as_matrix(self._vectors)
+            ranked = topk_cosine(query, self._matrix, k)
+        return [(self._ids[row], score) for row, score in ranked]
+
+
+class _LSHIndex:
+    """
+    随机超平面LSH索引
+
+    每张哈希表用n_bits个高斯随机超平面把向量映射为桶编号，查询时只对
+    同桶候选计算精确相似度；多张表取并集以提高召回。
+    """
+
+    def __init__(self, dim: int, n_bits: int = 12, n_tables: int = 4, seed: int = 0):
+        self.dim = dim
+        rng = random.Random(seed)
+        self._planes = [
+            [[rng.gauss(0.0, 1.0) for _ in range(dim)] for _ in range(n_bits)]
+            for _ in range(n_tables)
+        ]
+        self._tables: List[Dict[int, set]] = [{} for _ in range(n_tables)]
+        self._vectors: Dict[int, List[float]] = {}
+
+    def _bucket(self, planes: List[List[float]], vector: List[float]) -> int:
+        bucket = 0
+        for plane in planes:
+            bucket = (bucket << 1) | (sum(a * b for a, b in zip(plane, vector)) >= 0.0)
+        return bucket
+
+    def add(self, item_id: int, vector: List[float]) -> None:
+        self._vectors[item_id] = vector
+        for planes, table in zip(self._planes, self._tables):
+            table.setdefault(self._bucket(planes, vector), set()).add(item_id)
+
+    def remove(self, item_id: int) -> None:
+        vector = self._vectors.pop(item_id, None)
+        if vector is None:
+            return
+        for planes, table in zip(self._planes, self._tables):
+            bucket = table.get(self._bucket(planes, vector))
+            if bucket is not None:
+                bucket.discard(item_id)
+
+    def search(self, query: List[float], k: int) -> List[Tuple[int, float]]:
+        candidates = set()
+        for planes, table in zip(self._planes, self._tables):
+            candidates.update(table.get(self._bucket(planes, query), ()))
+        scored = [
+            (item_id, sum(a * b for a, b in zip(query, self._vectors[item_id])))
+            for item_id in candidates
+        ]
+        scored.sort(key=lambda item: item[1], reverse=True)
+        return scored[:k]
+
+
+class _HNSWIndex:
+    """基于hnswlib的HNSW索引，查询复杂度约O(log N)"""
+
+    def __init__(self, dim: int, max_elements: int, ef: int = 64):
+        if hnswlib is None:
+            raise ImportError("使用hnsw索引需要安装hnswlib: pip install hnswlib")
+        self.dim = dim
+        self._index = hnswlib.Index(space="cosine", dim=dim)
+        self._index.init_index(
+            max_elements=max_elements, ef_construction=200, M=16, allow_replace_deleted=True
+        )
+        self._index.set_ef(ef)
+        self._size = 0
+
+    def add(self, item_id: int, vector: List[float]) -> None:
+        if self._size >= self._index.get_max_elements():
+            # 容量不足时翻倍扩容（已标记删除的槽位会被优先复用）
+            self._index.resize_index(2 * self._index.get_max_elements())
+        self._index.add_items([vector], [item_id], replace_deleted=True)
+        self._size += 1
+
+    def remove(self, item_id: int) -> None:
+        try:
+            self._index.mark_deleted(item_id)
+            self._size -= 1
+        except RuntimeError:
+            pass
+
+    def search(self, query: List[float], k: int) -> List[Tuple[int, float]]:
+        k = min(k, self._size)
+        if k <= 0:
+            return []
+        labels, distances = self._index.knn_query([query], k=k)
+        # cosine空间返回的是 1 - 余弦相似度
+        return [
+            (int(label), 1.0 - float(distance))
+            for label, distance in zip(labels[0], distances[0])
+        ]
+
+
+def _create_index(kind: str, dim: int, max_elements: int, quantize: bool = False):
+    """按类型创建向量索引"""
+    if kind == "flat":
+        return _FlatIndex(dim, quantize=quantize)
+    if kind == "lsh":
+        return _LSHIndex(dim)
+    if kind == "hnsw":
+        return _HNSWIndex(dim, max_elements)
+    raise ValueError(f"未知索引类型: {kind}，可选: {', '.join(INDEX_KINDS)}")
+
+
+@dataclass
+class _CacheEntry:
+    """缓存条目"""
+
+    task: str
+    namespace: str
+    embedding: List[float]
+    result: Dict[str, Any]
+    created_at: float
+
+
+class SemanticCache:
+    """
+    基于向量相似度的任务结果缓存
+
+    条目按LRU顺序保存，超过TTL的条目在访问时淘汰。
+    相似度查询委托给可替换的向量索引（flat/lsh/hnsw）。
+    """
+
+    def __init__(
+        self,
+        embedder: Optional[Callable[[str], List[float]]] = None,
+        threshold: float = 0.85,
+        max_entries: int = 256,
+        ttl_seconds: Optional[float] = 300.0,
+        index_kind: str = "flat",
+        search_k: int = 8,
+        quantize: bool = False,
+    ):
+        """
+        初始化语义缓存
+
+        Args:
+            embedder: 文本向量化函数，返回L2归一化向量；默认使用HashingEmbedder
+            threshold: 命中所需的最低余弦相似度
+            max_entries: 最大缓存条目数，超出时淘汰最久未使用的条目
+            ttl_seconds: 条目存活时间（秒），为None时不过期
+            index_kind: 向量索引类型，flat/lsh/hnsw
+            search_k: 每次查询从索引取回的候选数（再按命名空间过滤）
+            quantize: flat索引是否以int8量化存储向量（带宽约降为1/4，相似度为近似值）
+        """
+        if index_kind not in INDEX_KINDS:
+            raise ValueError(f"未知索引类型: {index_kind}，可选: {', '.join(INDEX_KINDS)}")
+        self.embedder = embedder or HashingEmbedder()
+        self.index_kind = index_kind
+        self.search_k = search_k
+        self.quantize = quantize
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[int, _CacheEntry]" = OrderedDict()
+        self._next_id = 0
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+        self._index = None  # 首次写入时按向量维度创建
+
+    def get(self, task: str, namespace: str = "") -> Optional[Dict[str, Any]]:
+        """
+        查找语义相近的已缓存任务结果
+
+        Args:
+            task: 任务文本
+            namespace: 命名空间，只在相同命名空间内匹配（如角色ID）
+
+        Returns:
+            命中时返回缓存结果，否则返回None
+        """
+        self._evict_expired()
+        if not self._entries:
+            self._stats["misses"] += 1
+            return None
+
+        query = self.embedder(task)
+        best_id, best_score = self._search(query, namespace)
+        if best_id is None or best_score < self.threshold:
+            self._stats["misses"] += 1
+            return None
+
+        self._entries.move_to_end(best_id)
+        self._stats["hits"] += 1
+        logger.debug(f"语义缓存命中: 相似度 {best_score:.3f}")
+        return self._entries[best_id].result
+
+    def put(self, task: str, result: Dict[str, Any], namespace: str = "") -> None:
+        """
+        缓存任务结果
+
+        Args:
+            task: 任务文本
+            result: 任务结果
+            namespace: 命名空间
+        """
+        entry = _CacheEntry(
+            task=task,
+            namespace=namespace,
+            embedding=self.embedder(task),
+            result=result,
+            created_at=time.monotonic(),
+        )
+        if self._index is None:
+            self._index = _create_index(
+                self.index_kind, len(entry.embedding), self.max_entries + 1, self.quantize
+            )
+        while len(self._entries) >= self.max_entries:
+            evicted_id, _ = self._entries.popitem(last=False)
+            self._index.remove(evicted_id)
+            self._stats["evictions"] += 1
+        self._entries[self._next_id] = entry
+        self._index.add(self._next_id, entry.embedding)
+        self._next_id += 1
+
+    def clear(self) -> None:
+        """清空缓存"""
+        self._entries.clear()
+        self._index = None
+
+    def save(self, path: str) -> None:
+        """
+        保存缓存到磁盘
+
+        向量写入 path + ".emb.npy"（float32矩阵），其余字段逐行写入 path + ".jsonl"。
+
+        Args:
+            path: 文件路径前缀
+        """
+        if np is None:
+            raise ImportError("保存语义缓存需要安装numpy: pip install numpy")
+        self._evict_expired()
+        now = time.monotonic()
+        entries = list(self._entries.values())
+        dim = len(entries[0].embedding) if entries else 0
+        matrix = np.asarray([entry.embedding for entry in entries], dtype=np.float32).reshape(len(entries), dim)
+        np.save(path + ".emb.npy", matrix)
+        with open(path + ".jsonl", "w", encoding="utf-8") as f:
+            for entry in entries:
+                record = {
+                    "task": entry.task,
+                    "namespace": entry.namespace,
+                    "result": entry.result,
+                    "age": now - entry.created_at,
+                }
+                f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+        logger.info(f"语义缓存已保存: {len(entries)} 条 -> {path}")
+
+    def load(self, path: str) -> None:
+        """
+        从磁盘加载缓存（替换当前内容）
+
+        向量矩阵以 mmap_mode="r" 映射，flat索引直接在映射上扫描，启动时无需解析向量。
+
+        Args:
+            path: save使用的文件路径前缀
+        """
+        if np is None:
+            raise ImportError("加载语义缓存需要安装numpy: pip install numpy")
+        matrix = np.load(path + ".emb.npy", mmap_mode="r")
+        with open(path + ".jsonl", "r", encoding="utf-8") as f:
+            records = [json.loads(line) for line in f if line.strip()]
+        if len(records) != len(matrix):
+            raise ValueError(f"语义缓存文件不一致: {len(records)} 条记录, {len(matrix)} 个向量")
+
+        # 超出容量时只保留最近写入的条目
+        start = max(0, len(records) - self.max_entries)
+        records, matrix = records[start:], matrix[start:]
+
+        self.clear()
+        now = time.monotonic()
+        ids = []
+        for record, embedding in zip(records, matrix):
+            self._entries[self._next_id] = _CacheEntry(
+                task=record["task"],
+                namespace=record.get("namespace", ""),
+                embedding=embedding,
+                result=record["result"],
+                created_at=now - float(record.get("age", 0.0)),
+            )
+            ids.append(self._next_id)
+            self._next_id += 1
+
+        if ids:
+            self._index = _create_index(
+                self.index_kind, matrix.shape[1], self.max_entries + 1, self.quantize
+            )
+            if isinstance(self._index, _FlatIndex):
+                self._index.bulk_load(ids, matrix)
+            else:
+                for item_id, embedding in zip(ids, matrix):
+                    self._index.add(item_id, embedding)
+        self._evict_expired()
+        logger.info(f"语义缓存已加载: {len(self._entries)} 条 <- {path}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息"""
+        stats = dict(self._stats)
+        stats["size"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+    def _search(self, query: List[float], namespace: str) -> Tuple[Optional[int], float]:
+        """返回同命名空间内相似度最高的条目"""
+        if self._index is None:
+            return None, -1.0
+        for entry_id, score in self._index.search(query, self.search_k):
+            entry = self._entries.get(entry_id)
+            if entry is not None and entry.namespace == namespace:
+                return entry_id, score
+        return None, -1.0
+
+    def _evict_expired(self) -> None:
+        """淘汰过期条目"""
+        if self.ttl_seconds is None:
+            return
+        deadline = time.monotonic() - self.ttl_seconds
+        expired = [
+            entry_id
+            for entry_id, entry in self._entries.items()
+            if entry.created_at < deadline
+        ]
+        for entry_id in expired:
+            del self._entries[entry_id]
+            self._index.remove(entry_id)
+            self._stats["evictions"] += 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
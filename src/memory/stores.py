@@ -1,9 +1,11 @@
 """MemoryStore and TraceStore implementations for ReMemAgent."""
 
+import bisect
 import json
 import logging
 import re
 import uuid
+from collections import OrderedDict
 from datetime import datetime
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Union
@@ -30,6 +32,8 @@ except ImportError:  # pragma: no cover
 
 logger = logging.getLogger(__name__)
 
+_RETRIEVAL_CACHE_LIMIT = 128
+
 
 class MemoryStore:
     """Storage backend interface used by ReMemAgent."""
@@ -74,9 +78,14 @@ class JsonMemoryStore(MemoryStore):
         self.llm = llm
         self.include_explanations = include_explanations
         self.last_apply_result: Dict[str, Any] = {}
+        # LLM retrieval results keyed by (query, k); valid only while the
+        # bank's version is unchanged, so Think iterations reuse them.
+        self._retrieval_cache: "OrderedDict[tuple, List[MemoryRecord]]" = OrderedDict()
+        self._retrieval_cache_version: Optional[tuple] = None
 
     def set_llm(self, llm: Any) -> None:
         self.llm = llm
+        self._retrieval_cache.clear()
 
     def retrieve(self, query: str, context, role, k: int) -> List[MemoryRecord]:
         if not self.memory_bank.entries:
@@ -84,18 +93,36 @@ class JsonMemoryStore(MemoryStore):
 
         if self.llm is None:
             raise RuntimeError("LLM is required for memory retrieval")
+
+        version = (id(self.memory_bank), self.memory_bank.version, id(self.llm))
+        if version != self._retrieval_cache_version:
+            self._retrieval_cache.clear()
+            self._retrieval_cache_version = version
+        key = (query, k, self.include_explanations)
+        cached = self._retrieval_cache.get(key)
+        if cached is not None:
+            self._retrieval_cache.move_to_end(key)
+            logger.debug("Reusing retrieval result, memory bank unchanged")
+            return list(cached)
+
         raw_results = self.memory_bank.retrieve(
             self.llm,
             query,
             k=k,
             include_explanations=self.include_explanations,
         )
-        return [self._record_from_retrieval(item) for item in raw_results]
+        records = [self._record_from_retrieval(item) for item in raw_results]
+        self._retrieval_cache[key] = records
+        while len(self._retrieval_cache) > _RETRIEVAL_CACHE_LIMIT:
+            self._retrieval_cache.popitem(last=False)
+        return list(records)
 
     def apply_operations(
         self, operations: List[MemoryOperation], context, role
     ) -> Dict[str, Any]:
         result = _empty_apply_result(operations)
+        # Original indices deleted so far in this batch, sorted and unique:
+        # MemoryBank.delete removes a repeated index only once.
         deleted_indices: List[int] = []
         for operation in operations:
             op_type = operation.operation_type
@@ -119,7 +146,7 @@ class JsonMemoryStore(MemoryStore):
                 elif op_type == "delete":
                     indices = _operation_indices(operation)
                     self.memory_bank.delete(indices)
-                    deleted_indices.extend(indices)
+                    deleted_indices = sorted(set(deleted_indices).union(indices))
                     result["applied_operations"].append(
                         _operation_result(operation, "applied", {"indices": indices})
                     )
@@ -238,7 +265,9 @@ class JsonMemoryStore(MemoryStore):
     def save(self) -> bool:
         if self.persistence is None:
             return True
-        return self.persistence.save(self.memory_bank)
+        # Append only the changes since the last save to the WAL; the
+        # persistence layer falls back to a full snapshot when needed.
+        return self.persistence.sync(self.memory_bank)
 
     def memory_size(self) -> int:
         return len(self.memory_bank)
@@ -790,9 +819,11 @@ def _operation_indices(operation: MemoryOperation) -> List[int]:
 
 
 def _adjust_index_after_deletes(idx: int, deleted_indices: List[int]) -> Optional[int]:
-    if idx in deleted_indices:
+    """Map an original index past earlier deletes; deleted_indices must be sorted and unique."""
+    position = bisect.bisect_left(deleted_indices, idx)
+    if position < len(deleted_indices) and deleted_indices[position] == idx:
         return None
-    return idx - sum(1 for deleted_idx in deleted_indices if deleted_idx < idx)
+    return idx - position
 
 
 def _strip_act_prefix(text: str) -> str: